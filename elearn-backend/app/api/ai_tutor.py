@@ -1,12 +1,12 @@
 
 import os
-import requests
+import json
 import replicate
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 from ..core.config import (
-    LLM_PROVIDER,
     REPLICATE_API_KEY,
     REPLICATE_MODEL,
     OLLAMA_URL,
@@ -17,6 +17,11 @@ from ..core.config import (
     AI_TUTOR_REQUESTS_PER_HOUR,
     AI_TUTOR_REQUESTS_PER_DAY,
 )
+from ..core.http_client import provider_post, provider_stream
+from ..core.response_cache import get_cached_answer, store_answer, cache_metrics
+from ..core import prompt_builder, llm_router
+from ..core.security import check_teacher_role
+from .auth import get_current_user
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
@@ -34,7 +39,7 @@ class ChatRequest(BaseModel):
     history: List[dict] = []
     context: Optional[dict] = None
 
-def call_replicate_api(prompt: str) -> str:
+async def call_replicate_api(prompt: str) -> str:
     """Call Replicate API for LLM inference."""
     if not REPLICATE_API_KEY:
         raise HTTPException(status_code=500, detail="Replicate API key not configured. Set REPLICATE_API_KEY in .env")
@@ -45,7 +50,7 @@ def call_replicate_api(prompt: str) -> str:
         print(f"Calling Replicate model: {REPLICATE_MODEL}")
         print(f"Prompt length: {len(prompt)} characters")
         
-        output = replicate.run(
+        output = await replicate.async_run(
             REPLICATE_MODEL,
             input={
                 "prompt": prompt,
@@ -70,19 +75,19 @@ def call_replicate_api(prompt: str) -> str:
         print(f"Replicate error details: {type(e).__name__}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Replicate API error: {str(e)}")
 
-def call_ollama_api(prompt: str) -> str:
+async def call_ollama_api(prompt: str) -> str:
     """Call local Ollama API for LLM inference."""
     payload = {
         "model": OLLAMA_MODEL,
         "prompt": prompt,
         "stream": False
     }
-    response = requests.post(OLLAMA_URL, json=payload, timeout=60)
+    response = await provider_post("ollama", OLLAMA_URL, json=payload)
     response.raise_for_status()
     result = response.json()
     return result.get("response", "").strip()
 
-def call_gemini_api(prompt: str) -> str:
+async def call_gemini_api(prompt: str) -> str:
     """Call Google Gemini (AI Studio) via REST."""
     if not GEMINI_API_KEY:
         raise HTTPException(status_code=500, detail="Gemini API key not configured. Set GEMINI_API_KEY in .env")
@@ -105,7 +110,7 @@ def call_gemini_api(prompt: str) -> str:
     print(f"Gemini Payload: {payload}")
     
     try:
-        resp = requests.post(url, headers=headers, json=payload, timeout=60)
+        resp = await provider_post("gemini", url, headers=headers, json=payload)
         print(f"Gemini response status: {resp.status_code}")
         print(f"Gemini response headers: {resp.headers}")
         print(f"Gemini response body: {resp.text}")
@@ -129,35 +134,182 @@ def call_gemini_api(prompt: str) -> str:
         print("Gemini exception:", str(e))
         raise HTTPException(status_code=500, detail=f"Gemini API error: {str(e)}")
 
+async def stream_replicate_api(prompt: str):
+    """Stream tokens from Replicate as the model produces them."""
+    if not REPLICATE_API_KEY:
+        raise HTTPException(status_code=500, detail="Replicate API key not configured. Set REPLICATE_API_KEY in .env")
+
+    os.environ["REPLICATE_API_TOKEN"] = REPLICATE_API_KEY
+    events = await replicate.async_stream(
+        REPLICATE_MODEL,
+        input={
+            "prompt": prompt,
+            "max_new_tokens": 256,
+            "temperature": 0.7,
+            "top_p": 0.95
+        }
+    )
+    async for event in events:
+        yield str(event)
+
+async def stream_ollama_api(prompt: str):
+    """Stream tokens from Ollama's newline-delimited JSON response."""
+    payload = {
+        "model": OLLAMA_MODEL,
+        "prompt": prompt,
+        "stream": True
+    }
+    async with provider_stream("ollama", OLLAMA_URL, json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if chunk.get("response"):
+                yield chunk["response"]
+            if chunk.get("done"):
+                break
+
+async def stream_gemini_api(prompt: str):
+    """Stream tokens from Gemini's server-sent events endpoint."""
+    if not GEMINI_API_KEY:
+        raise HTTPException(status_code=500, detail="Gemini API key not configured. Set GEMINI_API_KEY in .env")
+
+    url = f"https://generativelanguage.googleapis.com/v1/{GEMINI_MODEL}:streamGenerateContent?alt=sse"
+    headers = {"Content-Type": "application/json", "x-goog-api-key": GEMINI_API_KEY}
+    payload = {"contents": [{"parts": [{"text": prompt}]}]}
+    async with provider_stream("gemini", url, headers=headers, json=payload) as response:
+        if response.status_code >= 400:
+            body = (await response.aread()).decode(errors="replace")
+            raise HTTPException(status_code=response.status_code, detail=f"Gemini API error: {body}")
+        async for line in response.aiter_lines():
+            if not line or not line.startswith("data:"):
+                continue
+            data = json.loads(line[len("data:"):])
+            for candidate in data.get("candidates", [])[:1]:
+                for part in candidate.get("content", {}).get("parts", []):
+                    if part.get("text"):
+                        yield part["text"]
+
+PROVIDER_CALLS = {
+    "replicate": call_replicate_api,
+    "ollama": call_ollama_api,
+    "gemini": call_gemini_api,
+}
+
+PROVIDER_STREAMS = {
+    "replicate": stream_replicate_api,
+    "ollama": stream_ollama_api,
+    "gemini": stream_gemini_api,
+}
+
+def build_prompt(data: ChatRequest, provider: str):
+    """Fit the system prompt, chat history and new message into the provider's token budget."""
+    system_prompt = SYSTEM_PROMPTS.get(data.mode, SYSTEM_PROMPTS["direct"])
+    prompt, stats = prompt_builder.build_prompt(system_prompt, data.history, data.message, provider)
+    print(
+        f"AI Tutor prompt ({provider}): {stats['prompt_tokens']}/{stats['token_budget']} tokens, "
+        f"{stats['turns_verbatim']} turns verbatim, {stats['turns_summarized']} summarized"
+    )
+    return prompt, stats
+
 
 @router.post("/ai-tutor/ask")
 @limiter.limit(f"{AI_TUTOR_REQUESTS_PER_MINUTE}/minute;{AI_TUTOR_REQUESTS_PER_HOUR}/hour;{AI_TUTOR_REQUESTS_PER_DAY}/day")
 async def ask_ai_tutor(request: Request, data: ChatRequest):
-    """AI Tutor endpoint supporting multiple LLM providers."""
+    """AI Tutor endpoint routed across the configured LLM providers."""
     try:
-        system_prompt = SYSTEM_PROMPTS.get(data.mode, SYSTEM_PROMPTS["direct"])
+        cacheable = not data.history
+        if cacheable:
+            cached_answer = get_cached_answer(data.mode, data.message, data.context)
+            if cached_answer is not None:
+                return {"answer": cached_answer, "cached": True}
 
-        prompt = system_prompt + "\n\n"
-        for msg in data.history:
-            if msg['role'] == 'user':
-                prompt += f"Student: {msg['content']}\n"
-            else:
-                prompt += f"Lumina: {msg['content']}\n"
-        prompt += f"Student: {data.message}\nLumina:"
-
-        if LLM_PROVIDER == "replicate":
-            answer = call_replicate_api(prompt)
-        elif LLM_PROVIDER == "ollama":
-            answer = call_ollama_api(prompt)
-        elif LLM_PROVIDER == "gemini":
-            answer = call_gemini_api(prompt)
-        else:
-            raise HTTPException(status_code=500, detail=f"Unknown LLM provider: {LLM_PROVIDER}")
+        prompt_stats = {}
+
+        async def call(provider):
+            if provider not in PROVIDER_CALLS:
+                raise HTTPException(status_code=500, detail=f"Unknown LLM provider: {provider}")
+            prompt, prompt_stats[provider] = build_prompt(data, provider)
+            return await PROVIDER_CALLS[provider](prompt)
+
+        provider, answer = await llm_router.complete(call)
 
-        return {"answer": answer}
+        if cacheable:
+            store_answer(data.mode, data.message, answer, data.context)
+        return {"answer": answer, "provider": provider, "prompt_tokens": prompt_stats[provider]["prompt_tokens"]}
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"AI Tutor Error ({LLM_PROVIDER}):", str(e))
-        raise HTTPException(status_code=500, detail=f"AI Tutor error: {str(e)}")
\ No newline at end of file
+        print("AI Tutor Error:", str(e))
+        raise HTTPException(status_code=500, detail=f"AI Tutor error: {str(e)}")
+
+
+@router.post("/ai-tutor/ask/stream")
+@limiter.limit(f"{AI_TUTOR_REQUESTS_PER_MINUTE}/minute;{AI_TUTOR_REQUESTS_PER_HOUR}/hour;{AI_TUTOR_REQUESTS_PER_DAY}/day")
+async def ask_ai_tutor_stream(request: Request, data: ChatRequest):
+    """AI Tutor endpoint that forwards tokens as server-sent events while the provider generates them."""
+    cacheable = not data.history
+    if cacheable:
+        cached_answer = get_cached_answer(data.mode, data.message, data.context)
+        if cached_answer is not None:
+            async def cached_stream():
+                yield f"data: {json.dumps({'token': cached_answer})}\n\n"
+                yield f"event: done\ndata: {json.dumps({'cached': True})}\n\n"
+            return StreamingResponse(cached_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    prompt_stats = {}
+
+    def open_stream(provider):
+        if provider not in PROVIDER_STREAMS:
+            raise HTTPException(status_code=500, detail=f"Unknown LLM provider: {provider}")
+        prompt, prompt_stats["last"] = build_prompt(data, provider)
+        prompt_stats["provider"] = provider
+        return PROVIDER_STREAMS[provider](prompt)
+
+    tokens = llm_router.stream(open_stream)
+
+    async def event_stream():
+        parts = []
+        try:
+            async for token in tokens:
+                if await request.is_disconnected():
+                    print("AI Tutor stream: client disconnected, cancelling generation")
+                    break
+                parts.append(token)
+                yield f"data: {json.dumps({'token': token})}\n\n"
+            else:
+                if cacheable:
+                    store_answer(data.mode, data.message, "".join(parts).strip(), data.context)
+                done = {"provider": prompt_stats.get("provider")}
+                if "last" in prompt_stats:
+                    done["prompt_tokens"] = prompt_stats["last"]["prompt_tokens"]
+                yield f"event: done\ndata: {json.dumps(done)}\n\n"
+        except HTTPException as e:
+            yield f"event: error\ndata: {json.dumps({'detail': e.detail})}\n\n"
+        except Exception as e:
+            print("AI Tutor stream error:", str(e))
+            yield f"event: error\ndata: {json.dumps({'detail': f'AI Tutor error: {str(e)}'})}\n\n"
+        finally:
+            await tokens.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/ai-tutor/cache-stats")
+async def ai_tutor_cache_stats(user=Depends(get_current_user)):
+    """Teacher-only endpoint - response cache hit-rate metrics for this worker."""
+    check_teacher_role(user)
+    return cache_metrics()
+
+
+@router.get("/ai-tutor/providers")
+async def ai_tutor_provider_stats(user=Depends(get_current_user)):
+    """Teacher-only endpoint - per-provider latency, error rate and circuit state for this worker."""
+    check_teacher_role(user)
+    return llm_router.router_stats()
@@ -3,60 +3,52 @@ from fastapi import APIRouter, HTTPException, Body, Depends, Request, Query
 from pydantic import BaseModel
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from app.db import get_db_connection, return_db_connection, cache_get, cache_set
-from app.api.auth import get_current_user
+from app.db import async_cursor, fetch_all, cache_invalidate
+from app.api.auth import get_current_user, resolve_student_id
 from app.core.security import sanitize_string, check_teacher_role
 from app.core.config import RATE_LIMIT_PER_MINUTE
+from app.api.gradebook import REFRESH_GRADEBOOK_SQL, REFRESH_COURSE_GRADEBOOK_SQL
 
 limiter = Limiter(key_func=get_remote_address)
 
 router = APIRouter(prefix="/assignments", tags=["assignments"])
 
+async def _get_owned_assignment(cursor, assignment_id: int, user: dict, action: str):
+    """Assignment row with its course's instructor; 404 if missing, 403 if not the caller's course"""
+    await cursor.execute("SELECT a.*, c.instructor_id FROM assignments a JOIN courses c ON a.course_id = c.id WHERE a.id=%s", (assignment_id,))
+    assignment = await cursor.fetchone()
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    if assignment["instructor_id"] != user.get("teacher_id"):
+        raise HTTPException(status_code=403, detail=f"Not authorized to {action}")
+    return assignment
+
 @router.get("/assignment_submissions/")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
 async def list_all_assignment_submissions(request: Request, user=Depends(get_current_user), skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=500)):
     """Teachers: all submissions; Students: only their submissions with pagination"""
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
-        if user.get("role") == "teacher":
-            cursor.execute("SELECT COUNT(*) as count FROM assignment_submissions")
-            total = cursor.fetchone()['count']
-            cursor.execute("SELECT * FROM assignment_submissions ORDER BY submitted_at DESC LIMIT %s OFFSET %s", (limit, skip))
-            submissions = cursor.fetchall()
-            return {"data": submissions, "total": total, "skip": skip, "limit": limit}
-        
-        cursor.execute("SELECT student_id FROM users WHERE id=%s", (user["id"],))
-        user_row = cursor.fetchone()
-        if not user_row or not user_row.get("student_id"):
-            return []
-        student_id = user_row["student_id"]
-        cursor.execute("SELECT * FROM assignment_submissions WHERE student_id=%s", (student_id,))
-        submissions = cursor.fetchall()
-        return submissions
-    finally:
-        cursor.close()
-        return_db_connection(conn)
+    if user.get("role") == "teacher":
+        async with async_cursor() as cursor:
+            await cursor.execute("SELECT COUNT(*) as count FROM assignment_submissions")
+            total = (await cursor.fetchone())['count']
+            await cursor.execute("SELECT * FROM assignment_submissions ORDER BY submitted_at DESC LIMIT %s OFFSET %s", (limit, skip))
+            submissions = await cursor.fetchall()
+        return {"data": submissions, "total": total, "skip": skip, "limit": limit}
+    
+    student_id = await resolve_student_id(user)
+    if not student_id:
+        return []
+    async with async_cursor() as cursor:
+        await cursor.execute("SELECT * FROM assignment_submissions WHERE student_id=%s", (student_id,))
+        return await cursor.fetchall()
 
 @router.get("/")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
 async def list_assignments(request: Request, course_id: int = None):
     """Public endpoint - accessible to students and teachers"""
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
     if course_id:
-        cursor.execute("SELECT * FROM assignments WHERE course_id=%s", (course_id,))
-    else:
-        cursor.execute("SELECT * FROM assignments")
-    assignments = cursor.fetchall()
-    cursor.close()
-    return_db_connection(conn)
-    return assignments
+        return await fetch_all("SELECT * FROM assignments WHERE course_id=%s", (course_id,))
+    return await fetch_all("SELECT * FROM assignments")
 
 @router.post("/")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
@@ -69,33 +61,21 @@ async def create_assignment(request: Request, data: dict = Body(...), user=Depen
     description = sanitize_string(data.get("description", ""), max_length=2000)
     due_date = data.get("due_date")
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM courses WHERE id=%s", (course_id,))
-    course = cursor.fetchone()
-    if not course:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Course not found")
-    if course["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to create assignments for this course")
-    
-    cursor.execute(
-        "INSERT INTO assignments (course_id, title, description, due_date) VALUES (%s, %s, %s, %s) RETURNING id",
-        (course_id, title, description, due_date)
-    )
-    assignment_id = cursor.fetchone()['id']
-    conn.commit()
-    cursor.execute("SELECT * FROM assignments WHERE id=%s", (assignment_id,))
-    new_assignment = cursor.fetchone()
-    cursor.close()
-    return_db_connection(conn)
+    async with async_cursor() as cursor:
+        await cursor.execute("SELECT id, instructor_id FROM courses WHERE id=%s", (course_id,))
+        course = await cursor.fetchone()
+        if not course:
+            raise HTTPException(status_code=404, detail="Course not found")
+        if course["instructor_id"] != user.get("teacher_id"):
+            raise HTTPException(status_code=403, detail="Not authorized to create assignments for this course")
+        await cursor.execute(
+            "INSERT INTO assignments (course_id, title, description, due_date) VALUES (%s, %s, %s, %s) RETURNING *",
+            (course_id, title, description, due_date)
+        )
+        new_assignment = await cursor.fetchone()
     if not new_assignment:
         raise HTTPException(status_code=500, detail="Failed to fetch new assignment after insert")
+    cache_invalidate(f"assignments:course:{course_id}")
     return new_assignment
 
 @router.put("/{assignment_id}")
@@ -104,22 +84,6 @@ async def update_assignment(request: Request, assignment_id: int, user=Depends(g
     """Teacher-only endpoint - can only update assignments in own courses"""
     check_teacher_role(user)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT a.*, c.instructor_id FROM assignments a JOIN courses c ON a.course_id = c.id WHERE a.id=%s", (assignment_id,))
-    assignment = cursor.fetchone()
-    if not assignment:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Assignment not found")
-    
-    if assignment["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to update this assignment")
-    
     update_fields = []
     params = []
     if title is not None:
@@ -132,14 +96,13 @@ async def update_assignment(request: Request, assignment_id: int, user=Depends(g
         update_fields.append("due_date=%s")
         params.append(due_date)
     if not update_fields:
-        cursor.close()
-        return_db_connection(conn)
         raise HTTPException(status_code=400, detail="No fields to update")
     params.append(assignment_id)
-    cursor.execute(f"UPDATE assignments SET {', '.join(update_fields)} WHERE id=%s", tuple(params))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
+    
+    async with async_cursor() as cursor:
+        assignment = await _get_owned_assignment(cursor, assignment_id, user, "update this assignment")
+        await cursor.execute(f"UPDATE assignments SET {', '.join(update_fields)} WHERE id=%s", tuple(params))
+    cache_invalidate(f"assignments:course:{assignment['course_id']}")
     return {"id": assignment_id, "updated": True}
 
 @router.delete("/{assignment_id}")
@@ -148,26 +111,11 @@ async def delete_assignment(request: Request, assignment_id: int, user=Depends(g
     """Teacher-only endpoint - can only delete assignments in own courses"""
     check_teacher_role(user)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT a.*, c.instructor_id FROM assignments a JOIN courses c ON a.course_id = c.id WHERE a.id=%s", (assignment_id,))
-    assignment = cursor.fetchone()
-    if not assignment:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Assignment not found")
-    
-    if assignment["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to delete this assignment")
-    
-    cursor.execute("DELETE FROM assignments WHERE id=%s", (assignment_id,))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
+    async with async_cursor() as cursor:
+        assignment = await _get_owned_assignment(cursor, assignment_id, user, "delete this assignment")
+        await cursor.execute("DELETE FROM assignments WHERE id=%s", (assignment_id,))
+        await cursor.execute(REFRESH_COURSE_GRADEBOOK_SQL, (assignment["course_id"], assignment["course_id"]))
+    cache_invalidate(f"assignments:course:{assignment['course_id']}")
     return {"id": assignment_id, "deleted": True}
 
 @router.get("/{assignment_id}/submissions")
@@ -176,26 +124,10 @@ async def list_submissions(request: Request, assignment_id: int, user=Depends(ge
     """Teacher-only endpoint - view submissions for own course assignments"""
     check_teacher_role(user)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT a.*, c.instructor_id FROM assignments a JOIN courses c ON a.course_id = c.id WHERE a.id=%s", (assignment_id,))
-    assignment = cursor.fetchone()
-    if not assignment:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Assignment not found")
-    if assignment["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to view submissions for this assignment")
-    
-    cursor.execute("SELECT * FROM assignment_submissions WHERE assignment_id=%s", (assignment_id,))
-    submissions = cursor.fetchall()
-    cursor.close()
-    return_db_connection(conn)
-    return submissions
+    async with async_cursor() as cursor:
+        await _get_owned_assignment(cursor, assignment_id, user, "view submissions for this assignment")
+        await cursor.execute("SELECT * FROM assignment_submissions WHERE assignment_id=%s", (assignment_id,))
+        return await cursor.fetchall()
 
 @router.post("/{assignment_id}/submit")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
@@ -206,62 +138,43 @@ async def submit_assignment(request: Request, assignment_id: int, user=Depends(g
     enrollment_id = data.get("enrollment_id")
     content = sanitize_string(data.get("content"), max_length=10000)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM assignments WHERE id=%s", (assignment_id,))
-    assignment = cursor.fetchone()
-    if not assignment:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Assignment not found")
-    
-    if assignment.get("due_date"):
-        try:
-            due_date = assignment["due_date"]
-            if isinstance(due_date, str):
-                due_date = datetime.fromisoformat(due_date.replace('Z', '+00:00'))
-            if datetime.now(due_date.tzinfo if due_date.tzinfo else None) > due_date:
-                cursor.close()
-                return_db_connection(conn)
-                raise HTTPException(status_code=400, detail="Assignment submission deadline has passed")
-        except ValueError:
-            pass
-    
-    cursor.execute("SELECT * FROM enrollments WHERE id=%s", (enrollment_id,))
-    enrollment_row = cursor.fetchone()
-    if not enrollment_row:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Enrollment not found")
-    
-    if enrollment_row.get("user_id") != user["id"]:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to submit for this enrollment")
-    
-    user_id = enrollment_row.get("user_id")
-    cursor.execute("SELECT student_id FROM users WHERE id=%s", (user_id,))
-    user_row = cursor.fetchone()
-    if not user_row or not user_row.get("student_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=400, detail="Student profile not found for this enrollment")
-    student_id = user_row.get("student_id")
-    cursor.execute("SELECT id FROM assignment_submissions WHERE assignment_id=%s AND enrollment_id=%s", (assignment_id, enrollment_id))
-    if cursor.fetchone():
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=400, detail="Already submitted")
-    cursor.execute(
-        "INSERT INTO assignment_submissions (assignment_id, enrollment_id, student_id, content) VALUES (%s, %s, %s, %s) RETURNING id",
-        (assignment_id, enrollment_id, student_id, content)
-    )
-    submission_id = cursor.fetchone()['id']
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
+    async with async_cursor() as cursor:
+        await cursor.execute("SELECT * FROM assignments WHERE id=%s", (assignment_id,))
+        assignment = await cursor.fetchone()
+        if not assignment:
+            raise HTTPException(status_code=404, detail="Assignment not found")
+        
+        if assignment.get("due_date"):
+            try:
+                due_date = assignment["due_date"]
+                if isinstance(due_date, str):
+                    due_date = datetime.fromisoformat(due_date.replace('Z', '+00:00'))
+                if datetime.now(due_date.tzinfo if due_date.tzinfo else None) > due_date:
+                    raise HTTPException(status_code=400, detail="Assignment submission deadline has passed")
+            except ValueError:
+                pass
+        
+        await cursor.execute("SELECT * FROM enrollments WHERE id=%s", (enrollment_id,))
+        enrollment_row = await cursor.fetchone()
+        if not enrollment_row:
+            raise HTTPException(status_code=404, detail="Enrollment not found")
+        
+        if enrollment_row.get("user_id") != user["id"]:
+            raise HTTPException(status_code=403, detail="Not authorized to submit for this enrollment")
+        
+        student_id = await resolve_student_id(user)
+        if not student_id:
+            raise HTTPException(status_code=400, detail="Student profile not found for this enrollment")
+        await cursor.execute("SELECT id FROM assignment_submissions WHERE assignment_id=%s AND enrollment_id=%s", (assignment_id, enrollment_id))
+        if await cursor.fetchone():
+            raise HTTPException(status_code=400, detail="Already submitted")
+        await cursor.execute(
+            "INSERT INTO assignment_submissions (assignment_id, enrollment_id, student_id, content) VALUES (%s, %s, %s, %s) RETURNING id",
+            (assignment_id, enrollment_id, student_id, content)
+        )
+        submission_id = (await cursor.fetchone())['id']
+        await cursor.execute(REFRESH_GRADEBOOK_SQL, (assignment["course_id"], [student_id]))
+    cache_invalidate(f"dashboard:student:{student_id}")
     return {"id": submission_id, "assignment_id": assignment_id, "enrollment_id": enrollment_id, "student_id": student_id}
 
 class ReviewSubmissionRequest(BaseModel):
@@ -275,27 +188,6 @@ async def review_submission(request: Request, submission_id: int, review: Review
     """Teacher-only endpoint - review submissions in own courses"""
     check_teacher_role(user)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT sub.*, c.instructor_id 
-        FROM assignment_submissions sub 
-        JOIN assignments a ON sub.assignment_id = a.id 
-        JOIN courses c ON a.course_id = c.id 
-        WHERE sub.id=%s
-    """, (submission_id,))
-    submission = cursor.fetchone()
-    if not submission:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Submission not found")
-    if submission["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to review this submission")
-    
     update_fields = []
     params = []
     if review.status is not None:
@@ -308,12 +200,23 @@ async def review_submission(request: Request, submission_id: int, review: Review
         update_fields.append("feedback=%s")
         params.append(sanitize_string(review.feedback, max_length=2000))
     if not update_fields:
-        cursor.close()
-        return_db_connection(conn)
         raise HTTPException(status_code=400, detail="No fields to update")
     params.append(submission_id)
-    cursor.execute(f"UPDATE assignment_submissions SET {', '.join(update_fields)} WHERE id=%s", tuple(params))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
-    return {"id": submission_id, "reviewed": True}
\ No newline at end of file
+    
+    async with async_cursor() as cursor:
+        await cursor.execute("""
+            SELECT sub.*, a.course_id, c.instructor_id 
+            FROM assignment_submissions sub 
+            JOIN assignments a ON sub.assignment_id = a.id 
+            JOIN courses c ON a.course_id = c.id 
+            WHERE sub.id=%s
+        """, (submission_id,))
+        submission = await cursor.fetchone()
+        if not submission:
+            raise HTTPException(status_code=404, detail="Submission not found")
+        if submission["instructor_id"] != user.get("teacher_id"):
+            raise HTTPException(status_code=403, detail="Not authorized to review this submission")
+        await cursor.execute(f"UPDATE assignment_submissions SET {', '.join(update_fields)} WHERE id=%s", tuple(params))
+        await cursor.execute(REFRESH_GRADEBOOK_SQL, (submission["course_id"], [submission["student_id"]]))
+    cache_invalidate(f"dashboard:student:{submission['student_id']}")
+    return {"id": submission_id, "reviewed": True}
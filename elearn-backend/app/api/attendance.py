@@ -1,11 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
 from pydantic import BaseModel
+from typing import List
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from app.db import get_db_connection, return_db_connection
-from app.api.auth import get_current_user
+from app.db import async_cursor
+from app.api.auth import get_current_user, resolve_student_id
 from app.core.security import sanitize_string, check_teacher_role
 from app.core.config import RATE_LIMIT_PER_MINUTE
+from app.api.gradebook import REFRESH_GRADEBOOK_SQL
 
 limiter = Limiter(key_func=get_remote_address)
 
@@ -14,29 +16,48 @@ class AttendanceRequest(BaseModel):
     user_id: int  
     status: str
 
+class AttendanceEntry(BaseModel):
+    user_id: int
+    status: str
+
+class BulkAttendanceRequest(BaseModel):
+    schedule_id: int
+    entries: List[AttendanceEntry]
+
+MAX_BULK_ATTENDANCE = 1000
+
 router = APIRouter(prefix="/attendance", tags=["attendance"])
 
+async def _get_owned_attendance(cursor, attendance_id: int, user: dict, action: str):
+    """Attendance row with its course and instructor; 404 if missing, 403 if not the caller's course"""
+    await cursor.execute("""
+        SELECT a.*, s.course_id, c.instructor_id 
+        FROM attendance a 
+        JOIN class_schedules s ON a.schedule_id = s.id 
+        JOIN courses c ON s.course_id = c.id 
+        WHERE a.id=%s
+    """, (attendance_id,))
+    attendance = await cursor.fetchone()
+    if not attendance:
+        raise HTTPException(status_code=404, detail="Attendance record not found")
+    if attendance["instructor_id"] != user.get("teacher_id"):
+        raise HTTPException(status_code=403, detail=f"Not authorized to {action} this attendance record")
+    return attendance
+
 @router.get("/")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
 async def list_attendance(request: Request, user=Depends(get_current_user), schedule_id: int = None, student_id: int = None):
     """Authenticated endpoint - teachers see all, students see own"""
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    
     if user["role"] == "student":
-        cursor.execute("SELECT student_id FROM users WHERE id=%s", (user["id"],))
-        user_row = cursor.fetchone()
-        if not user_row or not user_row.get("student_id"):
-            cursor.close()
-            return_db_connection(conn)
+        student_id = await resolve_student_id(user)
+        if not student_id:
             return []
-        student_id = user_row["student_id"]
-        cursor.execute("SELECT * FROM attendance WHERE student_id=%s", (student_id,))
-    else:
-        if schedule_id and student_id:
-            cursor.execute("""
+    
+    async with async_cursor() as cursor:
+        if user["role"] == "student":
+            await cursor.execute("SELECT * FROM attendance WHERE student_id=%s", (student_id,))
+        elif schedule_id and student_id:
+            await cursor.execute("""
                 SELECT a.*
                 FROM attendance a
                 JOIN class_schedules s ON a.schedule_id = s.id
@@ -45,7 +66,7 @@ async def list_attendance(request: Request, user=Depends(get_current_user), sche
                 WHERE a.schedule_id=%s AND a.student_id=%s
             """, (schedule_id, student_id))
         elif schedule_id:
-            cursor.execute("""
+            await cursor.execute("""
                 SELECT a.*
                 FROM attendance a
                 JOIN class_schedules s ON a.schedule_id = s.id
@@ -54,14 +75,10 @@ async def list_attendance(request: Request, user=Depends(get_current_user), sche
                 WHERE a.schedule_id=%s
             """, (schedule_id,))
         elif student_id:
-            cursor.execute("SELECT * FROM attendance WHERE student_id=%s", (student_id,))
+            await cursor.execute("SELECT * FROM attendance WHERE student_id=%s", (student_id,))
         else:
-            cursor.execute("SELECT * FROM attendance")
-    
-    records = cursor.fetchall()
-    cursor.close()
-    return_db_connection(conn)
-    return records
+            await cursor.execute("SELECT * FROM attendance")
+        return await cursor.fetchall()
 
 @router.post("/")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
@@ -72,52 +89,104 @@ async def mark_attendance(request: Request, data: AttendanceRequest, user=Depend
     schedule_id = data.schedule_id
     user_id = data.user_id
     status = sanitize_string(data.status, max_length=20)
-
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT student_id FROM users WHERE id=%s", (user_id,))
-    user_row = cursor.fetchone()
-    if not user_row or not user_row.get("student_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Student not found for user")
-    student_id = user_row["student_id"]
-    
     if status not in ("present", "absent"):
         raise HTTPException(status_code=400, detail="Invalid status")
+
+    async with async_cursor() as cursor:
+        # The marked student's profile id is resolved in the same round trip as the schedule
+        await cursor.execute("""
+            SELECT s.*, c.instructor_id, u.student_id AS marked_student_id
+            FROM class_schedules s 
+            JOIN courses c ON s.course_id = c.id 
+            LEFT JOIN users u ON u.id=%s
+            WHERE s.id=%s
+        """, (user_id, schedule_id))
+        schedule = await cursor.fetchone()
+        if not schedule:
+            raise HTTPException(status_code=404, detail="Schedule not found")
+        if schedule["instructor_id"] != user.get("teacher_id"):
+            raise HTTPException(status_code=403, detail="Not authorized to mark attendance for this schedule")
+        student_id = schedule["marked_student_id"]
+        if not student_id:
+            raise HTTPException(status_code=404, detail="Student not found for user")
+        
+        await cursor.execute(
+            """
+            INSERT INTO attendance (schedule_id, student_id, status) VALUES (%s, %s, %s)
+            ON CONFLICT (schedule_id, student_id) DO NOTHING
+            RETURNING id
+            """,
+            (schedule_id, student_id, status)
+        )
+        marked = await cursor.fetchone()
+        if not marked:
+            raise HTTPException(status_code=400, detail="Attendance already marked")
+        attendance_id = marked['id']
+        await cursor.execute(REFRESH_GRADEBOOK_SQL, (schedule["course_id"], [student_id]))
+    return {"id": attendance_id, "schedule_id": schedule_id, "student_id": student_id, "status": status}
+
+@router.post("/bulk")
+@limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
+async def mark_attendance_bulk(request: Request, data: BulkAttendanceRequest, user=Depends(get_current_user)):
+    """
+    Teacher-only endpoint - mark attendance for a whole class session in one request.
+    Existing marks for the same student are overwritten; user ids without a student
+    profile are reported back in skipped_user_ids.
+    """
+    check_teacher_role(user)
     
-    cursor.execute("""
-        SELECT s.*, c.instructor_id 
-        FROM class_schedules s 
-        JOIN courses c ON s.course_id = c.id 
-        WHERE s.id=%s
-    """, (schedule_id,))
-    schedule = cursor.fetchone()
-    if not schedule:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Schedule not found")
-    if schedule["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to mark attendance for this schedule")
+    if not data.entries:
+        raise HTTPException(status_code=400, detail="No attendance entries")
+    if len(data.entries) > MAX_BULK_ATTENDANCE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ATTENDANCE} entries per request")
     
-    cursor.execute("SELECT id FROM attendance WHERE schedule_id=%s AND student_id=%s", (schedule_id, student_id))
-    if cursor.fetchone():
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=400, detail="Attendance already marked")
-    cursor.execute(
-        "INSERT INTO attendance (schedule_id, student_id, status) VALUES (%s, %s, %s) RETURNING id",
-        (schedule_id, student_id, status)
-    )
-    attendance_id = cursor.fetchone()['id']
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
-    return {"id": attendance_id, "schedule_id": schedule_id, "student_id": student_id, "status": status}
+    statuses = {}
+    for entry in data.entries:
+        status = sanitize_string(entry.status, max_length=20)
+        if status not in ("present", "absent"):
+            raise HTTPException(status_code=400, detail=f"Invalid status for user {entry.user_id}")
+        statuses[entry.user_id] = status
+    
+    async with async_cursor() as cursor:
+        await cursor.execute("""
+            SELECT s.course_id, c.instructor_id 
+            FROM class_schedules s 
+            JOIN courses c ON s.course_id = c.id 
+            WHERE s.id=%s
+        """, (data.schedule_id,))
+        schedule = await cursor.fetchone()
+        if not schedule:
+            raise HTTPException(status_code=404, detail="Schedule not found")
+        if schedule["instructor_id"] != user.get("teacher_id"):
+            raise HTTPException(status_code=403, detail="Not authorized to mark attendance for this schedule")
+        
+        await cursor.execute(
+            "SELECT id, student_id FROM users WHERE id = ANY(%s) AND student_id IS NOT NULL",
+            (list(statuses),)
+        )
+        student_ids = {row["id"]: row["student_id"] for row in await cursor.fetchall()}
+        skipped = [uid for uid in statuses if uid not in student_ids]
+        
+        marks = {student_ids[uid]: statuses[uid] for uid in student_ids}
+        
+        marked = []
+        if marks:
+            await cursor.execute("""
+                INSERT INTO attendance (schedule_id, student_id, status)
+                SELECT %s, x.student_id, x.status
+                FROM unnest(%s::int[], %s::text[]) AS x(student_id, status)
+                ON CONFLICT (schedule_id, student_id)
+                DO UPDATE SET status = EXCLUDED.status, marked_at = CURRENT_TIMESTAMP
+                RETURNING id, student_id, status
+            """, (
+                data.schedule_id,
+                list(marks),
+                list(marks.values())
+            ))
+            marked = await cursor.fetchall()
+            await cursor.execute(REFRESH_GRADEBOOK_SQL, (schedule["course_id"], list(marks)))
+    
+    return {"schedule_id": data.schedule_id, "marked": marked, "skipped_user_ids": skipped}
 
 @router.put("/{attendance_id}")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
@@ -129,32 +198,10 @@ async def update_attendance(request: Request, attendance_id: int, status: str, u
     if status not in ("present", "absent"):
         raise HTTPException(status_code=400, detail="Invalid status")
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT a.*, c.instructor_id 
-        FROM attendance a 
-        JOIN class_schedules s ON a.schedule_id = s.id 
-        JOIN courses c ON s.course_id = c.id 
-        WHERE a.id=%s
-    """, (attendance_id,))
-    attendance = cursor.fetchone()
-    if not attendance:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Attendance record not found")
-    if attendance["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to update this attendance record")
-    
-    cursor.execute("UPDATE attendance SET status=%s WHERE id=%s", (status, attendance_id))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
+    async with async_cursor() as cursor:
+        attendance = await _get_owned_attendance(cursor, attendance_id, user, "update")
+        await cursor.execute("UPDATE attendance SET status=%s WHERE id=%s", (status, attendance_id))
+        await cursor.execute(REFRESH_GRADEBOOK_SQL, (attendance["course_id"], [attendance["student_id"]]))
     return {"id": attendance_id, "updated": True}
 
 @router.delete("/{attendance_id}")
@@ -163,30 +210,8 @@ async def delete_attendance(request: Request, attendance_id: int, user=Depends(g
     """Teacher-only endpoint - delete attendance record"""
     check_teacher_role(user)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        SELECT a.*, c.instructor_id 
-        FROM attendance a 
-        JOIN class_schedules s ON a.schedule_id = s.id 
-        JOIN courses c ON s.course_id = c.id 
-        WHERE a.id=%s
-    """, (attendance_id,))
-    attendance = cursor.fetchone()
-    if not attendance:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Attendance record not found")
-    if attendance["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to delete this attendance record")
-    
-    cursor.execute("DELETE FROM attendance WHERE id=%s", (attendance_id,))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
-    return {"id": attendance_id, "deleted": True}
\ No newline at end of file
+    async with async_cursor() as cursor:
+        attendance = await _get_owned_attendance(cursor, attendance_id, user, "delete")
+        await cursor.execute("DELETE FROM attendance WHERE id=%s", (attendance_id,))
+        await cursor.execute(REFRESH_GRADEBOOK_SQL, (attendance["course_id"], [attendance["student_id"]]))
+    return {"id": attendance_id, "deleted": True}
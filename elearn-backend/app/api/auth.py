@@ -1,22 +1,25 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Request
 from fastapi.security import OAuth2PasswordRequestForm
-from passlib.context import CryptContext
-from jose import jwt, JWTError
-from datetime import datetime, timedelta
+from jose import JWTError
+from datetime import timedelta
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from app.db import get_db_connection, return_db_connection, cache_get, cache_set
-from app.core.config import SECRET_KEY, ALGORITHM, RATE_LIMIT_AUTH_PER_MINUTE
+from app.db import db_cursor, async_cursor, fetch_one, cached_query, cache_get, cache_set
+from app.core.config import RATE_LIMIT_AUTH_PER_MINUTE
 from app.core.security import (
     sanitize_string, 
     validate_email, 
-    validate_password
+    validate_password,
+    check_teacher_role
 )
+from app.core.passwords import hash_password, verify_password, password_pool_stats
+from app.core.tokens import create_token, verify_token, revoke_token
 from fastapi.security import OAuth2PasswordBearer
 
 limiter = Limiter(key_func=get_remote_address)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
 def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=401,
@@ -24,7 +27,7 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = verify_token(token)
         user_id: str = payload.get("sub")
         if user_id is None:
             raise credentials_exception
@@ -42,43 +45,55 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
             "last_name": payload.get("last_name"),
         }
 
+    user = _load_user(user_id)
+    if user is None:
+        raise credentials_exception
+    return user
+
+def get_optional_user(token: str = Depends(optional_oauth2_scheme)):
+    """Current user for public endpoints that personalize their response; None without a valid token"""
+    if not token:
+        return None
+    try:
+        return get_current_user(token)
+    except HTTPException:
+        return None
+
+def _load_user(user_id):
+    """users row by id, cached briefly"""
     cache_key = f"auth_user:{user_id}"
     cached_user = cache_get(cache_key)
     if cached_user:
         return cached_user
 
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    try:
+    with db_cursor() as cursor:
         cursor.execute("SELECT * FROM users WHERE id=%s", (user_id,))
         user = cursor.fetchone()
-    finally:
-        cursor.close()
-        return_db_connection(conn)
 
-    if user is None:
-        raise credentials_exception
-
-    cache_set(cache_key, user, ttl_seconds=60)
+    if user is not None:
+        cache_set(cache_key, user, ttl_seconds=60)
     return user
-router = APIRouter(prefix="/auth", tags=["auth"])
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password[:72])
+async def resolve_student_id(user: dict):
+    """
+    Student profile id for the current user, or None.
+    Taken from the identity get_current_user resolved (token claims or users row); a student
+    token issued before the profile was linked falls back to the users row, read on the async pool.
+    """
+    if user.get("student_id"):
+        return user["student_id"]
+    if user.get("role") != "student":
+        return None
+    row = await cached_query(
+        f"auth_student_id:{user['id']}",
+        lambda: fetch_one("SELECT student_id FROM users WHERE id=%s", (user["id"],)),
+        ttl_seconds=60
+    )
+    return row.get("student_id") if row else None
+router = APIRouter(prefix="/auth", tags=["auth"])
 
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(hours=2)):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + expires_delta
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return create_token(data, expires_delta)
 
 
 
@@ -100,41 +115,32 @@ async def register(request: Request):
     if role not in ["student", "teacher"]:
         raise HTTPException(status_code=400, detail="Invalid role")
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE email=%s", (email,))
-    if cursor.fetchone():
-        cursor.close()
-        return_db_connection(conn)
+    if await fetch_one("SELECT id FROM users WHERE email=%s", (email,)):
         raise HTTPException(status_code=400, detail="Email already registered")
     print(f"[DEBUG] Received password: {password!r} (length: {len(password)})")
     if len(password) > 72:
         raise HTTPException(status_code=400, detail="Password must be 72 characters or fewer.")
-    hashed = get_password_hash(password)
+    hashed = await hash_password(password)
     student_id = None
     teacher_id = None
-    if role == "student":
-        cursor.execute(
-            "INSERT INTO students (first_name, last_name, email, password_hash) VALUES (%s, %s, %s, %s) RETURNING id",
-            (first_name, last_name, email, hashed)
+    async with async_cursor() as cursor:
+        if role == "student":
+            await cursor.execute(
+                "INSERT INTO students (first_name, last_name, email, password_hash) VALUES (%s, %s, %s, %s) RETURNING id",
+                (first_name, last_name, email, hashed)
+            )
+            student_id = (await cursor.fetchone())['id']
+        elif role == "teacher":
+            await cursor.execute(
+                "INSERT INTO teachers (first_name, last_name, email, password_hash) VALUES (%s, %s, %s, %s) RETURNING id",
+                (first_name, last_name, email, hashed)
+            )
+            teacher_id = (await cursor.fetchone())['id']
+        await cursor.execute(
+            "INSERT INTO users (email, password_hash, role, student_id, teacher_id, first_name, last_name) VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id",
+            (email, hashed, role, student_id, teacher_id, first_name, last_name)
         )
-        student_id = cursor.fetchone()['id']
-    elif role == "teacher":
-        cursor.execute(
-            "INSERT INTO teachers (first_name, last_name, email, password_hash) VALUES (%s, %s, %s, %s) RETURNING id",
-            (first_name, last_name, email, hashed)
-        )
-        teacher_id = cursor.fetchone()['id']
-    cursor.execute(
-        "INSERT INTO users (email, password_hash, role, student_id, teacher_id, first_name, last_name) VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id",
-        (email, hashed, role, student_id, teacher_id, first_name, last_name)
-    )
-    user_id = cursor.fetchone()['id']
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
+        user_id = (await cursor.fetchone())['id']
     return {"id": user_id, "email": email, "role": role}
 
 from fastapi import Request
@@ -154,15 +160,8 @@ async def login(request: Request):
     if role not in ["student", "teacher"]:
         raise HTTPException(status_code=400, detail="Invalid role")
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM users WHERE email=%s", (email,))
-    user = cursor.fetchone()
-    cursor.close()
-    return_db_connection(conn)
-    if not user or not verify_password(password, user["password_hash"]):
+    user = await fetch_one("SELECT * FROM users WHERE email=%s", (email,))
+    if not user or not await verify_password(password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     if user["role"] != role:
         raise HTTPException(status_code=403, detail=f"No {role} account found with these credentials.")
@@ -175,4 +174,19 @@ async def login(request: Request):
         "first_name": user.get("first_name"),
         "last_name": user.get("last_name"),
     })
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@router.post("/logout")
+async def logout(token: str = Depends(oauth2_scheme)):
+    """Revoke the current access token in every worker until it expires."""
+    try:
+        await revoke_token(token)
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Could not validate credentials", headers={"WWW-Authenticate": "Bearer"})
+    return {"success": True}
+
+@router.get("/password-hash-stats")
+async def password_hash_stats(user=Depends(get_current_user)):
+    """Teacher-only endpoint - queue depth and timing of the password hashing pool for this worker."""
+    check_teacher_role(user)
+    return password_pool_stats()
\ No newline at end of file
@@ -1,58 +1,100 @@
-from fastapi import APIRouter, HTTPException
-from app.db import get_db_connection, return_db_connection
+from fastapi import APIRouter, HTTPException, Body, Depends, Request
+from pydantic import BaseModel
+from typing import List, Optional
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from app.db import db_cursor, async_cursor, fetch_one, cached_query, cache_invalidate
+from app.api.auth import get_current_user
+from app.core.security import check_teacher_role
+from app.core.config import RATE_LIMIT_PER_MINUTE, CERTIFICATE_CACHE_TTL_SECONDS
+
+limiter = Limiter(key_func=get_remote_address)
 
 router = APIRouter(prefix="/certificates", tags=["certificates"])
 
+class BulkIssueRequest(BaseModel):
+    student_ids: Optional[List[int]] = None
+
 @router.get("/")
 def list_certificates(student_id: int = None, course_id: int = None):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    if student_id and course_id:
-        cursor.execute("SELECT * FROM certificates WHERE student_id=%s AND course_id=%s", (student_id, course_id))
-    elif student_id:
-        cursor.execute("SELECT * FROM certificates WHERE student_id=%s", (student_id,))
-    elif course_id:
-        cursor.execute("SELECT * FROM certificates WHERE course_id=%s", (course_id,))
-    else:
-        cursor.execute("SELECT * FROM certificates")
-    certificates = cursor.fetchall()
-    cursor.close()
-    return_db_connection(conn)
-    return certificates
+    with db_cursor() as cursor:
+        if student_id and course_id:
+            cursor.execute("SELECT * FROM certificates WHERE student_id=%s AND course_id=%s", (student_id, course_id))
+        elif student_id:
+            cursor.execute("SELECT * FROM certificates WHERE student_id=%s", (student_id,))
+        elif course_id:
+            cursor.execute("SELECT * FROM certificates WHERE course_id=%s", (course_id,))
+        else:
+            cursor.execute("SELECT * FROM certificates")
+        return cursor.fetchall()
 
 @router.post("/")
 def create_certificate(student_id: int, course_id: int, certificate_id: str = None):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM certificates WHERE student_id=%s AND course_id=%s", (student_id, course_id))
-    if cursor.fetchone():
-        cursor.close()
-        return_db_connection(conn)
+    with db_cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO certificates (student_id, course_id, certificate_id) VALUES (%s, %s, %s)
+            ON CONFLICT (student_id, course_id) DO NOTHING
+            RETURNING id
+            """,
+            (student_id, course_id, certificate_id)
+        )
+        row = cursor.fetchone()
+    if not row:
         raise HTTPException(status_code=400, detail="Certificate already issued")
-    cursor.execute(
-        "INSERT INTO certificates (student_id, course_id, certificate_id) VALUES (%s, %s, %s) RETURNING id",
-        (student_id, course_id, certificate_id)
-    )
-    cert_id = cursor.fetchone()['id']
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
-    return {"id": cert_id, "student_id": student_id, "course_id": course_id, "certificate_id": certificate_id}
+    cache_invalidate(f"dashboard:student:{student_id}")
+    return {"id": row['id'], "student_id": student_id, "course_id": course_id, "certificate_id": certificate_id}
+
+@router.post("/course/{course_id}/issue")
+@limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
+async def issue_course_certificates(request: Request, course_id: int, data: BulkIssueRequest = Body(BulkIssueRequest()), user=Depends(get_current_user)):
+    """
+    Teacher-only endpoint - issue certificates to every eligible student of an own course in one transaction.
+    Eligible: enrolled with a student profile and progress covering all lessons; a course
+    without a lesson count has no measurable completion, so nothing is issued (409).
+    Pass student_ids to restrict issuance to those students; already-certified students are skipped.
+    """
+    check_teacher_role(user)
+    
+    async with async_cursor() as cursor:
+        await cursor.execute("SELECT instructor_id, lesson_count FROM courses WHERE id=%s", (course_id,))
+        course = await cursor.fetchone()
+        if not course:
+            raise HTTPException(status_code=404, detail="Course not found")
+        if course["instructor_id"] != user.get("teacher_id"):
+            raise HTTPException(status_code=403, detail="Not authorized to issue certificates for this course")
+        if not course["lesson_count"]:
+            raise HTTPException(status_code=409, detail="Course has no lesson count; completion cannot be verified")
+        
+        await cursor.execute("""
+            INSERT INTO certificates (student_id, course_id, certificate_id)
+            SELECT DISTINCT u.student_id, c.id, gen_random_uuid()::text
+            FROM enrollments e
+            JOIN courses c ON c.id = e.course_id
+            JOIN users u ON u.id = e.user_id
+            WHERE e.course_id=%s
+              AND u.student_id IS NOT NULL
+              AND c.lesson_count > 0
+              AND COALESCE(e.progress, 0) >= c.lesson_count
+              AND (%s::int[] IS NULL OR u.student_id = ANY(%s::int[]))
+            ON CONFLICT (student_id, course_id) DO NOTHING
+            RETURNING id, student_id, course_id, certificate_id, earned_at
+        """, (course_id, data.student_ids, data.student_ids))
+        issued = await cursor.fetchall()
+    
+    if issued:
+        cache_invalidate(*{f"dashboard:student:{cert['student_id']}" for cert in issued})
+    return {"course_id": course_id, "issued": issued}
 
 @router.get("/{certificate_id}")
-def get_certificate_by_code(certificate_id: str):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM certificates WHERE certificate_id=%s", (certificate_id,))
-    cert = cursor.fetchone()
-    cursor.close()
-    return_db_connection(conn)
+async def get_certificate_by_code(certificate_id: str):
+    """Public verification endpoint - certificates are immutable, so lookups are cached for a long time"""
+    cert = await cached_query(
+        f"certificate:{certificate_id}",
+        lambda: fetch_one("SELECT * FROM certificates WHERE certificate_id=%s", (certificate_id,)),
+        ttl_seconds=CERTIFICATE_CACHE_TTL_SECONDS,
+        tags=lambda cert: [f"certificate:{certificate_id}", f"course:{cert['course_id']}"]
+    )
     if not cert:
         raise HTTPException(status_code=404, detail="Certificate not found")
-    return cert
\ No newline at end of file
+    return cert
@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, Body, Depends, Request
 from pydantic import BaseModel
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from app.db import get_db_connection, return_db_connection
+from app.db import async_cursor, fetch_all, cache_invalidate
 from app.api.auth import get_current_user
 from app.core.security import sanitize_string, validate_url, check_teacher_role
 from app.core.config import RATE_LIMIT_PER_MINUTE
@@ -18,22 +18,23 @@ class ScheduleCreate(BaseModel):
     duration: int = 60
     meet_link: str = None
 
+async def _get_owned_schedule(cursor, schedule_id: int, user: dict, action: str):
+    """Schedule row with its course's instructor; 404 if missing, 403 if not the caller's course"""
+    await cursor.execute("SELECT s.*, c.instructor_id FROM class_schedules s JOIN courses c ON s.course_id = c.id WHERE s.id=%s", (schedule_id,))
+    schedule = await cursor.fetchone()
+    if not schedule:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    if schedule["instructor_id"] != user.get("teacher_id"):
+        raise HTTPException(status_code=403, detail=f"Not authorized to {action} this schedule")
+    return schedule
+
 @router.get("/")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
 async def list_schedules(request: Request, course_id: int = None):
     """Public endpoint - accessible to students and teachers"""
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
     if course_id:
-        cursor.execute("SELECT * FROM class_schedules WHERE course_id=%s ORDER BY start_time ASC", (course_id,))
-    else:
-        cursor.execute("SELECT * FROM class_schedules ORDER BY start_time ASC")
-    schedules = cursor.fetchall()
-    cursor.close()
-    return_db_connection(conn)
-    return schedules
+        return await fetch_all("SELECT * FROM class_schedules WHERE course_id=%s ORDER BY start_time ASC", (course_id,))
+    return await fetch_all("SELECT * FROM class_schedules ORDER BY start_time ASC")
 
 @router.post("/")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
@@ -46,21 +47,6 @@ async def create_schedule(request: Request, data: ScheduleCreate = Body(...), us
     if data.meet_link:
         meet_link = validate_url(data.meet_link)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM courses WHERE id=%s", (data.course_id,))
-    course = cursor.fetchone()
-    if not course:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Course not found")
-    if course["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to create schedules for this course")
-    
     from datetime import datetime
     def iso_to_mysql(dt_str):
         try:
@@ -72,16 +58,19 @@ async def create_schedule(request: Request, data: ScheduleCreate = Body(...), us
             return dt_str  
 
     start_time_mysql = iso_to_mysql(data.start_time)
-    cursor.execute(
-        "INSERT INTO class_schedules (course_id, title, start_time, duration, meet_link) VALUES (%s, %s, %s, %s, %s) RETURNING id",
-        (data.course_id, title, start_time_mysql, data.duration, meet_link)
-    )
-    schedule_id = cursor.fetchone()['id']
-    conn.commit()
-    cursor.execute("SELECT * FROM class_schedules WHERE id=%s", (schedule_id,))
-    schedule = cursor.fetchone()
-    cursor.close()
-    return_db_connection(conn)
+    async with async_cursor() as cursor:
+        await cursor.execute("SELECT id, instructor_id FROM courses WHERE id=%s", (data.course_id,))
+        course = await cursor.fetchone()
+        if not course:
+            raise HTTPException(status_code=404, detail="Course not found")
+        if course["instructor_id"] != user.get("teacher_id"):
+            raise HTTPException(status_code=403, detail="Not authorized to create schedules for this course")
+        await cursor.execute(
+            "INSERT INTO class_schedules (course_id, title, start_time, duration, meet_link) VALUES (%s, %s, %s, %s, %s) RETURNING *",
+            (data.course_id, title, start_time_mysql, data.duration, meet_link)
+        )
+        schedule = await cursor.fetchone()
+    cache_invalidate(f"schedules:course:{data.course_id}")
     return schedule
 
 @router.put("/{schedule_id}")
@@ -90,22 +79,6 @@ async def update_schedule(request: Request, schedule_id: int, user=Depends(get_c
     """Teacher-only endpoint - update schedules in own courses"""
     check_teacher_role(user)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT s.*, c.instructor_id FROM class_schedules s JOIN courses c ON s.course_id = c.id WHERE s.id=%s", (schedule_id,))
-    schedule = cursor.fetchone()
-    if not schedule:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Schedule not found")
-    
-    if schedule["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to update this schedule")
-    
     update_fields = []
     params = []
     if title is not None:
@@ -121,14 +94,13 @@ async def update_schedule(request: Request, schedule_id: int, user=Depends(get_c
         update_fields.append("meet_link=%s")
         params.append(validate_url(meet_link))
     if not update_fields:
-        cursor.close()
-        return_db_connection(conn)
         raise HTTPException(status_code=400, detail="No fields to update")
     params.append(schedule_id)
-    cursor.execute(f"UPDATE class_schedules SET {', '.join(update_fields)} WHERE id=%s", tuple(params))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
+    
+    async with async_cursor() as cursor:
+        schedule = await _get_owned_schedule(cursor, schedule_id, user, "update")
+        await cursor.execute(f"UPDATE class_schedules SET {', '.join(update_fields)} WHERE id=%s", tuple(params))
+    cache_invalidate(f"schedules:course:{schedule['course_id']}")
     return {"id": schedule_id, "updated": True}
 
 @router.delete("/{schedule_id}")
@@ -137,24 +109,8 @@ async def delete_schedule(request: Request, schedule_id: int, user=Depends(get_c
     """Teacher-only endpoint - delete schedules in own courses"""
     check_teacher_role(user)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT s.*, c.instructor_id FROM class_schedules s JOIN courses c ON s.course_id = c.id WHERE s.id=%s", (schedule_id,))
-    schedule = cursor.fetchone()
-    if not schedule:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Schedule not found")
-    
-    if schedule["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to delete this schedule")
-    
-    cursor.execute("DELETE FROM class_schedules WHERE id=%s", (schedule_id,))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
-    return {"id": schedule_id, "deleted": True}
\ No newline at end of file
+    async with async_cursor() as cursor:
+        schedule = await _get_owned_schedule(cursor, schedule_id, user, "delete")
+        await cursor.execute("DELETE FROM class_schedules WHERE id=%s", (schedule_id,))
+    cache_invalidate(f"schedules:course:{schedule['course_id']}")
+    return {"id": schedule_id, "deleted": True}
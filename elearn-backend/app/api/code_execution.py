@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field, validator
-import requests
+import httpx
 
 from app.core.config import JDOODLE_CLIENT_ID, JDOODLE_CLIENT_SECRET
+from app.core.http_client import provider_post
 
 
 router = APIRouter(prefix="/code-execution", tags=["code-execution"])
@@ -37,12 +38,13 @@ class CodeExecutionRequest(BaseModel):
 
 
 @router.post("/run")
-def run_code(payload: CodeExecutionRequest):
+async def run_code(payload: CodeExecutionRequest):
     if not JDOODLE_CLIENT_ID or not JDOODLE_CLIENT_SECRET:
         raise HTTPException(status_code=500, detail="JDoodle credentials not configured")
 
     try:
-        response = requests.post(
+        response = await provider_post(
+            "jdoodle",
             "https://api.jdoodle.com/v1/execute",
             json={
                 "clientId": JDOODLE_CLIENT_ID,
@@ -52,12 +54,11 @@ def run_code(payload: CodeExecutionRequest):
                 "language": payload.language,
                 "versionIndex": payload.versionIndex or "0",
             },
-            timeout=20,
         )
-    except requests.RequestException as exc:
+    except httpx.HTTPError as exc:
         raise HTTPException(status_code=502, detail=f"JDoodle request failed: {exc}")
 
-    if not response.ok:
+    if not response.is_success:
         raise HTTPException(status_code=response.status_code, detail=response.text)
 
     data = response.json()
@@ -3,10 +3,11 @@ from fastapi import APIRouter, HTTPException, Depends, Request, Query
 from pydantic import BaseModel
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from app.db import get_db_connection, return_db_connection, cache_get, cache_set, cache_clear
+from app.db import async_cursor, fetch_one, cached_query, cache_get, cache_set, cache_invalidate, CACHE_REFRESH_AHEAD_SECONDS
 from app.api.auth import get_current_user
 from app.core.security import sanitize_string, check_teacher_role
 from app.core.config import RATE_LIMIT_PER_MINUTE
+from app.core.pagination import keyset_condition, next_cursor
 
 limiter = Limiter(key_func=get_remote_address)
 
@@ -19,6 +20,9 @@ class CourseCreate(BaseModel):
     duration: str = None
     instructor_id: int = None
 
+# Explicit so responses and cache entries never carry search_vector
+COURSE_COLUMNS = "id, title, description, type, category, level, duration, instructor_id, instructor, created_at, thumbnail, rating, reviews, paid, lesson_count"
+
 router = APIRouter(prefix="/courses", tags=["courses"])
 
 @router.get("/")
@@ -28,7 +32,8 @@ async def list_courses(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     type: str = Query(None),
-    category: str = Query(None)
+    category: str = Query(None),
+    after: str = Query(None)
 ):
     """
     Public endpoint - Get paginated list of courses
@@ -36,19 +41,19 @@ async def list_courses(
     - limit: number of courses to return (default 20, max 100)
     - type: filter by course type (formal, non-formal, informal)
     - category: filter by category
+    - after: cursor from a previous page's next_cursor; replaces skip
     """
-    cache_key = f"courses:{skip}:{limit}:{type}:{category}"
-    cached_result = cache_get(cache_key)
-    if cached_result:
-        return cached_result
-    
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
-        
+    cache_key = f"courses:{skip}:{limit}:{type}:{category}:{after}"
+    return await cached_query(
+        cache_key,
+        lambda: _load_courses(skip, limit, type, category, after),
+        ttl_seconds=300,
+        tags=["courses"],
+        refresh_ahead=CACHE_REFRESH_AHEAD_SECONDS
+    )
+
+async def _load_courses(skip, limit, type, category, after):
+    async with async_cursor() as cursor:
         where_clauses = []
         params = []
         
@@ -62,52 +67,48 @@ async def list_courses(
         
         where_clause = " WHERE " + " AND ".join(where_clauses) if where_clauses else ""
         
-        cursor.execute(f"SELECT COUNT(*) as count FROM courses{where_clause}", params)
-        total = cursor.fetchone()['count']
-        
-        query = f"SELECT id, title, description, type, category, level, duration, instructor_id, created_at FROM courses{where_clause} ORDER BY created_at DESC LIMIT %s OFFSET %s"
-        params.extend([limit, skip])
-        cursor.execute(query, params)
-        courses = cursor.fetchall()
-        
-        result = {
-            "data": courses,
-            "total": total,
-            "skip": skip,
-            "limit": limit
-        }
-        
-        cache_set(cache_key, result, ttl_seconds=300)
-        return result
-    finally:
-        cursor.close()
-        return_db_connection(conn)
+        count_key = f"count:courses:{type}:{category}"
+        total = cache_get(count_key)
+        if total is None:
+            await cursor.execute(f"SELECT COUNT(*) as count FROM courses{where_clause}", params)
+            total = (await cursor.fetchone())['count']
+            cache_set(count_key, total, ttl_seconds=600, tags=["courses"])
+        
+        if after:
+            condition, values = keyset_condition(["created_at", "id"], after)
+            where_clauses.append(condition)
+            params.extend(values)
+            where_clause = " WHERE " + " AND ".join(where_clauses)
+            query = f"SELECT id, title, description, type, category, level, duration, instructor_id, created_at FROM courses{where_clause} ORDER BY created_at DESC, id DESC LIMIT %s"
+            params.append(limit)
+        else:
+            query = f"SELECT id, title, description, type, category, level, duration, instructor_id, created_at FROM courses{where_clause} ORDER BY created_at DESC, id DESC LIMIT %s OFFSET %s"
+            params.extend([limit, skip])
+        await cursor.execute(query, params)
+        courses = await cursor.fetchall()
+    
+    return {
+        "data": courses,
+        "total": total,
+        "skip": skip,
+        "limit": limit,
+        "next_cursor": next_cursor(courses, ["created_at", "id"], limit)
+    }
 
 @router.get("/{course_id}")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
 async def get_course(request: Request, course_id: int):
     """Public endpoint - Get a single course by ID"""
-    cache_key = f"course:{course_id}"
-    cached_result = cache_get(cache_key)
-    if cached_result:
-        return cached_result
-    
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM courses WHERE id=%s", (course_id,))
-        course = cursor.fetchone()
-        if not course:
-            raise HTTPException(status_code=404, detail="Course not found")
-        
-        cache_set(cache_key, course, ttl_seconds=300)
-        return course
-    finally:
-        cursor.close()
-        return_db_connection(conn)
+    course = await cached_query(
+        f"course:{course_id}",
+        lambda: fetch_one(f"SELECT {COURSE_COLUMNS} FROM courses WHERE id=%s", (course_id,)),
+        ttl_seconds=300,
+        tags=[f"course:{course_id}"],
+        refresh_ahead=CACHE_REFRESH_AHEAD_SECONDS
+    )
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return course
 
 @router.post("/")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
@@ -125,25 +126,16 @@ async def create_course(request: Request, course: CourseCreate, user=Depends(get
     level = sanitize_string(course.level, max_length=50) if course.level else None
     duration = sanitize_string(course.duration, max_length=50) if course.duration else None
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
+    async with async_cursor() as cursor:
+        await cursor.execute(
             "INSERT INTO courses (title, description, type, category, level, duration, instructor_id) VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id",
             (title, description, course_type, category, level, duration, teacher_id)
         )
-        course_id = cursor.fetchone()['id']
-        conn.commit()
-        
-        cache_clear("courses")
-        
-        return {"id": course_id, "title": title}
-    finally:
-        cursor.close()
-        return_db_connection(conn)
+        course_id = (await cursor.fetchone())['id']
+    
+    cache_invalidate("courses")
+    
+    return {"id": course_id, "title": title}
 
 @router.put("/{course_id}")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
@@ -151,14 +143,9 @@ async def update_course(request: Request, course_id: int, user=Depends(get_curre
     """Teacher-only endpoint - can only update own courses"""
     check_teacher_role(user)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM courses WHERE id=%s", (course_id,))
-        course = cursor.fetchone()
+    async with async_cursor() as cursor:
+        await cursor.execute("SELECT id, instructor_id FROM courses WHERE id=%s", (course_id,))
+        course = await cursor.fetchone()
         if not course:
             raise HTTPException(status_code=404, detail="Course not found")
         
@@ -185,16 +172,11 @@ async def update_course(request: Request, course_id: int, user=Depends(get_curre
         if not update_fields:
             raise HTTPException(status_code=400, detail="No fields to update")
         params.append(course_id)
-        cursor.execute(f"UPDATE courses SET {', '.join(update_fields)} WHERE id=%s", tuple(params))
-        conn.commit()
-        
-        cache_clear("courses")
-        cache_clear(f"course:{course_id}")
-        
-        return {"id": course_id, "updated": True}
-    finally:
-        cursor.close()
-        return_db_connection(conn)
+        await cursor.execute(f"UPDATE courses SET {', '.join(update_fields)} WHERE id=%s", tuple(params))
+    
+    cache_invalidate("courses", f"course:{course_id}")
+    
+    return {"id": course_id, "updated": True}
 
 @router.delete("/{course_id}")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
@@ -202,28 +184,23 @@ async def delete_course(request: Request, course_id: int, user=Depends(get_curre
     """Teacher-only endpoint - can only delete own courses"""
     check_teacher_role(user)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM courses WHERE id=%s", (course_id,))
-        course = cursor.fetchone()
+    async with async_cursor() as cursor:
+        await cursor.execute("SELECT id, instructor_id FROM courses WHERE id=%s", (course_id,))
+        course = await cursor.fetchone()
         if not course:
             raise HTTPException(status_code=404, detail="Course not found")
         
         if course["instructor_id"] != user.get("teacher_id"):
             raise HTTPException(status_code=403, detail="Not authorized to delete this course")
         
-        cursor.execute("DELETE FROM courses WHERE id=%s", (course_id,))
-        conn.commit()
-        
-        cache_clear("courses")
-        cache_clear(f"course:{course_id}")
-        
-        return {"id": course_id, "deleted": True}
-    finally:
-        cursor.close()
-        return_db_connection(conn)
+        await cursor.execute("DELETE FROM courses WHERE id=%s", (course_id,))
+    
+    cache_invalidate(
+        "courses", f"course:{course_id}",
+        "enrollments:all", f"enrollments:course:{course_id}",
+        "lessons:all", f"lessons:course:{course_id}",
+        "resources:all", f"resources:course:{course_id}",
+        "quizzes:all", f"quizzes:course:{course_id}",
+    )
+    
     return {"id": course_id, "deleted": True}
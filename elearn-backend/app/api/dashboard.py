@@ -0,0 +1,109 @@
+import asyncio
+from fastapi import APIRouter, Depends, Request
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from app.db import fetch_all, cached_query
+from app.api.auth import get_current_user, resolve_student_id
+from app.core.config import RATE_LIMIT_PER_MINUTE, DASHBOARD_CACHE_TTL_SECONDS
+
+limiter = Limiter(key_func=get_remote_address)
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+UPCOMING_SCHEDULES_LIMIT = 10
+
+@router.get("/me")
+@limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
+async def get_my_dashboard(request: Request, user=Depends(get_current_user)):
+    """
+    Student home page in one payload: enrollments, upcoming classes, pending assignments,
+    quiz results, certificates and non-formal progress
+    """
+    student_id = await resolve_student_id(user)
+    return await cached_query(
+        f"dashboard:user:{user['id']}",
+        lambda: _load_dashboard(user["id"], student_id),
+        ttl_seconds=DASHBOARD_CACHE_TTL_SECONDS,
+        tags=_dashboard_tags
+    )
+
+def _dashboard_tags(dashboard):
+    """
+    Per-user tags plus the per-course tags that course, schedule, assignment and quiz writes invalidate
+    """
+    tags = [f"dashboard:user:{dashboard['user_id']}", f"enrollments:user:{dashboard['user_id']}"]
+    if dashboard["student_id"]:
+        tags.append(f"dashboard:student:{dashboard['student_id']}")
+    for enrollment in dashboard["enrollments"]:
+        course_id = enrollment["course_id"]
+        tags += [f"course:{course_id}", f"schedules:course:{course_id}", f"assignments:course:{course_id}", f"quizzes:course:{course_id}"]
+    return tags
+
+async def _load_dashboard(user_id: int, student_id):
+    queries = [
+        fetch_all("""
+            SELECT e.id, e.course_id, e.enrolled_at, e.progress, e.status,
+                   c.title, c.description, c.duration, c.instructor_id, c.type
+            FROM enrollments e
+            JOIN courses c ON e.course_id = c.id
+            WHERE e.user_id=%s
+            ORDER BY e.enrolled_at DESC
+        """, (user_id,)),
+        fetch_all("""
+            SELECT s.*, c.title AS course_title
+            FROM class_schedules s
+            JOIN enrollments e ON e.course_id = s.course_id AND e.user_id=%s
+            JOIN courses c ON c.id = s.course_id
+            WHERE s.start_time >= CURRENT_TIMESTAMP
+            ORDER BY s.start_time ASC
+            LIMIT %s
+        """, (user_id, UPCOMING_SCHEDULES_LIMIT)),
+    ]
+    if student_id:
+        queries += [
+            fetch_all("""
+                SELECT a.*, c.title AS course_title
+                FROM assignments a
+                JOIN enrollments e ON e.course_id = a.course_id AND e.user_id=%s
+                JOIN courses c ON c.id = a.course_id
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM assignment_submissions sub
+                    WHERE sub.assignment_id = a.id AND sub.student_id=%s
+                )
+                ORDER BY a.due_date ASC NULLS LAST, a.id ASC
+            """, (user_id, student_id)),
+            fetch_all("""
+                SELECT qs.id, qs.quiz_id, qs.score, qs.correct_count, qs.total_questions, qs.submitted_at,
+                       q.title AS quiz_title, q.course_id
+                FROM quiz_submissions qs
+                JOIN quizzes q ON q.id = qs.quiz_id
+                WHERE qs.student_id=%s
+                ORDER BY qs.submitted_at DESC
+            """, (student_id,)),
+        ]
+    # Non-formal certificates are claimed against the user id, formal ones against the student profile
+    queries.append(fetch_all("""
+        SELECT cert.*, c.title AS course_title, c.type AS course_type
+        FROM certificates cert
+        JOIN courses c ON c.id = cert.course_id
+        WHERE cert.student_id=%s OR (c.type = 'non-formal' AND cert.student_id=%s)
+        ORDER BY cert.earned_at DESC
+    """, (student_id, user_id)))
+    
+    results = await asyncio.gather(*queries)
+    enrollments, upcoming = results[0], results[1]
+    pending, quiz_results = (results[2], results[3]) if student_id else ([], [])
+    
+    return {
+        "user_id": user_id,
+        "student_id": student_id,
+        "enrollments": enrollments,
+        "upcoming_classes": upcoming,
+        "pending_assignments": pending,
+        "quiz_results": quiz_results,
+        "certificates": results[-1],
+        "nonformal_progress": [
+            {"id": e["id"], "course_id": e["course_id"], "progress": e["progress"], "title": e["title"]}
+            for e in enrollments if e["type"] == "non-formal"
+        ],
+    }
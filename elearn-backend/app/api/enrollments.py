@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from pydantic import BaseModel
 from app.api.auth import get_current_user
-from app.db import get_db_connection, return_db_connection, cache_get, cache_set, cache_clear
+from app.db import db_cursor, cache_get, cache_set, cache_invalidate
+from app.core.pagination import keyset_condition, next_cursor
 
 
 router = APIRouter(prefix="/enrollments", tags=["enrollments"])
@@ -14,12 +15,7 @@ def get_course_students(course_id: int, skip: int = Query(0, ge=0), limit: int =
     if cached_result:
         return cached_result
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
+    with db_cursor() as cursor:
         
         cursor.execute("SELECT COUNT(*) as count FROM enrollments WHERE course_id = %s", (course_id,))
         total = cursor.fetchone()['count']
@@ -36,11 +32,8 @@ def get_course_students(course_id: int, skip: int = Query(0, ge=0), limit: int =
         students = cursor.fetchall()
         
         result = {"data": students, "total": total, "skip": skip, "limit": limit}
-        cache_set(cache_key, result, ttl_seconds=300)
+        cache_set(cache_key, result, ttl_seconds=300, tags=[f"enrollments:course:{course_id}"])
         return result
-    finally:
-        cursor.close()
-        return_db_connection(conn)
 
 class EnrollRequest(BaseModel):
     student_id: int
@@ -54,12 +47,7 @@ def get_my_enrollments(user=Depends(get_current_user)):
     if cached_result:
         return cached_result
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
+    with db_cursor() as cursor:
         cursor.execute("""
             SELECT e.id, e.user_id, e.course_id, e.enrolled_at, e.progress, e.status,
                    c.id as course_id, c.title, c.description, c.duration, c.instructor_id, c.type
@@ -70,51 +58,43 @@ def get_my_enrollments(user=Depends(get_current_user)):
         """, (user["id"],))
         enrollments = cursor.fetchall()
         
-        cache_set(cache_key, enrollments, ttl_seconds=600)
+        tags = [f"enrollments:user:{user['id']}"] + [f"course:{e['course_id']}" for e in enrollments]
+        cache_set(cache_key, enrollments, ttl_seconds=600, tags=tags)
         return enrollments
-    finally:
-        cursor.close()
-        return_db_connection(conn)
 
 @router.get("/")
-def list_enrollments(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=500)):
-    """Get paginated list of all enrollments"""
-    cache_key = f"enrollments:all:{skip}:{limit}"
+def list_enrollments(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=500), after: str = Query(None)):
+    """Get paginated list of all enrollments; pass a previous next_cursor as after to page by keyset"""
+    cache_key = f"enrollments:all:{skip}:{limit}:{after}"
     cached_result = cache_get(cache_key)
     if cached_result:
         return cached_result
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
+    with db_cursor() as cursor:
         
-        cursor.execute("SELECT COUNT(*) as count FROM enrollments")
-        total = cursor.fetchone()['count']
+        total = cache_get("count:enrollments")
+        if total is None:
+            cursor.execute("SELECT COUNT(*) as count FROM enrollments")
+            total = cursor.fetchone()['count']
+            cache_set("count:enrollments", total, ttl_seconds=600, tags=["enrollments:all"])
         
-        cursor.execute("SELECT * FROM enrollments ORDER BY enrolled_at DESC LIMIT %s OFFSET %s", (limit, skip))
+        if after:
+            condition, values = keyset_condition(["enrolled_at", "id"], after)
+            cursor.execute(f"SELECT * FROM enrollments WHERE {condition} ORDER BY enrolled_at DESC, id DESC LIMIT %s", (*values, limit))
+        else:
+            cursor.execute("SELECT * FROM enrollments ORDER BY enrolled_at DESC, id DESC LIMIT %s OFFSET %s", (limit, skip))
         enrollments = cursor.fetchall()
         
-        result = {"data": enrollments, "total": total, "skip": skip, "limit": limit}
-        cache_set(cache_key, result, ttl_seconds=300)
+        result = {"data": enrollments, "total": total, "skip": skip, "limit": limit, "next_cursor": next_cursor(enrollments, ["enrolled_at", "id"], limit)}
+        cache_set(cache_key, result, ttl_seconds=300, tags=["enrollments:all"])
         return result
-    finally:
-        cursor.close()
-        return_db_connection(conn)
 
 @router.post("/")
 def enroll_student(data: EnrollRequest):
     """Enroll a student in a course"""
     student_id = data.student_id
     course_id = data.course_id
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
+    with db_cursor() as cursor:
         
         cursor.execute("SELECT id FROM enrollments WHERE user_id=%s AND course_id=%s", (student_id, course_id))
         existing = cursor.fetchone()
@@ -126,37 +106,25 @@ def enroll_student(data: EnrollRequest):
             (student_id, course_id)
         )
         enrollment_id = cursor.fetchone()['id']
-        conn.commit()
         
         cursor.execute("SELECT * FROM enrollments WHERE id=%s", (enrollment_id,))
         enrollment = cursor.fetchone()
-        
-        cache_clear("enrollments")
-        
-        return enrollment
-    finally:
-        cursor.close()
-        return_db_connection(conn)
+    
+    cache_invalidate("enrollments:all", f"enrollments:course:{course_id}", f"enrollments:user:{student_id}")
+    
+    return enrollment
 
 @router.delete("/{enrollment_id}")
 def remove_enrollment(enrollment_id: int):
     """Remove an enrollment"""
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM enrollments WHERE id=%s", (enrollment_id,))
-        if not cursor.fetchone():
+    with db_cursor() as cursor:
+        cursor.execute("SELECT id, user_id, course_id FROM enrollments WHERE id=%s", (enrollment_id,))
+        enrollment = cursor.fetchone()
+        if not enrollment:
             raise HTTPException(status_code=404, detail="Enrollment not found")
         
         cursor.execute("DELETE FROM enrollments WHERE id=%s", (enrollment_id,))
-        conn.commit()
-        
-        cache_clear("enrollments")
-        
-        return {"id": enrollment_id, "deleted": True}
-    finally:
-        cursor.close()
-        return_db_connection(conn)
\ No newline at end of file
+    
+    cache_invalidate("enrollments:all", f"enrollments:course:{enrollment['course_id']}", f"enrollments:user:{enrollment['user_id']}")
+    
+    return {"id": enrollment_id, "deleted": True}
@@ -1,14 +1,9 @@
 from fastapi import APIRouter, HTTPException, Request
-from app.db import get_db_connection, return_db_connection
-from passlib.context import CryptContext
+from app.db import fetch_one, execute
+from app.core.passwords import hash_password
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
 @router.post("/forgot-password")
 async def forgot_password(request: Request):
     data = await request.json()
@@ -16,19 +11,9 @@ async def forgot_password(request: Request):
     new_password = data.get("new_password")
     if not email or not new_password:
         raise HTTPException(status_code=400, detail="Email and new password required")
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE email=%s", (email,))
-    user = cursor.fetchone()
+    user = await fetch_one("SELECT id FROM users WHERE email=%s", (email,))
     if not user:
-        cursor.close()
-        return_db_connection(conn)
         raise HTTPException(status_code=404, detail="User not found")
-    hashed = get_password_hash(new_password)
-    cursor.execute("UPDATE users SET password_hash=%s WHERE email=%s", (hashed, email))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
+    hashed = await hash_password(new_password)
+    await execute("UPDATE users SET password_hash=%s WHERE email=%s", (hashed, email))
     return {"success": True, "message": "Password updated"}
\ No newline at end of file
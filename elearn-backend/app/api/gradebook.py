@@ -0,0 +1,96 @@
+from fastapi import APIRouter, HTTPException, Depends, Request
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from app.db import async_cursor
+from app.api.auth import get_current_user, resolve_student_id
+from app.core.security import check_teacher_role
+from app.core.config import RATE_LIMIT_PER_MINUTE
+
+limiter = Limiter(key_func=get_remote_address)
+
+router = APIRouter(prefix="/gradebook", tags=["gradebook"])
+
+# Run inside the same transaction as the write that changes a student's grades (see gradebook.sql)
+REFRESH_GRADEBOOK_SQL = "SELECT refresh_gradebook(%s, %s::int[])"
+REFRESH_COURSE_GRADEBOOK_SQL = "SELECT refresh_gradebook(%s, ARRAY(SELECT student_id FROM gradebook WHERE course_id=%s))"
+
+GRADE_BANDS = [("A", 90), ("B", 80), ("C", 70), ("D", 60), ("F", 0)]
+
+def _band(score):
+    for band, floor in GRADE_BANDS:
+        if score >= floor:
+            return band
+    return "F"
+
+@router.get("/course/{course_id}")
+@limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
+async def get_course_gradebook(request: Request, course_id: int, user=Depends(get_current_user)):
+    """Teacher-only endpoint - per-student rollup for an own course plus course-wide summary"""
+    check_teacher_role(user)
+    
+    async with async_cursor() as cursor:
+        await cursor.execute("SELECT instructor_id FROM courses WHERE id=%s", (course_id,))
+        course = await cursor.fetchone()
+        if not course:
+            raise HTTPException(status_code=404, detail="Course not found")
+        if course["instructor_id"] != user.get("teacher_id"):
+            raise HTTPException(status_code=403, detail="Not authorized to view this gradebook")
+        
+        # Enrolled students without any graded activity yet still get a (zeroed) row
+        await cursor.execute("""
+            SELECT
+                %s AS course_id, s.id AS student_id, s.first_name, s.last_name, s.email,
+                COALESCE(g.quizzes_taken, 0) AS quizzes_taken, g.quiz_score_avg, g.quiz_score_best,
+                COALESCE(g.assignments_submitted, 0) AS assignments_submitted,
+                COALESCE(g.assignments_graded, 0) AS assignments_graded,
+                COALESCE(g.grade_distribution, '{}'::jsonb) AS grade_distribution,
+                COALESCE(g.sessions_attended, 0) AS sessions_attended,
+                COALESCE(g.sessions_marked, 0) AS sessions_marked,
+                g.attendance_rate, g.updated_at
+            FROM (
+                SELECT u.student_id FROM enrollments e
+                JOIN users u ON u.id = e.user_id
+                WHERE e.course_id=%s AND u.student_id IS NOT NULL
+                UNION
+                SELECT student_id FROM gradebook WHERE course_id=%s
+            ) r
+            JOIN students s ON s.id = r.student_id
+            LEFT JOIN gradebook g ON g.course_id=%s AND g.student_id = r.student_id
+            ORDER BY s.last_name, s.first_name
+        """, (course_id, course_id, course_id, course_id))
+        students = await cursor.fetchall()
+    
+    quiz_avgs = [row["quiz_score_avg"] for row in students if row["quiz_score_avg"] is not None]
+    attendance = [row["attendance_rate"] for row in students if row["attendance_rate"] is not None]
+    distribution = {band: 0 for band, _ in GRADE_BANDS}
+    for score in quiz_avgs:
+        distribution[_band(score)] += 1
+    
+    return {
+        "course_id": course_id,
+        "summary": {
+            "students": len(students),
+            "quiz_score_avg": round(sum(quiz_avgs) / len(quiz_avgs), 2) if quiz_avgs else None,
+            "attendance_rate": round(sum(attendance) / len(attendance), 4) if attendance else None,
+            "assignments_submitted": sum(row["assignments_submitted"] for row in students),
+            "quiz_grade_distribution": distribution,
+        },
+        "students": students
+    }
+
+@router.get("/me")
+@limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
+async def get_my_grades(request: Request, user=Depends(get_current_user)):
+    """Student endpoint - own rollup for every course"""
+    student_id = await resolve_student_id(user)
+    if not student_id:
+        return []
+    async with async_cursor() as cursor:
+        await cursor.execute("""
+            SELECT g.*, c.title AS course_title
+            FROM gradebook g
+            JOIN courses c ON c.id = g.course_id
+            WHERE g.student_id=%s
+            ORDER BY c.title
+        """, (student_id,))
+        return await cursor.fetchall()
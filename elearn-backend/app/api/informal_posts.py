@@ -1,147 +1,249 @@
 from fastapi import APIRouter, Depends, HTTPException, Body, Query
 from typing import Optional
-from app.db import get_db_connection, return_db_connection, cache_get, cache_set, cache_clear
-from app.api.auth import get_current_user
+from app.db import db_cursor, async_cursor, execute, fetch_all, cached_query, cache_get, cache_set, cache_invalidate
+from app.api.auth import get_current_user, get_optional_user
+from app.core.pagination import keyset_condition, next_cursor
 
 router = APIRouter(prefix="/informal-posts", tags=["Informal Posts"])
 
+COMMENT_COLUMNS = "c.id, c.author, c.text, c.created_at"
+COMMENT_PREVIEW_SIZE = 3
+
+# Explicit so responses and cache entries never carry search_vector
+POST_TABLE_COLUMNS = [
+    "id", "author_id", "title", "content", "category", "tags", "topic", "type", "media_url",
+    "creator", "role", "likes", "saves_count", "comments_count", "upvotes", "downvotes", "views",
+    "is_pinned", "created_at", "updated_at",
+]
+
+POST_COLUMNS = f"""
+    {", ".join("p." + c for c in POST_TABLE_COLUMNS)}, u.email AS creator_email, u.role AS creator_role,
+    COALESCE(p.likes, 0) AS like_count, COALESCE(p.saves_count, 0) AS save_count,
+    COALESCE((
+        SELECT json_agg(json_build_object('id', r.id, 'author', r.author, 'text', r.text) ORDER BY r.id)
+        FROM (
+            SELECT c.id, c.author, c.text FROM informal_post_comments c
+            WHERE c.post_id = p.id ORDER BY c.id DESC LIMIT {COMMENT_PREVIEW_SIZE}
+        ) r
+    ), '[]'::json) AS comments
+"""
+
+# Whether the caller (two %s: their user id) liked / saved p; primary-key lookups, independent of popularity
+VIEWER_COLUMNS = """
+    EXISTS (SELECT 1 FROM informal_post_likes l WHERE l.post_id = p.id AND l.user_id = %s) AS liked,
+    EXISTS (SELECT 1 FROM informal_post_saves s WHERE s.post_id = p.id AND s.user_id = %s) AS saved
+"""
+
+def _with_viewer_flags(result: dict, user: Optional[dict]):
+    """Copy of a shared (cached) page of posts with the caller's liked/saved flags; both False when anonymous"""
+    flags = {}
+    post_ids = [post["id"] for post in result["data"]]
+    if user and post_ids:
+        with db_cursor() as cursor:
+            cursor.execute(
+                f"SELECT p.id, {VIEWER_COLUMNS} FROM unnest(%s::int[]) AS p(id)",
+                (user["id"], user["id"], post_ids)
+            )
+            flags = {row["id"]: row for row in cursor.fetchall()}
+    data = [
+        {**post, "liked": bool(flags.get(post["id"], {}).get("liked")), "saved": bool(flags.get(post["id"], {}).get("saved"))}
+        for post in result["data"]
+    ]
+    return {**result, "data": data}
+
+@router.get("/feed")
+async def get_informal_feed(limit: int = Query(20, ge=1, le=100), after: str = Query(None), user=Depends(get_current_user)):
+    """
+    Home feed: posts from every topic the caller follows, newest first, in one request.
+    Reads the caller's precomputed informal_feed_items rows; pass a previous next_cursor as after.
+    Posts carry like_count/save_count and the caller's liked/saved flags.
+    """
+    cache_key = f"informal_feed:{user['id']}:{limit}:{after}"
+    return await cached_query(
+        cache_key,
+        lambda: _load_feed(user["id"], limit, after),
+        ttl_seconds=120,
+        tags=lambda result: _feed_tags(user["id"], result)
+    )
+
+async def _load_feed(user_id: int, limit: int, after: str):
+    conditions = ["f.user_id=%s"]
+    params = [user_id]
+    if after:
+        condition, values = keyset_condition(["f.created_at", "f.post_id"], after)
+        conditions.append(condition)
+        params.extend(values)
+    params.append(limit)
+    async with async_cursor() as cursor:
+        await cursor.execute(
+            """
+            SELECT t.name FROM topics t
+            JOIN followed_topics ft ON ft.topic_id = t.id
+            WHERE ft.user_id=%s
+            """,
+            (user_id,)
+        )
+        topics = [row["name"] for row in await cursor.fetchall()]
+        await cursor.execute(
+            f"""
+            SELECT {POST_COLUMNS}, {VIEWER_COLUMNS}, f.created_at AS feed_created_at
+            FROM informal_feed_items f
+            JOIN informal_posts p ON p.id = f.post_id
+            JOIN users u ON p.author_id = u.id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY f.created_at DESC, f.post_id DESC
+            LIMIT %s
+            """,
+            [user_id, user_id] + params
+        )
+        posts = await cursor.fetchall()
+
+    cursor_token = next_cursor(posts, ["feed_created_at", "id"], limit)
+    for post in posts:
+        del post["feed_created_at"]
+    return {"data": posts, "topics": topics, "limit": limit, "next_cursor": cursor_token}
+
+def _feed_tags(user_id: int, result: dict):
+    tags = [f"informal_feed:user:{user_id}"]
+    tags += [f"informal_posts:topic:{topic}" for topic in result["topics"]]
+    tags += [f"informal_post:{post['id']}" for post in result["data"]]
+    return tags
+
+@router.get("/{post_id}/comments")
+async def list_comments(post_id: int, limit: int = Query(20, ge=1, le=100), after: str = Query(None)):
+    """Comments on a post, oldest first; pass a previous next_cursor as after for the next page"""
+    conditions = ["c.post_id=%s"]
+    params = [post_id]
+    if after:
+        condition, values = keyset_condition(["c.id"], after, descending=False)
+        conditions.append(condition)
+        params.extend(values)
+    params.append(limit)
+    comments = await fetch_all(
+        f"SELECT {COMMENT_COLUMNS} FROM informal_post_comments c WHERE {' AND '.join(conditions)} ORDER BY c.id LIMIT %s",
+        params
+    )
+    return {"data": comments, "limit": limit, "next_cursor": next_cursor(comments, ["id"], limit)}
+
 @router.delete("/{post_id}/comment/{comment_id}")
-def delete_comment(post_id: int, comment_id: str, user=Depends(get_current_user)):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT comments FROM informal_posts WHERE id=%s", (post_id,))
-    post = cursor.fetchone()
+async def delete_comment(post_id: int, comment_id: str, user=Depends(get_current_user)):
+    # comments migrated from the old JSON column can still be addressed by their "c-<user>-<ts>" id
+    match = "c.id=%s" if comment_id.isdigit() else "c.legacy_id=%s"
+    post = await execute(
+        f"""
+        WITH removed AS (
+            DELETE FROM informal_post_comments c
+            WHERE c.post_id=%s AND {match} AND c.author=%s
+            RETURNING c.id
+        )
+        UPDATE informal_posts
+        SET comments_count = GREATEST(0, COALESCE(comments_count, 0) - (SELECT COUNT(*) FROM removed))
+        WHERE id=%s
+        RETURNING comments_count, (SELECT COUNT(*) FROM removed) AS removed
+        """,
+        (post_id, int(comment_id) if comment_id.isdigit() else comment_id, user.get("email"), post_id)
+    )
     if not post:
-        cursor.close()
-        return_db_connection(conn)
         raise HTTPException(status_code=404, detail="Post not found")
-    import json
-    comments = post.get("comments")
-    try:
-        comment_list = json.loads(comments) if comments else []
-    except Exception:
-        comment_list = []
-    new_comments = [c for c in comment_list if not (c["id"] == comment_id and c["author"] == user.get("email"))]
-    cursor.execute("UPDATE informal_posts SET comments=%s WHERE id=%s", (json.dumps(new_comments), post_id))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
-    return {"success": True, "comments": new_comments}
+    if post["removed"]:
+        cache_invalidate(f"informal_post:{post_id}")
+    return {"success": True, "deleted": bool(post["removed"]), "comment_id": comment_id, "comments_count": post["comments_count"]}
+
 @router.post("/{post_id}/like")
-def like_informal_post(post_id: int, user=Depends(get_current_user)):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT likers, likes FROM informal_posts WHERE id=%s", (post_id,))
-    post = cursor.fetchone()
+async def like_informal_post(post_id: int, user=Depends(get_current_user)):
+    """Toggle the caller's like; the link row and the counter change in one statement"""
+    post = await execute(
+        """
+        WITH added AS (
+            INSERT INTO informal_post_likes (post_id, user_id)
+            SELECT %s, %s WHERE EXISTS (SELECT 1 FROM informal_posts WHERE id=%s)
+            ON CONFLICT DO NOTHING
+            RETURNING 1
+        ), removed AS (
+            DELETE FROM informal_post_likes
+            WHERE post_id=%s AND user_id=%s AND NOT EXISTS (SELECT 1 FROM added)
+            RETURNING 1
+        )
+        UPDATE informal_posts
+        SET likes = GREATEST(0, COALESCE(likes, 0) + (SELECT COUNT(*) FROM added) - (SELECT COUNT(*) FROM removed))
+        WHERE id=%s
+        RETURNING likes, EXISTS (SELECT 1 FROM added) AS liked
+        """,
+        (post_id, user["id"], post_id, post_id, user["id"], post_id)
+    )
     if not post:
-        cursor.close()
-        return_db_connection(conn)
         raise HTTPException(status_code=404, detail="Post not found")
-    likers = post.get("likers") or ""
-    likes = post.get("likes")
-    liker_list = [int(x) for x in likers.split(",") if x.strip().isdigit()]
-    if user["id"] in liker_list:
-        liker_list.remove(user["id"])
-        likes = max(0, (likes or 1) - 1)
-    else:
-        liker_list.append(user["id"])
-        likes = (likes or 0) + 1
-    new_likers = ",".join(str(x) for x in liker_list)
-    cursor.execute("UPDATE informal_posts SET likers=%s, likes=%s WHERE id=%s", (new_likers, likes, post_id))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
-    return {"success": True, "likes": likes, "likers": liker_list}
+    cache_invalidate(f"informal_post:{post_id}")
+    return {"success": True, "likes": post["likes"], "liked": post["liked"]}
 
 @router.post("/{post_id}/comment")
-def comment_informal_post(post_id: int, text: str = Body(...), user=Depends(get_current_user)):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT comments FROM informal_posts WHERE id=%s", (post_id,))
-    post = cursor.fetchone()
-    if not post:
-        cursor.close()
-        return_db_connection(conn)
+async def comment_informal_post(post_id: int, text: str = Body(...), user=Depends(get_current_user)):
+    """Append a comment; returns just the new comment and the post's updated count"""
+    comment = await execute(
+        f"""
+        WITH c AS (
+            INSERT INTO informal_post_comments (post_id, user_id, author, text)
+            SELECT %s, %s, %s, %s WHERE EXISTS (SELECT 1 FROM informal_posts WHERE id=%s)
+            RETURNING id, author, text, created_at
+        ), bumped AS (
+            UPDATE informal_posts SET comments_count = COALESCE(comments_count, 0) + 1
+            WHERE id=%s AND EXISTS (SELECT 1 FROM c)
+            RETURNING comments_count
+        )
+        SELECT {COMMENT_COLUMNS}, (SELECT comments_count FROM bumped) AS comments_count FROM c
+        """,
+        (post_id, user["id"], user.get("email", "Anonymous"), text, post_id, post_id)
+    )
+    if not comment:
         raise HTTPException(status_code=404, detail="Post not found")
-    import json
-    comments = post.get("comments")
-    try:
-        comment_list = json.loads(comments) if comments else []
-    except Exception:
-        comment_list = []
-    new_comment = {
-        "id": f"c-{user['id']}-{int(__import__('time').time())}",
-        "author": user.get("email", "Anonymous"),
-        "text": text
-    }
-    comment_list.append(new_comment)
-    cursor.execute("UPDATE informal_posts SET comments=%s WHERE id=%s", (json.dumps(comment_list), post_id))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
-    return {"success": True, "comments": comment_list}
+    cache_invalidate(f"informal_post:{post_id}")
+    comments_count = comment.pop("comments_count")
+    return {"success": True, "comment": comment, "comments_count": comments_count}
 
 @router.post("/{post_id}/save")
-def save_informal_post(post_id: int, user=Depends(get_current_user)):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT savers FROM informal_posts WHERE id=%s", (post_id,))
-    post = cursor.fetchone()
+async def save_informal_post(post_id: int, user=Depends(get_current_user)):
+    """Toggle the caller's save; the link row and the counter change in one statement"""
+    post = await execute(
+        """
+        WITH added AS (
+            INSERT INTO informal_post_saves (post_id, user_id)
+            SELECT %s, %s WHERE EXISTS (SELECT 1 FROM informal_posts WHERE id=%s)
+            ON CONFLICT DO NOTHING
+            RETURNING 1
+        ), removed AS (
+            DELETE FROM informal_post_saves
+            WHERE post_id=%s AND user_id=%s AND NOT EXISTS (SELECT 1 FROM added)
+            RETURNING 1
+        )
+        UPDATE informal_posts
+        SET saves_count = GREATEST(0, COALESCE(saves_count, 0) + (SELECT COUNT(*) FROM added) - (SELECT COUNT(*) FROM removed))
+        WHERE id=%s
+        RETURNING saves_count, EXISTS (SELECT 1 FROM added) AS saved
+        """,
+        (post_id, user["id"], post_id, post_id, user["id"], post_id)
+    )
     if not post:
-        cursor.close()
-        return_db_connection(conn)
         raise HTTPException(status_code=404, detail="Post not found")
-    savers = post.get("savers") or ""
-    saver_list = [int(x) for x in savers.split(",") if x.strip().isdigit()]
-    if user["id"] in saver_list:
-        saver_list.remove(user["id"])
-    else:
-        saver_list.append(user["id"])
-    new_savers = ",".join(str(x) for x in saver_list)
-    cursor.execute("UPDATE informal_posts SET savers=%s WHERE id=%s", (new_savers, post_id))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
-    return {"success": True, "savers": saver_list}
+    cache_invalidate(f"informal_post:{post_id}")
+    return {"success": True, "saves": post["saves_count"], "saved": post["saved"]}
 
 
 
 @router.delete("/{post_id}")
 def delete_informal_post(post_id: int, user=Depends(get_current_user)):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM informal_posts WHERE id=%s", (post_id,))
-    post = cursor.fetchone()
-    if not post:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Post not found")
-    if post["author_id"] != user["id"]:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to delete this post")
-    cursor.execute("DELETE FROM informal_posts WHERE id=%s", (post_id,))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
+    with db_cursor() as cursor:
+        cursor.execute("SELECT id, author_id, topic FROM informal_posts WHERE id=%s", (post_id,))
+        post = cursor.fetchone()
+        if not post:
+            raise HTTPException(status_code=404, detail="Post not found")
+        if post["author_id"] != user["id"]:
+            raise HTTPException(status_code=403, detail="Not authorized to delete this post")
+        cursor.execute("DELETE FROM informal_posts WHERE id=%s", (post_id,))
+    cache_invalidate(f"informal_post:{post_id}", "informal_posts:all", f"informal_posts:topic:{post['topic']}")
     return {"success": True}
 
 @router.post("/")
 def create_informal_post(post: dict, user=Depends(get_current_user)):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
     sql = """
         INSERT INTO informal_posts
         (title, content, tags, topic, type, media_url, creator, author_id, role)
@@ -160,73 +262,77 @@ def create_informal_post(post: dict, user=Depends(get_current_user)):
         user["role"]
     )
     
-    try:
-        cursor.execute(sql + " RETURNING id", values)
-        post_id = cursor.fetchone()['id']
-        conn.commit()
-        cursor.execute("SELECT * FROM informal_posts WHERE id=%s", (post_id,))
+    with db_cursor() as cursor:
+        cursor.execute(sql + " RETURNING id, created_at", values)
+        created = cursor.fetchone()
+        post_id = created['id']
+        # fan out to the home feed of everyone following this topic
+        cursor.execute(
+            """
+            INSERT INTO informal_feed_items (user_id, post_id, created_at)
+            SELECT DISTINCT f.user_id, %s, %s
+            FROM followed_topics f
+            JOIN topics t ON t.id = f.topic_id
+            WHERE t.name = %s
+            ON CONFLICT DO NOTHING
+            """,
+            (post_id, created['created_at'], post.get("topic"))
+        )
+        cursor.execute(f"SELECT {', '.join(POST_TABLE_COLUMNS)} FROM informal_posts WHERE id=%s", (post_id,))
         new_post = cursor.fetchone()
-        
-        cache_clear("informal_posts")
-        
-        return new_post
-    finally:
-        cursor.close()
-        return_db_connection(conn)
+    
+    cache_invalidate("informal_posts:all", f"informal_posts:topic:{post.get('topic')}")
+    
+    return new_post
 
 @router.get("/")
-def get_informal_posts(skip: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=200), topic: str = None):
-    """Get informal posts with pagination and caching"""
-    cache_key = f"informal_posts:{skip}:{limit}:{topic}"
+def get_informal_posts(skip: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=200), topic: str = None, after: str = Query(None), user=Depends(get_optional_user)):
+    """
+    Get informal posts with pagination and caching; pass a previous next_cursor as after to page by keyset.
+    Each post carries its latest comments as a preview; the full thread is paged via /{post_id}/comments.
+    Posts carry like_count/save_count, plus liked/saved for the caller when a bearer token is sent.
+    """
+    cache_key = f"informal_posts:{skip}:{limit}:{topic}:{after}"
     cached_result = cache_get(cache_key)
     if cached_result:
-        return cached_result
+        return _with_viewer_flags(cached_result, user)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
-        import json
-        
-        where_clause = ""
+    with db_cursor() as cursor:
+        conditions = []
         params = []
         if topic:
-            where_clause = "WHERE p.topic = %s"
+            conditions.append("p.topic = %s")
             params.append(topic)
+        list_tag = f"informal_posts:topic:{topic}" if topic else "informal_posts:all"
         
-        cursor.execute(f"SELECT COUNT(*) as count FROM informal_posts p {where_clause}", params)
-        total = cursor.fetchone()['count']
+        count_key = f"count:informal_posts:{topic}"
+        total = cache_get(count_key)
+        if total is None:
+            where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+            cursor.execute(f"SELECT COUNT(*) as count FROM informal_posts p {where_clause}", params)
+            total = cursor.fetchone()['count']
+            cache_set(count_key, total, ttl_seconds=600, tags=[list_tag])
+        
+        if after:
+            condition, values = keyset_condition(["p.created_at", "p.id"], after)
+            conditions.append(condition)
+            params.extend(values)
+        where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
         
         query = f"""
-            SELECT p.*, u.email AS creator_email, u.role AS creator_role
+            SELECT {POST_COLUMNS}
             FROM informal_posts p
             JOIN users u ON p.author_id = u.id
             {where_clause}
-            ORDER BY p.created_at DESC
+            ORDER BY p.created_at DESC, p.id DESC
             LIMIT %s OFFSET %s
         """
-        params.extend([limit, skip])
+        params.extend([limit, 0 if after else skip])
         cursor.execute(query, params)
         posts = cursor.fetchall()
-        
-        for post in posts:
-            savers = post.get("savers")
-            if savers is None or savers == "":
-                post["savers"] = []
-            else:
-                try:
-                    if savers.startswith("["):
-                        post["savers"] = json.loads(savers)
-                    else:
-                        post["savers"] = [int(x) for x in savers.split(",") if x.strip().isdigit()]
-                except Exception:
-                    post["savers"] = []
-        
-        result = {"data": posts, "total": total, "skip": skip, "limit": limit}
-        cache_set(cache_key, result, ttl_seconds=120)  
-        return result
-    finally:
-        cursor.close()
-        return_db_connection(conn)
+    
+    result = {"data": posts, "total": total, "skip": skip, "limit": limit, "next_cursor": next_cursor(posts, ["created_at", "id"], limit)}
+    tags = [list_tag]
+    tags += [f"informal_post:{post['id']}" for post in posts]
+    cache_set(cache_key, result, ttl_seconds=120, tags=tags)
+    return _with_viewer_flags(result, user)
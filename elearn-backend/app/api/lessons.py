@@ -1,71 +1,69 @@
 from fastapi import APIRouter, HTTPException, Query
-from app.db import get_db_connection, return_db_connection, cache_get, cache_set
+from app.db import db_cursor, cache_get, cache_set, cache_invalidate
+from app.core.pagination import keyset_condition, next_cursor
+
+# Explicit so responses and cache entries never carry search_vector
+LESSON_COLUMNS = "id, course_id, title, content, video_url, order_index"
 
 router = APIRouter(prefix="/lessons", tags=["lessons"])
 
 @router.get("/")
-def list_lessons(course_id: int = None, skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=500)):
-    """Get lessons with pagination and caching"""
-    cache_key = f"lessons:{course_id}:{skip}:{limit}"
+def list_lessons(course_id: int = None, skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=500), after: str = Query(None)):
+    """Get lessons with pagination and caching; pass a previous next_cursor as after to page by keyset"""
+    cache_key = f"lessons:{course_id}:{skip}:{limit}:{after}"
     cached_result = cache_get(cache_key)
     if cached_result:
         return cached_result
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
+    with db_cursor() as cursor:
+        conditions = []
+        params = []
         if course_id:
-            cursor.execute("SELECT COUNT(*) as count FROM lessons WHERE course_id=%s", (course_id,))
-            total = cursor.fetchone()['count']
-            cursor.execute("SELECT * FROM lessons WHERE course_id=%s ORDER BY order_index ASC LIMIT %s OFFSET %s", (course_id, limit, skip))
-        else:
-            cursor.execute("SELECT COUNT(*) as count FROM lessons")
+            conditions.append("course_id=%s")
+            params.append(course_id)
+        list_tag = f"lessons:course:{course_id}" if course_id else "lessons:all"
+        
+        count_key = f"count:lessons:{course_id}"
+        total = cache_get(count_key)
+        if total is None:
+            where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+            cursor.execute(f"SELECT COUNT(*) as count FROM lessons{where_clause}", params)
             total = cursor.fetchone()['count']
-            cursor.execute("SELECT * FROM lessons ORDER BY order_index ASC LIMIT %s OFFSET %s", (limit, skip))
+            cache_set(count_key, total, ttl_seconds=600, tags=[list_tag])
+        
+        if after:
+            condition, values = keyset_condition(["order_index", "id"], after, descending=False)
+            conditions.append(condition)
+            params.extend(values)
+        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+        params.extend([limit, 0 if after else skip])
+        cursor.execute(f"SELECT {LESSON_COLUMNS} FROM lessons{where_clause} ORDER BY order_index ASC, id ASC LIMIT %s OFFSET %s", params)
         lessons = cursor.fetchall()
         
-        result = {"data": lessons, "total": total, "skip": skip, "limit": limit}
-        cache_set(cache_key, result, ttl_seconds=600)
+        result = {"data": lessons, "total": total, "skip": skip, "limit": limit, "next_cursor": next_cursor(lessons, ["order_index", "id"], limit)}
+        cache_set(cache_key, result, ttl_seconds=600, tags=[list_tag])
         return result
-    finally:
-        cursor.close()
-        return_db_connection(conn)
 
 @router.post("/")
 def create_lesson(course_id: int, title: str, content: str = "", video_url: str = None, order_index: int = 0):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
+    with db_cursor() as cursor:
         cursor.execute(
             "INSERT INTO lessons (course_id, title, content, video_url, order_index) VALUES (%s, %s, %s, %s, %s) RETURNING id",
             (course_id, title, content, video_url, order_index)
         )
         lesson_id = cursor.fetchone()['id']
-        conn.commit()
-        
-        cache_clear("lessons")
-        
-        return {"id": lesson_id, "course_id": course_id, "title": title}
-    finally:
-        cursor.close()
-        return_db_connection(conn)
+        cursor.execute("UPDATE courses SET lesson_count = lesson_count + 1 WHERE id=%s", (course_id,))
+    
+    cache_invalidate("lessons:all", f"lessons:course:{course_id}", "courses", f"course:{course_id}")
+    
+    return {"id": lesson_id, "course_id": course_id, "title": title}
 
 @router.put("/{lesson_id}")
 def update_lesson(lesson_id: int, title: str = None, content: str = None, video_url: str = None, order_index: int = None):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM lessons WHERE id=%s", (lesson_id,))
-        if not cursor.fetchone():
+    with db_cursor() as cursor:
+        cursor.execute("SELECT id, course_id FROM lessons WHERE id=%s", (lesson_id,))
+        lesson = cursor.fetchone()
+        if not lesson:
             raise HTTPException(status_code=404, detail="Lesson not found")
         update_fields = []
         params = []
@@ -85,38 +83,21 @@ def update_lesson(lesson_id: int, title: str = None, content: str = None, video_
             raise HTTPException(status_code=400, detail="No fields to update")
         params.append(lesson_id)
         cursor.execute(f"UPDATE lessons SET {', '.join(update_fields)} WHERE id=%s", tuple(params))
-        conn.commit()
-        
-        cache_clear("lessons")
-        
-        return {"id": lesson_id, "updated": True}
-    finally:
-        cursor.close()
-        return_db_connection(conn)
+    
+    cache_invalidate("lessons:all", f"lessons:course:{lesson['course_id']}")
+    
+    return {"id": lesson_id, "updated": True}
 
 @router.delete("/{lesson_id}")
 def delete_lesson(lesson_id: int):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM lessons WHERE id=%s", (lesson_id,))
-        if not cursor.fetchone():
+    with db_cursor() as cursor:
+        cursor.execute("SELECT id, course_id FROM lessons WHERE id=%s", (lesson_id,))
+        lesson = cursor.fetchone()
+        if not lesson:
             raise HTTPException(status_code=404, detail="Lesson not found")
         cursor.execute("DELETE FROM lessons WHERE id=%s", (lesson_id,))
-        conn.commit()
-        
-        cache_clear("lessons")
-        
-        return {"id": lesson_id, "deleted": True}
-    finally:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Lesson not found")
-    cursor.execute("DELETE FROM lessons WHERE id=%s", (lesson_id,))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
-    return {"id": lesson_id, "deleted": True}
\ No newline at end of file
+        cursor.execute("UPDATE courses SET lesson_count = GREATEST(lesson_count - 1, 0) WHERE id=%s", (lesson["course_id"],))
+    
+    cache_invalidate("lessons:all", f"lessons:course:{lesson['course_id']}", "courses", f"course:{lesson['course_id']}")
+    
+    return {"id": lesson_id, "deleted": True}
@@ -1,26 +1,8 @@
-import ast
-def get_lesson_count(course_id):
-    conn = get_db_connection()
-    if not conn:
-        return 1
-    cursor = conn.cursor()
-    cursor.execute("SELECT COUNT(*) FROM lessons WHERE course_id=%s", (course_id,))
-    count = cursor.fetchone()
-    cursor.close()
-    return_db_connection(conn)
-    if not count:
-        return 1
-    print("[DEBUG] lesson count result:", count)
-    if isinstance(count, tuple):
-        return count[0]
-    elif isinstance(count, dict):
-        return list(count.values())[0]
-    else:
-        raise Exception("Unexpected lesson count result type: {}".format(type(count)))
 import uuid
 from fastapi import APIRouter, HTTPException, Depends, Request
-from app.db import get_db_connection, return_db_connection
+from app.db import db_cursor, async_cursor, cache_invalidate
 from app.api.auth import get_current_user
+from app.api.courses import COURSE_COLUMNS
 
 from pydantic import BaseModel
 
@@ -33,45 +15,27 @@ router = APIRouter(prefix="/nonformal", tags=["nonformal"])
 
 @router.get("/progress/")
 def get_nonformal_progress(user=Depends(get_current_user)):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT e.id, e.course_id, e.progress, c.title FROM enrollments e
-        JOIN courses c ON e.course_id = c.id
-        WHERE e.user_id = %s AND c.type = 'non-formal'""", (user["id"],))
-    progress = cursor.fetchall()
-    cursor.close()
-    return_db_connection(conn)
-    return progress
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT e.id, e.course_id, e.progress, c.title FROM enrollments e
+            JOIN courses c ON e.course_id = c.id
+            WHERE e.user_id = %s AND c.type = 'non-formal'""", (user["id"],))
+        return cursor.fetchall()
 
 @router.get("/courses/")
 def list_nonformal_courses():
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM courses WHERE type = 'non-formal'")
-    courses = cursor.fetchall()
-    cursor.close()
-    return_db_connection(conn)
-    return courses
+    with db_cursor() as cursor:
+        cursor.execute(f"SELECT {COURSE_COLUMNS} FROM courses WHERE type = 'non-formal'")
+        return cursor.fetchall()
 
 @router.get("/enrollments/")
 def list_nonformal_enrollments(user=Depends(get_current_user)):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT e.* FROM enrollments e
-        JOIN courses c ON e.course_id = c.id
-        WHERE e.user_id = %s AND c.type = 'non-formal'""", (user["id"],))
-    enrollments = cursor.fetchall()
-    cursor.close()
-    return_db_connection(conn)
-    return enrollments
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT e.* FROM enrollments e
+            JOIN courses c ON e.course_id = c.id
+            WHERE e.user_id = %s AND c.type = 'non-formal'""", (user["id"],))
+        return cursor.fetchall()
 
 @router.post("/enrollments/")
 def enroll_nonformal_course(data: EnrollRequest, user=Depends(get_current_user)):
@@ -81,63 +45,75 @@ def enroll_nonformal_course(data: EnrollRequest, user=Depends(get_current_user))
         course_id_int = int(course_id) if course_id.isdigit() else int(course_id.split('-')[-1])
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid course_id format")
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM courses WHERE id=%s AND type='non-formal'", (course_id_int,))
-    if not cursor.fetchone():
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=400, detail="Course is not non-formal or does not exist")
-    cursor.execute("SELECT id FROM enrollments WHERE user_id=%s AND course_id=%s", (user["id"], course_id_int))
-    if cursor.fetchone():
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=400, detail="Already enrolled")
-    cursor.execute(
-        "INSERT INTO enrollments (user_id, course_id, progress) VALUES (%s, %s, %s)",
-        (user["id"], course_id_int, 0)
-    )
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
+    with db_cursor() as cursor:
+        cursor.execute("SELECT id FROM courses WHERE id=%s AND type='non-formal'", (course_id_int,))
+        if not cursor.fetchone():
+            raise HTTPException(status_code=400, detail="Course is not non-formal or does not exist")
+        cursor.execute("SELECT id FROM enrollments WHERE user_id=%s AND course_id=%s", (user["id"], course_id_int))
+        if cursor.fetchone():
+            raise HTTPException(status_code=400, detail="Already enrolled")
+        cursor.execute(
+            "INSERT INTO enrollments (user_id, course_id, progress) VALUES (%s, %s, %s)",
+            (user["id"], course_id_int, 0)
+        )
+    cache_invalidate(f"enrollments:user:{user['id']}")
     return {"message": "Enrolled successfully, progress initialized"}
 
 @router.put("/progress/")
 async def update_nonformal_progress(request: Request, user=Depends(get_current_user)):
+    """
+    Record completed lessons (0-based indexes) for an enrollment.
+    Completions are stored per lesson, so resending already-completed lessons is a no-op
+    and progress only grows by the lessons that are new. Indexes past the course's
+    lesson_count are ignored; courses whose lessons live only in the frontend have no
+    lesson_count (0) and are not capped.
+    """
     data = await request.json()
     course_id = data.get("course_id")
     completed_lessons = data.get("completed_lessons")
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    if completed_lessons is not None and isinstance(completed_lessons, list):
-        progress = len(set(completed_lessons))
-    else:
-        lesson_index = data.get("lesson_index")
-        progress = int(lesson_index) + 1 if lesson_index is not None else 0
-    cursor.execute(
-        "UPDATE enrollments SET progress=%s WHERE user_id=%s AND course_id=%s",
-        (progress, user["id"], course_id)
-    )
-    conn.commit()
+    try:
+        if completed_lessons is not None and isinstance(completed_lessons, list):
+            lesson_indexes = sorted({int(i) for i in completed_lessons})
+        else:
+            lesson_index = data.get("lesson_index")
+            lesson_indexes = list(range(int(lesson_index) + 1)) if lesson_index is not None else []
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Lesson indexes must be integers")
+    if any(i < 0 for i in lesson_indexes):
+        raise HTTPException(status_code=400, detail="Lesson indexes must not be negative")
+    
+    async with async_cursor() as cursor:
+        await cursor.execute("""
+            WITH e AS (
+                SELECT en.id, c.lesson_count FROM enrollments en
+                JOIN courses c ON c.id = en.course_id
+                WHERE en.user_id=%s AND en.course_id=%s
+            ), added AS (
+                INSERT INTO lesson_completions (enrollment_id, lesson_index)
+                SELECT e.id, x FROM e, unnest(%s::int[]) AS x
+                WHERE COALESCE(e.lesson_count, 0) = 0 OR x < e.lesson_count
+                ON CONFLICT DO NOTHING
+                RETURNING enrollment_id
+            )
+            UPDATE enrollments SET progress = COALESCE(progress, 0) + (SELECT COUNT(*) FROM added a WHERE a.enrollment_id = enrollments.id)
+            WHERE id IN (SELECT id FROM e)
+            RETURNING progress
+        """, (user["id"], course_id, lesson_indexes))
+        enrollment = await cursor.fetchone()
+    if not enrollment:
+        raise HTTPException(status_code=404, detail="Not enrolled")
+    
+    cache_invalidate(f"enrollments:user:{user['id']}")
+    return {"course_id": course_id, "progress": enrollment["progress"]}
 
 @router.get("/certificates/")
 def get_nonformal_certificates(user=Depends(get_current_user)):
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT certificates.* FROM certificates
-        JOIN courses c ON certificates.course_id = c.id
-        WHERE certificates.student_id = %s AND c.type = 'non-formal'""", (user["id"],))
-    certificates = cursor.fetchall()
-    cursor.close()
-    return_db_connection(conn)
-    return certificates
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT certificates.* FROM certificates
+            JOIN courses c ON certificates.course_id = c.id
+            WHERE certificates.student_id = %s AND c.type = 'non-formal'""", (user["id"],))
+        return cursor.fetchall()
 
 @router.post("/certificates/")
 async def claim_nonformal_certificate(request: Request, user=Depends(get_current_user)):
@@ -145,33 +121,31 @@ async def claim_nonformal_certificate(request: Request, user=Depends(get_current
     course_id = str(data.get("course_id"))
     if not course_id:
         raise HTTPException(status_code=400, detail="Missing course_id")
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM certificates WHERE student_id=%s AND course_id=%s", (user["id"], course_id))
-    existing = cursor.fetchone()
-    if existing:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=400, detail="Certificate already claimed")
-    cursor.execute("SELECT progress FROM enrollments WHERE user_id=%s AND course_id=%s", (user["id"], course_id))
-    enrollment = cursor.fetchone()
-    if not enrollment:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=400, detail="Not enrolled")
-    progress = enrollment["progress"]
-    lesson_count = get_lesson_count(course_id)
-    if int(progress) < int(lesson_count):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=400, detail="Course not completed. Complete all lessons to claim certificate.")
-    cert_id = str(uuid.uuid4())
-    cursor.execute("INSERT INTO certificates (student_id, course_id, certificate_id) VALUES (%s, %s, %s)", (user["id"], course_id, cert_id))
-    conn.commit()
-    cursor.execute("SELECT * FROM certificates WHERE student_id=%s AND course_id=%s ORDER BY id DESC LIMIT 1", (user["id"], course_id))
-    cert = cursor.fetchone()
-    cursor.close()
-    return_db_connection(conn)
-    return cert
\ No newline at end of file
+    async with async_cursor() as cursor:
+        await cursor.execute("""
+            SELECT e.progress, c.lesson_count
+            FROM enrollments e
+            JOIN courses c ON c.id = e.course_id
+            WHERE e.user_id=%s AND e.course_id=%s
+        """, (user["id"], course_id))
+        enrollment = await cursor.fetchone()
+        if not enrollment:
+            raise HTTPException(status_code=400, detail="Not enrolled")
+        if not enrollment["lesson_count"]:
+            # Without a lesson count there is nothing to measure completion against
+            raise HTTPException(status_code=409, detail="Course has no lesson count; certificate cannot be verified")
+        if int(enrollment["progress"] or 0) < enrollment["lesson_count"]:
+            raise HTTPException(status_code=400, detail="Course not completed. Complete all lessons to claim certificate.")
+        await cursor.execute(
+            """
+            INSERT INTO certificates (student_id, course_id, certificate_id) VALUES (%s, %s, %s)
+            ON CONFLICT (student_id, course_id) DO NOTHING
+            RETURNING *
+            """,
+            (user["id"], course_id, str(uuid.uuid4()))
+        )
+        cert = await cursor.fetchone()
+        if not cert:
+            raise HTTPException(status_code=400, detail="Certificate already claimed")
+    cache_invalidate(f"dashboard:user:{user['id']}")
+    return cert
@@ -1,46 +1,66 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, Query
+import csv
+import io
+import json
+from fastapi import APIRouter, HTTPException, Depends, Request, Query, Response
+from pydantic import BaseModel
+from typing import Dict
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from app.db import get_db_connection, return_db_connection, cache_get, cache_set, cache_clear
-from app.api.auth import get_current_user
+from app.db import async_cursor, fetch_all, cache_get, cache_set, cache_invalidate
+from app.api.auth import get_current_user, resolve_student_id
 from app.core.security import sanitize_string, check_teacher_role
 from app.core.config import RATE_LIMIT_PER_MINUTE
+from app.core.pagination import keyset_condition, next_cursor
+from app.core.grading import get_answer_key, invalidate_answer_key, grade
+from app.api.gradebook import REFRESH_COURSE_GRADEBOOK_SQL
 
 limiter = Limiter(key_func=get_remote_address)
 
+class QuizSubmission(BaseModel):
+    answers: Dict[str, str]
+
+MAX_IMPORT_QUESTIONS = 500
+QUESTION_FIELDS = ["question", "options", "correct_answer"]
+
 router = APIRouter(prefix="/quizzes", tags=["quizzes"])
 
 @router.get("/")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
-async def list_quizzes(request: Request, course_id: int = None, skip: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=200)):
-    """Public endpoint - Get quizzes with pagination and caching"""
-    cache_key = f"quizzes:{course_id}:{skip}:{limit}"
+async def list_quizzes(request: Request, course_id: int = None, skip: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=200), after: str = Query(None)):
+    """Public endpoint - Get quizzes with pagination and caching; pass a previous next_cursor as after to page by keyset"""
+    cache_key = f"quizzes:{course_id}:{skip}:{limit}:{after}"
     cached_result = cache_get(cache_key)
     if cached_result:
         return cached_result
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
+    conditions = []
+    params = []
+    if course_id:
+        conditions.append("course_id=%s")
+        params.append(course_id)
+    list_tag = f"quizzes:course:{course_id}" if course_id else "quizzes:all"
     
-    try:
-        cursor = conn.cursor()
-        if course_id:
-            cursor.execute("SELECT COUNT(*) as count FROM quizzes WHERE course_id=%s", (course_id,))
-            total = cursor.fetchone()['count']
-            cursor.execute("SELECT * FROM quizzes WHERE course_id=%s ORDER BY id DESC LIMIT %s OFFSET %s", (course_id, limit, skip))
-        else:
-            cursor.execute("SELECT COUNT(*) as count FROM quizzes")
-            total = cursor.fetchone()['count']
-            cursor.execute("SELECT * FROM quizzes ORDER BY id DESC LIMIT %s OFFSET %s", (limit, skip))
-        quizzes = cursor.fetchall()
+    async with async_cursor() as cursor:
+        count_key = f"count:quizzes:{course_id}"
+        total = cache_get(count_key)
+        if total is None:
+            where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+            await cursor.execute(f"SELECT COUNT(*) as count FROM quizzes{where_clause}", params)
+            total = (await cursor.fetchone())['count']
+            cache_set(count_key, total, ttl_seconds=600, tags=[list_tag])
         
-        result = {"data": quizzes, "total": total, "skip": skip, "limit": limit}
-        cache_set(cache_key, result, ttl_seconds=300)
-        return result
-    finally:
-        cursor.close()
-        return_db_connection(conn)
+        if after:
+            condition, values = keyset_condition(["id"], after)
+            conditions.append(condition)
+            params.extend(values)
+        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+        params.extend([limit, 0 if after else skip])
+        await cursor.execute(f"SELECT * FROM quizzes{where_clause} ORDER BY id DESC LIMIT %s OFFSET %s", params)
+        quizzes = await cursor.fetchall()
+    
+    result = {"data": quizzes, "total": total, "skip": skip, "limit": limit, "next_cursor": next_cursor(quizzes, ["id"], limit)}
+    cache_set(cache_key, result, ttl_seconds=300, tags=[list_tag])
+    return result
 
 @router.post("/")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
@@ -51,29 +71,19 @@ async def create_quiz(request: Request, course_id: int, user=Depends(get_current
     title = sanitize_string(title, max_length=200) if title else None
     description = sanitize_string(description, max_length=2000) if description else None
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM courses WHERE id=%s", (course_id,))
-    course = cursor.fetchone()
-    if not course:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Course not found")
-    if course["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to create quizzes for this course")
-    
-    cursor.execute(
-        "INSERT INTO quizzes (course_id, title, description) VALUES (%s, %s, %s) RETURNING id",
-        (course_id, title, description)
-    )
-    quiz_id = cursor.fetchone()['id']
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
+    async with async_cursor() as cursor:
+        await cursor.execute("SELECT id, instructor_id FROM courses WHERE id=%s", (course_id,))
+        course = await cursor.fetchone()
+        if not course:
+            raise HTTPException(status_code=404, detail="Course not found")
+        if course["instructor_id"] != user.get("teacher_id"):
+            raise HTTPException(status_code=403, detail="Not authorized to create quizzes for this course")
+        await cursor.execute(
+            "INSERT INTO quizzes (course_id, title, description) VALUES (%s, %s, %s) RETURNING id",
+            (course_id, title, description)
+        )
+        quiz_id = (await cursor.fetchone())['id']
+    cache_invalidate("quizzes:all", f"quizzes:course:{course_id}")
     return {"id": quiz_id, "course_id": course_id, "title": title}
 
 @router.delete("/{quiz_id}")
@@ -82,41 +92,19 @@ async def delete_quiz(request: Request, quiz_id: int, user=Depends(get_current_u
     """Teacher-only endpoint - delete quizzes in own courses"""
     check_teacher_role(user)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT q.*, c.instructor_id FROM quizzes q JOIN courses c ON q.course_id = c.id WHERE q.id=%s", (quiz_id,))
-    quiz = cursor.fetchone()
-    if not quiz:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Quiz not found")
-    
-    if quiz["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to delete this quiz")
-    
-    cursor.execute("DELETE FROM quizzes WHERE id=%s", (quiz_id,))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
+    async with async_cursor() as cursor:
+        quiz = await _get_owned_quiz(cursor, quiz_id, user, "delete this quiz")
+        await cursor.execute("DELETE FROM quizzes WHERE id=%s", (quiz_id,))
+        await cursor.execute(REFRESH_COURSE_GRADEBOOK_SQL, (quiz["course_id"], quiz["course_id"]))
+    cache_invalidate("quizzes:all", f"quizzes:course:{quiz['course_id']}")
+    invalidate_answer_key(quiz_id)
     return {"id": quiz_id, "deleted": True}
 
 @router.get("/{quiz_id}/questions")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
 async def list_questions(request: Request, quiz_id: int):
-    """Public endpoint - accessible to students and teachers"""
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM quiz_questions WHERE quiz_id=%s", (quiz_id,))
-    questions = cursor.fetchall()
-    cursor.close()
-    return_db_connection(conn)
-    return questions
+    """Public endpoint - accessible to students and teachers; answers stay server-side (teachers can use /export)"""
+    return await fetch_all("SELECT id, quiz_id, question, options FROM quiz_questions WHERE quiz_id=%s ORDER BY id", (quiz_id,))
 
 @router.post("/{quiz_id}/questions")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
@@ -128,30 +116,112 @@ async def create_question(request: Request, quiz_id: int, question: str, options
     options = sanitize_string(options, max_length=1000)
     correct_answer = sanitize_string(correct_answer, max_length=200)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT q.*, c.instructor_id FROM quizzes q JOIN courses c ON q.course_id = c.id WHERE q.id=%s", (quiz_id,))
-    quiz = cursor.fetchone()
+    async with async_cursor() as cursor:
+        await _get_owned_quiz(cursor, quiz_id, user, "create questions for this quiz")
+        await cursor.execute(
+            "INSERT INTO quiz_questions (quiz_id, question, options, correct_answer) VALUES (%s, %s, %s, %s) RETURNING id",
+            (quiz_id, question, options, correct_answer)
+        )
+        question_id = (await cursor.fetchone())['id']
+    invalidate_answer_key(quiz_id)
+    return {"id": question_id, "quiz_id": quiz_id}
+
+async def _get_owned_quiz(cursor, quiz_id: int, user, action: str):
+    """Quiz row with its course's instructor; 404 if missing, 403 if not the caller's course"""
+    await cursor.execute("SELECT q.*, c.instructor_id FROM quizzes q JOIN courses c ON q.course_id = c.id WHERE q.id=%s", (quiz_id,))
+    quiz = await cursor.fetchone()
     if not quiz:
-        cursor.close()
-        return_db_connection(conn)
         raise HTTPException(status_code=404, detail="Quiz not found")
     if quiz["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to create questions for this quiz")
+        raise HTTPException(status_code=403, detail=f"Not authorized to {action}")
+    return quiz
+
+def _parse_questions(body: bytes, fmt: str) -> list:
+    """Turn a JSON array / {"questions": [...]} or a CSV with question,options,correct_answer columns into rows"""
+    text = body.decode("utf-8-sig", errors="replace")
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(text))
+        missing = [f for f in QUESTION_FIELDS if f not in (reader.fieldnames or [])]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"CSV is missing columns: {', '.join(missing)}")
+        return list(reader)
+    try:
+        data = json.loads(text)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON")
+    if isinstance(data, dict):
+        data = data.get("questions")
+    if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+        raise HTTPException(status_code=400, detail="Expected a list of questions")
+    return data
+
+@router.post("/{quiz_id}/questions/import")
+@limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
+async def import_questions(request: Request, quiz_id: int, format: str = Query(None, regex="^(json|csv)$"), user=Depends(get_current_user)):
+    """
+    Teacher-only endpoint - add many questions to a quiz in one request.
+    Body is JSON (a list of {question, options, correct_answer}) or CSV with those columns;
+    format defaults from the Content-Type header. options may be a list in JSON.
+    All questions are inserted in a single statement, or none are.
+    """
+    check_teacher_role(user)
+    
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "json")
+    rows = _parse_questions(await request.body(), fmt)
+    if not rows:
+        raise HTTPException(status_code=400, detail="No questions to import")
+    if len(rows) > MAX_IMPORT_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IMPORT_QUESTIONS} questions per import")
+    
+    questions, options, answers = [], [], []
+    for i, row in enumerate(rows, start=1):
+        row_options = row.get("options")
+        if isinstance(row_options, list):
+            row_options = json.dumps(row_options)
+        values = [row.get("question"), row_options, row.get("correct_answer")]
+        if not all(isinstance(v, str) and v.strip() for v in values):
+            raise HTTPException(status_code=400, detail=f"Question {i}: question, options and correct_answer are required")
+        questions.append(sanitize_string(values[0], max_length=500))
+        options.append(sanitize_string(values[1], max_length=1000))
+        answers.append(sanitize_string(values[2], max_length=200))
+    
+    async with async_cursor() as cursor:
+        await _get_owned_quiz(cursor, quiz_id, user, "create questions for this quiz")
+        await cursor.execute("""
+            INSERT INTO quiz_questions (quiz_id, question, options, correct_answer)
+            SELECT %s, x.question, x.options, x.correct_answer
+            FROM unnest(%s::text[], %s::text[], %s::text[]) WITH ORDINALITY AS x(question, options, correct_answer, n)
+            ORDER BY x.n
+            RETURNING id
+        """, (quiz_id, questions, options, answers))
+        ids = sorted(row["id"] for row in await cursor.fetchall())
+    
+    invalidate_answer_key(quiz_id)
+    return {"quiz_id": quiz_id, "created": len(ids), "ids": ids}
+
+@router.get("/{quiz_id}/questions/export")
+@limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
+async def export_questions(request: Request, quiz_id: int, format: str = Query("json", regex="^(json|csv)$"), user=Depends(get_current_user)):
+    """Teacher-only endpoint - download a quiz's questions (with answers) as JSON or CSV, re-importable as-is"""
+    check_teacher_role(user)
+    
+    async with async_cursor() as cursor:
+        await _get_owned_quiz(cursor, quiz_id, user, "export questions for this quiz")
+        await cursor.execute("SELECT id, question, options, correct_answer FROM quiz_questions WHERE quiz_id=%s ORDER BY id", (quiz_id,))
+        questions = await cursor.fetchall()
+    
+    if format == "json":
+        return {"quiz_id": quiz_id, "questions": questions}
     
-    cursor.execute(
-        "INSERT INTO quiz_questions (quiz_id, question, options, correct_answer) VALUES (%s, %s, %s, %s) RETURNING id",
-        (quiz_id, question, options, correct_answer)
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=QUESTION_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(questions)
+    return Response(
+        content=out.getvalue(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="quiz-{quiz_id}-questions.csv"'}
     )
-    question_id = cursor.fetchone()['id']
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
-    return {"id": question_id, "quiz_id": quiz_id}
 
 @router.delete("/questions/{question_id}")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
@@ -159,32 +229,21 @@ async def delete_question(request: Request, question_id: int, user=Depends(get_c
     """Teacher-only endpoint - delete questions from quizzes in own courses"""
     check_teacher_role(user)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT qq.*, c.instructor_id 
-        FROM quiz_questions qq 
-        JOIN quizzes q ON qq.quiz_id = q.id 
-        JOIN courses c ON q.course_id = c.id 
-        WHERE qq.id=%s
-    """, (question_id,))
-    question = cursor.fetchone()
-    if not question:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Question not found")
-    
-    if question["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to delete this question")
-    
-    cursor.execute("DELETE FROM quiz_questions WHERE id=%s", (question_id,))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
+    async with async_cursor() as cursor:
+        await cursor.execute("""
+            SELECT qq.*, c.instructor_id 
+            FROM quiz_questions qq 
+            JOIN quizzes q ON qq.quiz_id = q.id 
+            JOIN courses c ON q.course_id = c.id 
+            WHERE qq.id=%s
+        """, (question_id,))
+        question = await cursor.fetchone()
+        if not question:
+            raise HTTPException(status_code=404, detail="Question not found")
+        if question["instructor_id"] != user.get("teacher_id"):
+            raise HTTPException(status_code=403, detail="Not authorized to delete this question")
+        await cursor.execute("DELETE FROM quiz_questions WHERE id=%s", (question_id,))
+    invalidate_answer_key(question["quiz_id"])
     return {"id": question_id, "deleted": True}
 
 @router.get("/{quiz_id}/submissions")
@@ -193,55 +252,88 @@ async def list_submissions(request: Request, quiz_id: int, user=Depends(get_curr
     """Teacher-only endpoint - view submissions for quizzes in own courses"""
     check_teacher_role(user)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT q.*, c.instructor_id FROM quizzes q JOIN courses c ON q.course_id = c.id WHERE q.id=%s", (quiz_id,))
-    quiz = cursor.fetchone()
-    if not quiz:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Quiz not found")
-    if quiz["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to view submissions for this quiz")
-    
-    cursor.execute("SELECT * FROM quiz_submissions WHERE quiz_id=%s", (quiz_id,))
-    submissions = cursor.fetchall()
-    cursor.close()
-    return_db_connection(conn)
-    return submissions
+    async with async_cursor() as cursor:
+        await _get_owned_quiz(cursor, quiz_id, user, "view submissions for this quiz")
+        await cursor.execute("SELECT * FROM quiz_submissions WHERE quiz_id=%s", (quiz_id,))
+        return await cursor.fetchall()
 
 @router.post("/{quiz_id}/submit")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
-async def submit_quiz(request: Request, quiz_id: int, score: float, user=Depends(get_current_user)):
-    """Student endpoint - submit quiz"""
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT student_id FROM users WHERE id=%s", (user["id"],))
-    user_row = cursor.fetchone()
-    if not user_row or not user_row.get("student_id"):
-        cursor.close()
-        return_db_connection(conn)
+async def submit_quiz(request: Request, quiz_id: int, data: QuizSubmission, user=Depends(get_current_user)):
+    """Student endpoint - submit answers ({question_id: answer}); the score is computed server-side"""
+    answer_key = await get_answer_key(quiz_id)
+    if not answer_key:
+        raise HTTPException(status_code=404, detail="Quiz not found or has no questions")
+    student_id = await resolve_student_id(user)
+    if not student_id:
         raise HTTPException(status_code=400, detail="Student profile not found")
-    student_id = user_row["student_id"]
-    
-    cursor.execute("SELECT id FROM quiz_submissions WHERE quiz_id=%s AND student_id=%s", (quiz_id, student_id))
-    if cursor.fetchone():
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=400, detail="Already submitted")
-    cursor.execute(
-        "INSERT INTO quiz_submissions (quiz_id, student_id, score) VALUES (%s, %s, %s) RETURNING id",
-        (quiz_id, student_id, score)
-    )
-    submission_id = cursor.fetchone()['id']
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
-    return {"id": submission_id, "quiz_id": quiz_id, "student_id": student_id}
\ No newline at end of file
+    graded = grade(answer_key, data.answers)
+    
+    async with async_cursor() as cursor:
+        await cursor.execute(
+            """
+            INSERT INTO quiz_submissions (quiz_id, student_id, score, answers, correct_count, total_questions, graded_at)
+            VALUES (%s, %s, %s, %s::jsonb, %s, %s, CURRENT_TIMESTAMP)
+            ON CONFLICT (quiz_id, student_id) DO NOTHING
+            RETURNING id
+            """,
+            (quiz_id, student_id, graded["score"], json.dumps(data.answers), graded["correct"], graded["total"])
+        )
+        submission = await cursor.fetchone()
+        if not submission:
+            raise HTTPException(status_code=400, detail="Already submitted")
+        submission_id = submission['id']
+        await cursor.execute(
+            "SELECT refresh_gradebook(course_id, %s::int[]) FROM quizzes WHERE id=%s",
+            ([student_id], quiz_id)
+        )
+    cache_invalidate(f"dashboard:student:{student_id}")
+    
+    return {
+        "id": submission_id,
+        "quiz_id": quiz_id,
+        "student_id": student_id,
+        "score": graded["score"],
+        "correct": graded["correct"],
+        "total": graded["total"],
+        "results": graded["results"]
+    }
+
+@router.post("/{quiz_id}/regrade")
+@limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
+async def regrade_quiz(request: Request, quiz_id: int, user=Depends(get_current_user)):
+    """Teacher-only endpoint - rescore every stored submission against the quiz's current questions"""
+    check_teacher_role(user)
+    
+    # Loaded before the cursor so a cache miss doesn't hold a second pool connection
+    answer_key = await get_answer_key(quiz_id)
+    async with async_cursor() as cursor:
+        await _get_owned_quiz(cursor, quiz_id, user, "regrade questions for this quiz")
+        if not answer_key:
+            raise HTTPException(status_code=409, detail="Quiz has no questions; existing scores were left unchanged")
+        await cursor.execute("SELECT id, student_id, answers FROM quiz_submissions WHERE quiz_id=%s AND answers IS NOT NULL", (quiz_id,))
+        submissions = await cursor.fetchall()
+        
+        ids, scores, correct, totals = [], [], [], []
+        for submission in submissions:
+            graded = grade(answer_key, submission["answers"] or {})
+            ids.append(submission["id"])
+            scores.append(graded["score"])
+            correct.append(graded["correct"])
+            totals.append(graded["total"])
+        
+        if ids:
+            await cursor.execute("""
+                UPDATE quiz_submissions s
+                SET score = x.score, correct_count = x.correct, total_questions = x.total, graded_at = CURRENT_TIMESTAMP
+                FROM unnest(%s::int[], %s::float8[], %s::int[], %s::int[]) AS x(id, score, correct, total)
+                WHERE s.id = x.id
+            """, (ids, scores, correct, totals))
+            await cursor.execute(
+                "SELECT refresh_gradebook(course_id, ARRAY(SELECT student_id FROM quiz_submissions WHERE quiz_id=%s)) FROM quizzes WHERE id=%s",
+                (quiz_id, quiz_id)
+            )
+    
+    if submissions:
+        cache_invalidate(*{f"dashboard:student:{submission['student_id']}" for submission in submissions})
+    return {"quiz_id": quiz_id, "regraded": len(ids)}
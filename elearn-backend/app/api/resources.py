@@ -2,46 +2,63 @@ from fastapi import APIRouter, HTTPException, Body, Depends, Request, Query
 from pydantic import BaseModel
 from slowapi import Limiter
 from slowapi.util import get_remote_address
-from app.db import get_db_connection, return_db_connection, cache_get, cache_set
+from app.db import async_cursor, cache_get, cache_set, cache_invalidate
 from app.api.auth import get_current_user
 from app.core.security import sanitize_string, validate_url, check_teacher_role
 from app.core.config import RATE_LIMIT_PER_MINUTE
+from app.core.pagination import keyset_condition, next_cursor
 
 limiter = Limiter(key_func=get_remote_address)
 
 router = APIRouter(prefix="/resources", tags=["resources"])
 
+async def _get_owned_resource(cursor, resource_id: int, user: dict, action: str):
+    """Resource row with its course's instructor; 404 if missing, 403 if not the caller's course"""
+    await cursor.execute("SELECT r.*, c.instructor_id FROM resources r JOIN courses c ON r.course_id = c.id WHERE r.id=%s", (resource_id,))
+    resource = await cursor.fetchone()
+    if not resource:
+        raise HTTPException(status_code=404, detail="Resource not found")
+    if resource["instructor_id"] != user.get("teacher_id"):
+        raise HTTPException(status_code=403, detail=f"Not authorized to {action} this resource")
+    return resource
+
 @router.get("/")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
-async def list_resources(request: Request, course_id: int = None, skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=500)):
-    """Get resources with pagination and caching"""
-    cache_key = f"resources:{course_id}:{skip}:{limit}"
+async def list_resources(request: Request, course_id: int = None, skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=500), after: str = Query(None)):
+    """Get resources with pagination and caching; pass a previous next_cursor as after to page by keyset"""
+    cache_key = f"resources:{course_id}:{skip}:{limit}:{after}"
     cached_result = cache_get(cache_key)
     if cached_result:
         return cached_result
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    
-    try:
-        cursor = conn.cursor()
+    async with async_cursor() as cursor:
+        conditions = []
+        params = []
         if course_id:
-            cursor.execute("SELECT COUNT(*) as count FROM resources WHERE course_id=%s", (course_id,))
-            total = cursor.fetchone()['count']
-            cursor.execute("SELECT * FROM resources WHERE course_id=%s ORDER BY id DESC LIMIT %s OFFSET %s", (course_id, limit, skip))
-        else:
-            cursor.execute("SELECT COUNT(*) as count FROM resources")
-            total = cursor.fetchone()['count']
-            cursor.execute("SELECT * FROM resources ORDER BY id DESC LIMIT %s OFFSET %s", (limit, skip))
-        resources = cursor.fetchall()
+            conditions.append("course_id=%s")
+            params.append(course_id)
+        list_tag = f"resources:course:{course_id}" if course_id else "resources:all"
         
-        result = {"data": resources, "total": total, "skip": skip, "limit": limit}
-        cache_set(cache_key, result, ttl_seconds=600)
-        return result
-    finally:
-        cursor.close()
-        return_db_connection(conn)
+        count_key = f"count:resources:{course_id}"
+        total = cache_get(count_key)
+        if total is None:
+            where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+            await cursor.execute(f"SELECT COUNT(*) as count FROM resources{where_clause}", params)
+            total = (await cursor.fetchone())['count']
+            cache_set(count_key, total, ttl_seconds=600, tags=[list_tag])
+        
+        if after:
+            condition, values = keyset_condition(["id"], after)
+            conditions.append(condition)
+            params.extend(values)
+        where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+        params.extend([limit, 0 if after else skip])
+        await cursor.execute(f"SELECT * FROM resources{where_clause} ORDER BY id DESC LIMIT %s OFFSET %s", params)
+        resources = await cursor.fetchall()
+    
+    result = {"data": resources, "total": total, "skip": skip, "limit": limit, "next_cursor": next_cursor(resources, ["id"], limit)}
+    cache_set(cache_key, result, ttl_seconds=600, tags=[list_tag])
+    return result
 
 class ResourceCreate(BaseModel):
     course_id: int
@@ -59,31 +76,19 @@ async def create_resource(request: Request, resource: ResourceCreate = Body(...)
     url = validate_url(resource.url)
     resource_type = sanitize_string(resource.type, max_length=50) if resource.type else None
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM courses WHERE id=%s", (resource.course_id,))
-    course = cursor.fetchone()
-    if not course:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Course not found")
-    if course["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to create resources for this course")
-    
-    cursor.execute(
-        "INSERT INTO resources (course_id, name, url, type) VALUES (%s, %s, %s, %s) RETURNING id",
-        (resource.course_id, name, url, resource_type)
-    )
-    resource_id = cursor.fetchone()['id']
-    conn.commit()
-    cursor.execute("SELECT * FROM resources WHERE id=%s", (resource_id,))
-    new_resource = cursor.fetchone()
-    cursor.close()
-    return_db_connection(conn)
+    async with async_cursor() as cursor:
+        await cursor.execute("SELECT id, instructor_id FROM courses WHERE id=%s", (resource.course_id,))
+        course = await cursor.fetchone()
+        if not course:
+            raise HTTPException(status_code=404, detail="Course not found")
+        if course["instructor_id"] != user.get("teacher_id"):
+            raise HTTPException(status_code=403, detail="Not authorized to create resources for this course")
+        await cursor.execute(
+            "INSERT INTO resources (course_id, name, url, type) VALUES (%s, %s, %s, %s) RETURNING *",
+            (resource.course_id, name, url, resource_type)
+        )
+        new_resource = await cursor.fetchone()
+    cache_invalidate("resources:all", f"resources:course:{resource.course_id}")
     if not new_resource:
         raise HTTPException(status_code=500, detail="Failed to fetch new resource after insert")
     return new_resource
@@ -94,22 +99,6 @@ async def update_resource(request: Request, resource_id: int, user=Depends(get_c
     """Teacher-only endpoint - update resources in own courses"""
     check_teacher_role(user)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT r.*, c.instructor_id FROM resources r JOIN courses c ON r.course_id = c.id WHERE r.id=%s", (resource_id,))
-    resource = cursor.fetchone()
-    if not resource:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Resource not found")
-    
-    if resource["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to update this resource")
-    
     update_fields = []
     params = []
     if name is not None:
@@ -122,14 +111,13 @@ async def update_resource(request: Request, resource_id: int, user=Depends(get_c
         update_fields.append("type=%s")
         params.append(sanitize_string(type, max_length=50))
     if not update_fields:
-        cursor.close()
-        return_db_connection(conn)
         raise HTTPException(status_code=400, detail="No fields to update")
     params.append(resource_id)
-    cursor.execute(f"UPDATE resources SET {', '.join(update_fields)} WHERE id=%s", tuple(params))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
+    
+    async with async_cursor() as cursor:
+        resource = await _get_owned_resource(cursor, resource_id, user, "update")
+        await cursor.execute(f"UPDATE resources SET {', '.join(update_fields)} WHERE id=%s", tuple(params))
+    cache_invalidate("resources:all", f"resources:course:{resource['course_id']}")
     return {"id": resource_id, "updated": True}
 
 @router.delete("/{resource_id}")
@@ -138,24 +126,8 @@ async def delete_resource(request: Request, resource_id: int, user=Depends(get_c
     """Teacher-only endpoint - delete resources in own courses"""
     check_teacher_role(user)
     
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT r.*, c.instructor_id FROM resources r JOIN courses c ON r.course_id = c.id WHERE r.id=%s", (resource_id,))
-    resource = cursor.fetchone()
-    if not resource:
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=404, detail="Resource not found")
-    
-    if resource["instructor_id"] != user.get("teacher_id"):
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=403, detail="Not authorized to delete this resource")
-    
-    cursor.execute("DELETE FROM resources WHERE id=%s", (resource_id,))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
-    return {"id": resource_id, "deleted": True}
\ No newline at end of file
+    async with async_cursor() as cursor:
+        resource = await _get_owned_resource(cursor, resource_id, user, "delete")
+        await cursor.execute("DELETE FROM resources WHERE id=%s", (resource_id,))
+    cache_invalidate("resources:all", f"resources:course:{resource['course_id']}")
+    return {"id": resource_id, "deleted": True}
@@ -0,0 +1,83 @@
+from fastapi import APIRouter, HTTPException, Request, Query
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+import html
+from app.db import fetch_all, cached_query
+from app.core.config import RATE_LIMIT_PER_MINUTE
+
+limiter = Limiter(key_func=get_remote_address)
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+# type -> (table alias + FROM, title column, body column, course_id column)
+SEARCH_SOURCES = {
+    "course": ("courses s", "s.title", "s.description", "s.id"),
+    "lesson": ("lessons s", "s.title", "s.content", "s.course_id"),
+    "post": ("informal_posts s", "s.title", "s.content", "NULL::int"),
+}
+
+SOURCE_TAGS = {
+    "course": "courses",
+    "lesson": "lessons:all",
+    "post": "informal_posts:all",
+}
+
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2"
+
+@router.get("/")
+@limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
+async def search(
+    request: Request,
+    q: str = Query(..., min_length=2, max_length=200),
+    type: str = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=50)
+):
+    """
+    Public endpoint - Ranked full-text search over courses, lessons and informal posts
+    - q: search text (supports "quoted phrases", OR and -exclusions)
+    - type: comma-separated subset of course, lesson, post (default: all)
+    - snippet: matching excerpt with hits wrapped in <mark>; everything else is HTML-escaped
+    """
+    types = [t.strip() for t in type.split(",") if t.strip()] if type else list(SEARCH_SOURCES)
+    unknown = [t for t in types if t not in SEARCH_SOURCES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search type: {', '.join(unknown)}")
+
+    cache_key = f"search:{q.strip().lower()}:{','.join(sorted(types))}:{skip}:{limit}"
+    return await cached_query(
+        cache_key,
+        lambda: _run_search(q, types, skip, limit),
+        ttl_seconds=60,
+        tags=[SOURCE_TAGS[t] for t in types]
+    )
+
+async def _run_search(q: str, types: list, skip: int, limit: int):
+    parts = []
+    for t in types:
+        source, title, body, course_id = SEARCH_SOURCES[t]
+        parts.append(
+            f"SELECT '{t}' AS type, s.id, {title} AS title, {body} AS body, {course_id} AS course_id, "
+            f"ts_rank(s.search_vector, q.query) AS rank "
+            f"FROM {source}, q WHERE s.search_vector @@ q.query"
+        )
+    # rank and page first, then build headlines only for the rows being returned
+    rows = await fetch_all(
+        f"""
+        WITH q AS (SELECT websearch_to_tsquery('english', %s) AS query),
+        hits AS (
+            {' UNION ALL '.join(parts)}
+            ORDER BY rank DESC, id DESC
+            LIMIT %s OFFSET %s
+        )
+        SELECT hits.type, hits.id, hits.title, hits.course_id, hits.rank,
+            ts_headline('english', coalesce(hits.body, ''), q.query, %s) AS snippet
+        FROM hits, q
+        ORDER BY hits.rank DESC, hits.id DESC
+        """,
+        (q, limit, skip, HEADLINE_OPTIONS)
+    )
+    for row in rows:
+        row["rank"] = round(float(row["rank"]), 4)
+        row["snippet"] = html.escape(row["snippet"]).replace("&lt;mark&gt;", "<mark>").replace("&lt;/mark&gt;", "</mark>")
+    return {"data": rows, "query": q, "types": types, "skip": skip, "limit": limit}
@@ -1,54 +1,55 @@
 from fastapi import APIRouter, Depends, HTTPException, Body
-from app.db import get_db_connection, return_db_connection
+from app.db import db_cursor, cache_invalidate
 from app.api.auth import get_current_user
 
 router = APIRouter(prefix="/topics", tags=["Topics"])
 
+FEED_BACKFILL_LIMIT = 200
+
 @router.get("/", summary="List all topics")
 def list_topics():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM topics")
-    topics = cursor.fetchall()
-    cursor.close()
-    return_db_connection(conn)
-    return topics
+    with db_cursor() as cursor:
+        cursor.execute("SELECT * FROM topics")
+        return cursor.fetchall()
 
 @router.get("/followed", summary="List topics followed by current user")
 def get_followed_topics(user=Depends(get_current_user)):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT t.* FROM topics t
-        JOIN followed_topics f ON t.id = f.topic_id
-        WHERE f.user_id = %s
-    """, (user["id"],))
-    topics = cursor.fetchall()
-    cursor.close()
-    return_db_connection(conn)
-    return topics
+    with db_cursor() as cursor:
+        cursor.execute("""
+            SELECT t.* FROM topics t
+            JOIN followed_topics f ON t.id = f.topic_id
+            WHERE f.user_id = %s
+        """, (user["id"],))
+        return cursor.fetchall()
 
 @router.post("/follow", summary="Follow a topic")
 def follow_topic(topic_id: int = Body(...), user=Depends(get_current_user)):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT 1 FROM followed_topics WHERE user_id=%s AND topic_id=%s", (user["id"], topic_id))
-    if cursor.fetchone():
-        cursor.close()
-        return_db_connection(conn)
-        raise HTTPException(status_code=400, detail="Already following this topic")
-    cursor.execute("INSERT INTO followed_topics (user_id, topic_id) VALUES (%s, %s)", (user["id"], topic_id))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
+    with db_cursor() as cursor:
+        cursor.execute("SELECT 1 FROM followed_topics WHERE user_id=%s AND topic_id=%s", (user["id"], topic_id))
+        if cursor.fetchone():
+            raise HTTPException(status_code=400, detail="Already following this topic")
+        cursor.execute("INSERT INTO followed_topics (user_id, topic_id) VALUES (%s, %s)", (user["id"], topic_id))
+        # seed the home feed with the topic's recent posts
+        cursor.execute("""
+            INSERT INTO informal_feed_items (user_id, post_id, created_at)
+            SELECT %s, p.id, p.created_at FROM informal_posts p
+            JOIN topics t ON t.name = p.topic
+            WHERE t.id = %s
+            ORDER BY p.created_at DESC
+            LIMIT %s
+            ON CONFLICT DO NOTHING
+        """, (user["id"], topic_id, FEED_BACKFILL_LIMIT))
+    cache_invalidate(f"informal_feed:user:{user['id']}")
     return {"success": True}
 
 @router.post("/unfollow", summary="Unfollow a topic")
 def unfollow_topic(topic_id: int = Body(...), user=Depends(get_current_user)):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM followed_topics WHERE user_id=%s AND topic_id=%s", (user["id"], topic_id))
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
-    return {"success": True}
\ No newline at end of file
+    with db_cursor() as cursor:
+        cursor.execute("DELETE FROM followed_topics WHERE user_id=%s AND topic_id=%s", (user["id"], topic_id))
+        cursor.execute("""
+            DELETE FROM informal_feed_items f
+            USING informal_posts p, topics t
+            WHERE f.user_id = %s AND f.post_id = p.id AND p.topic = t.name AND t.id = %s
+        """, (user["id"], topic_id))
+    cache_invalidate(f"informal_feed:user:{user['id']}")
+    return {"success": True}
@@ -1,6 +1,6 @@
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from app.db import get_db_connection, return_db_connection
+from app.db import fetch_one, execute
 from app.api.auth import get_current_user
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -8,14 +8,7 @@ router = APIRouter(prefix="/users", tags=["users"])
 @router.get("/me")
 async def get_user_me(current_user: dict = Depends(get_current_user)):
     user_id = current_user["id"]
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, email, first_name, last_name, phone, gender, state, city, bio, linkedin, github, avatar, role, teacher_id, student_id FROM users WHERE id=%s", (user_id,))
-    user = cursor.fetchone()
-    cursor.close()
-    return_db_connection(conn)
+    user = await fetch_one("SELECT id, email, first_name, last_name, phone, gender, state, city, bio, linkedin, github, avatar, role, teacher_id, student_id FROM users WHERE id=%s", (user_id,))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -31,12 +24,5 @@ async def update_user(request: Request, current_user: dict = Depends(get_current
     set_clause = ", ".join([f"{k}=%s" for k in updates.keys()])
     values = list(updates.values())
     values.append(user_id)
-    conn = get_db_connection()
-    if not conn:
-        raise HTTPException(status_code=500, detail="DB connection error")
-    cursor = conn.cursor()
-    cursor.execute(f"UPDATE users SET {set_clause} WHERE id=%s", values)
-    conn.commit()
-    cursor.close()
-    return_db_connection(conn)
+    await execute(f"UPDATE users SET {set_clause} WHERE id=%s", values)
     return {"success": True, "updated": updates}
\ No newline at end of file
@@ -0,0 +1,472 @@
+import json
+import os
+import select
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import date, datetime, time as dt_time, timedelta
+from decimal import Decimal
+from uuid import UUID
+
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 5000))
+CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024))
+CACHE_SWEEP_INTERVAL = int(os.environ.get('CACHE_SWEEP_INTERVAL', 60))
+CACHE_REFRESH_AHEAD_SECONDS = int(os.environ.get('CACHE_REFRESH_AHEAD_SECONDS', 30))
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', '')
+CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'edusphere:cache:')
+CACHE_INVALIDATION_CHANNEL = CACHE_KEY_PREFIX + 'invalidate'
+# Per-tag invalidation generations are kept at least this long (a load running longer than this is always discarded)
+CACHE_GENERATION_RETENTION = 600
+CACHE_GENERATION_MAX_TAGS = 10000
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+
+def _plain(data):
+    """Strip driver row types (RealDictRow etc.) so values serialize cleanly"""
+    if isinstance(data, dict):
+        return {k: _plain(v) for k, v in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_plain(v) for v in data]
+    return data
+
+
+def _approx_size(data):
+    """Rough footprint of a plain value, for the byte budget when nothing gets serialized"""
+    if isinstance(data, dict):
+        return 64 + sum(_approx_size(k) + _approx_size(v) for k, v in data.items())
+    if isinstance(data, list):
+        return 56 + sum(_approx_size(v) for v in data)
+    if isinstance(data, (str, bytes)):
+        return 49 + len(data)
+    return 24
+
+
+_JSON_TYPES = {
+    "__datetime__": (datetime, datetime.isoformat, datetime.fromisoformat),
+    "__date__": (date, date.isoformat, date.fromisoformat),
+    "__time__": (dt_time, dt_time.isoformat, dt_time.fromisoformat),
+    "__timedelta__": (timedelta, timedelta.total_seconds, lambda s: timedelta(seconds=s)),
+    "__decimal__": (Decimal, str, Decimal),
+    "__uuid__": (UUID, str, UUID),
+}
+
+
+def _json_default(value):
+    for tag, (kind, encode, _) in _JSON_TYPES.items():
+        if isinstance(value, kind):
+            return {tag: encode(value)}
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"{type(value).__name__} is not cacheable")
+
+
+def _json_object_hook(obj):
+    if len(obj) == 1:
+        tag, value = next(iter(obj.items()))
+        if tag in _JSON_TYPES:
+            return _JSON_TYPES[tag][2](value)
+    return obj
+
+
+def _encode(value) -> bytes:
+    """
+    JSON (never pickle: anyone who can write to Redis could otherwise run code in every worker).
+    Dates, decimals and UUIDs round-trip; dict keys come back as strings.
+    """
+    return json.dumps(value, default=_json_default, separators=(",", ":")).encode()
+
+
+def _decode(payload):
+    return json.loads(payload, object_hook=_json_object_hook)
+
+
+def _dispatch(payload, on_clear, on_invalidate):
+    """Apply an invalidation message received from another worker"""
+    kind, target = _decode(payload)
+    if kind == "tags":
+        on_invalidate(target)
+    else:
+        on_clear(target)
+
+
+class CacheItem:
+    def __init__(self, data, ttl_seconds=300, size=0, tags=()):
+        self.data = data
+        self.expires_at = time.time() + ttl_seconds
+        self.size = size
+        self.tags = tags
+
+    def is_expired(self):
+        return time.time() > self.expires_at
+
+
+class LRUCache:
+    """
+    Bounded in-process tier: evicts least recently used entries past the entry/byte limits.
+    Keeps a reverse index from dependency tag to keys so invalidation only touches affected entries.
+    Every invalidation also bumps a generation counter, recorded per tag, so a value loaded from
+    data read before the invalidation can be refused (see set(since=...)).
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._tags = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._generation = 0
+        # tag -> (generation it was last invalidated at, when)
+        self._tag_generations = {}
+        # loads that started at or before this generation are refused (pattern clears, pruned tags)
+        self._generation_floor = 0
+
+    def get(self, key):
+        item = self.get_item(key)
+        return item.data if item is not None else None
+
+    def get_item(self, key):
+        """Live CacheItem for key (bumped to most recently used), or None"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item.is_expired():
+                self._remove(key)
+                return None
+            self._items.move_to_end(key)
+            return item
+
+    def generation(self):
+        """Current invalidation generation; pass it back as set(since=...) once the value is loaded"""
+        with self._lock:
+            return self._generation
+
+    def set(self, key, data, ttl_seconds=300, size=0, tags=(), since=None):
+        """
+        Store data; returns False (and stores nothing) when since is given and any of the
+        tags was invalidated after that generation, i.e. the value may predate a write
+        """
+        with self._lock:
+            if since is not None and self._invalidated_since(tags, since):
+                return False
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = CacheItem(data, ttl_seconds, size, tags)
+            self._bytes += size
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while self._items and (len(self._items) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._items)))
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self, pattern=None):
+        with self._lock:
+            self._generation += 1
+            self._generation_floor = self._generation
+            if pattern is None:
+                self._items.clear()
+                self._tags.clear()
+                self._bytes = 0
+                return
+            for k in [k for k in self._items if pattern in k]:
+                self._remove(k)
+
+    def invalidate(self, tags):
+        """Drop every entry registered under any of the given tags"""
+        with self._lock:
+            self._generation += 1
+            now = time.time()
+            for tag in tags:
+                self._tag_generations[tag] = (self._generation, now)
+                for k in list(self._tags.get(tag, ())):
+                    self._remove(k)
+            if len(self._tag_generations) > CACHE_GENERATION_MAX_TAGS:
+                self._prune_generations(now)
+
+    def sweep(self):
+        """Drop every expired entry; returns how many were removed"""
+        with self._lock:
+            expired = [k for k, item in self._items.items() if item.is_expired()]
+            for k in expired:
+                self._remove(k)
+            return len(expired)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._items), "tags": len(self._tags), "bytes": self._bytes, "max_entries": self.max_entries, "max_bytes": self.max_bytes}
+
+    def _invalidated_since(self, tags, since):
+        if since < self._generation_floor:
+            return True
+        return any(self._tag_generations.get(tag, (0,))[0] > since for tag in tags)
+
+    def _prune_generations(self, now):
+        cutoff = now - CACHE_GENERATION_RETENTION
+        for tag, (generation, at) in list(self._tag_generations.items()):
+            if at < cutoff:
+                del self._tag_generations[tag]
+                self._generation_floor = max(self._generation_floor, generation)
+
+    def _remove(self, key):
+        item = self._items.pop(key, None)
+        if item is None:
+            return
+        self._bytes -= item.size
+        for tag in item.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class RedisCache:
+    """Shared tier: values live in Redis and invalidations are broadcast over pub/sub"""
+
+    def __init__(self, url, on_clear, on_invalidate):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._on_clear = on_clear
+        self._on_invalidate = on_invalidate
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+
+    def get(self, key):
+        return self._redis.get(CACHE_KEY_PREFIX + key)
+
+    def set(self, key, payload, ttl_seconds=300, tags=()):
+        ttl = max(1, int(ttl_seconds))
+        pipe = self._redis.pipeline()
+        pipe.setex(CACHE_KEY_PREFIX + key, ttl, payload)
+        for tag in tags:
+            tag_key = CACHE_KEY_PREFIX + "tag:" + tag
+            pipe.sadd(tag_key, CACHE_KEY_PREFIX + key)
+            pipe.expire(tag_key, ttl, gt=True)
+            pipe.expire(tag_key, ttl, nx=True)
+        pipe.execute()
+
+    def clear(self, pattern=None):
+        match = CACHE_KEY_PREFIX + (f"*{pattern}*" if pattern else "*")
+        keys = list(self._redis.scan_iter(match=match, count=500))
+        if keys:
+            self._redis.delete(*keys)
+        self._redis.publish(CACHE_INVALIDATION_CHANNEL, _encode(["pattern", pattern]))
+
+    def invalidate(self, tags):
+        tag_keys = [CACHE_KEY_PREFIX + "tag:" + tag for tag in tags]
+        keys = self._redis.sunion(tag_keys)
+        self._redis.delete(*keys, *tag_keys)
+        self._redis.publish(CACHE_INVALIDATION_CHANNEL, _encode(["tags", list(tags)]))
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                for message in pubsub.listen():
+                    _dispatch(message["data"], self._on_clear, self._on_invalidate)
+            except Exception as e:
+                print(f"Cache invalidation listener error: {e}")
+                time.sleep(1)
+
+
+class PgNotifyBus:
+    """
+    Stand-in for the shared tier when no Redis is configured: values stay in each worker's
+    LRU tier, but invalidations reach every worker through Postgres LISTEN/NOTIFY.
+    connect() opens a dedicated connection; the listener thread owns it and also sends
+    outgoing messages, so cache_invalidate() never waits on the database.
+    """
+
+    def __init__(self, connect, on_clear, on_invalidate):
+        self._connect = connect
+        self._on_clear = on_clear
+        self._on_invalidate = on_invalidate
+        self._outbox = deque()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_w, False)
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+
+    def clear(self, pattern=None):
+        self._publish(["pattern", pattern])
+
+    def invalidate(self, tags):
+        chunk, size = [], 0
+        for tag in tags:
+            tag_size = len(tag.encode()) + 4
+            if chunk and size + tag_size > NOTIFY_PAYLOAD_LIMIT:
+                self._publish(["tags", chunk])
+                chunk, size = [], 0
+            chunk.append(tag)
+            size += tag_size
+        if chunk:
+            self._publish(["tags", chunk])
+
+    def _publish(self, message):
+        self._outbox.append(_encode(message).decode())
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass
+
+    def _listen(self):
+        missed = False
+        while True:
+            conn = None
+            try:
+                conn = self._connect()
+                conn.autocommit = True
+                cursor = conn.cursor()
+                cursor.execute('LISTEN "%s"' % CACHE_INVALIDATION_CHANNEL.replace('"', '""'))
+                if missed:
+                    # Invalidations from other workers were lost while disconnected
+                    self._on_clear(None)
+                    missed = False
+                while True:
+                    while self._outbox:
+                        cursor.execute("SELECT pg_notify(%s, %s)", (CACHE_INVALIDATION_CHANNEL, self._outbox[0]))
+                        self._outbox.popleft()
+                    ready, _, _ = select.select([conn, self._wake_r], [], [], 5)
+                    if self._wake_r in ready:
+                        os.read(self._wake_r, 4096)
+                    conn.poll()
+                    while conn.notifies:
+                        _dispatch(conn.notifies.pop(0).payload, self._on_clear, self._on_invalidate)
+            except Exception as e:
+                print(f"Cache invalidation bus error: {e}")
+                missed = True
+                time.sleep(1)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+
+local_cache = LRUCache()
+# Shared value tier (Redis), if configured
+shared_cache = None
+# Whatever broadcasts invalidations to the other workers: the Redis tier, or the Postgres stand-in
+invalidation_bus = None
+
+if CACHE_REDIS_URL:
+    try:
+        shared_cache = RedisCache(CACHE_REDIS_URL, local_cache.clear, local_cache.invalidate)
+        invalidation_bus = shared_cache
+    except Exception as e:
+        print(f"Error connecting shared cache, falling back to Postgres invalidation broadcast: {e}")
+        shared_cache = None
+
+
+def start_invalidation_bus(connect):
+    """
+    Broadcast invalidations through Postgres when there is no Redis tier (call on app startup).
+    connect() must return a new psycopg2 connection.
+    """
+    global invalidation_bus
+    if invalidation_bus is None:
+        invalidation_bus = PgNotifyBus(connect, local_cache.clear, local_cache.invalidate)
+
+
+def _sweep_loop():
+    while True:
+        time.sleep(CACHE_SWEEP_INTERVAL)
+        try:
+            local_cache.sweep()
+        except Exception as e:
+            print(f"Cache sweep error: {e}")
+
+
+threading.Thread(target=_sweep_loop, daemon=True).start()
+
+
+def cache_get(key):
+    """Get from cache if not expired (local tier first, then the shared tier)"""
+    return cache_get_with_ttl(key)[0]
+
+
+def cache_get_with_ttl(key):
+    """Like cache_get, but returns (data, seconds until expiry); (None, 0) on a miss"""
+    item = local_cache.get_item(key)
+    if item is not None:
+        return item.data, item.expires_at - time.time()
+    if shared_cache is None:
+        return None, 0
+    try:
+        payload = shared_cache.get(key)
+    except Exception as e:
+        print(f"Shared cache get error: {e}")
+        return None, 0
+    if payload is None:
+        return None, 0
+    entry = _decode(payload)
+    data, expires_at, tags = entry["data"], entry["expires_at"], tuple(entry["tags"])
+    ttl_left = expires_at - time.time()
+    if ttl_left <= 0:
+        return None, 0
+    local_cache.set(key, data, ttl_left, size=len(payload), tags=tags)
+    return data, ttl_left
+
+
+def cache_generation():
+    """Snapshot to pass as cache_set(since=...) before loading a value"""
+    return local_cache.generation()
+
+
+def cache_set(key, data, ttl_seconds=300, tags=(), since=None):
+    """
+    Set cache with TTL.
+    tags: dependency tags (e.g. "courses", "lessons:course:3") that cache_invalidate() can drop the entry by
+    since: a cache_generation() taken before the value was loaded; if any of the tags has been
+    invalidated since then the value may be stale and is not cached
+    """
+    data = _plain(data)
+    tags = tuple(tags)
+    if shared_cache is None:
+        local_cache.set(key, data, ttl_seconds, size=_approx_size(data), tags=tags, since=since)
+        return
+    payload = _encode({"data": data, "expires_at": time.time() + ttl_seconds, "tags": tags})
+    if not local_cache.set(key, data, ttl_seconds, size=len(payload), tags=tags, since=since):
+        return
+    try:
+        shared_cache.set(key, payload, ttl_seconds, tags)
+    except Exception as e:
+        print(f"Shared cache set error: {e}")
+
+
+def cache_clear(pattern=None):
+    """Clear cache by pattern or all, in every worker"""
+    local_cache.clear(pattern)
+    if invalidation_bus is not None:
+        try:
+            invalidation_bus.clear(pattern)
+        except Exception as e:
+            print(f"Shared cache clear error: {e}")
+
+
+def cache_invalidate(*tags):
+    """Drop every entry registered under any of the given tags, in every worker"""
+    if not tags:
+        return
+    local_cache.invalidate(tags)
+    if invalidation_bus is not None:
+        try:
+            invalidation_bus.invalidate(tags)
+        except Exception as e:
+            print(f"Shared cache invalidate error: {e}")
+
+
+def cache_stats():
+    """Local tier occupancy, plus whether a shared tier and an invalidation broadcast are attached"""
+    stats = local_cache.stats()
+    stats["shared"] = shared_cache is not None
+    stats["invalidation_bus"] = type(invalidation_bus).__name__ if invalidation_bus is not None else None
+    return stats
@@ -5,6 +5,9 @@ load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback-dev-key-change-in-production")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
+# RS*/ES*/PS* algorithms: PEM text or a path to a PEM file (the public key can be derived from the private one)
+JWT_PRIVATE_KEY = os.getenv("JWT_PRIVATE_KEY", "")
+JWT_PUBLIC_KEY = os.getenv("JWT_PUBLIC_KEY", "")
 
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_USER = os.getenv("DB_USER", "root")
@@ -15,6 +18,11 @@ OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral:7b")
 
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "replicate") 
+LLM_PROVIDERS = [p.strip() for p in os.getenv("LLM_PROVIDERS", LLM_PROVIDER).split(",") if p.strip()]
+LLM_HEDGE_AFTER_MS = int(os.getenv("LLM_HEDGE_AFTER_MS", "0"))
+LLM_REQUEST_TIMEOUT_SECONDS = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "60"))
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("LLM_CIRCUIT_FAILURE_THRESHOLD", "3"))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
 REPLICATE_API_KEY = os.getenv("REPLICATE_API_KEY", "")
 REPLICATE_MODEL = os.getenv("REPLICATE_MODEL", "replicate/mistral-7b-instruct-v0.2")
  
@@ -24,9 +32,34 @@ GEMINI_MODEL = os.getenv("GEMINI_MODEL", "models/gemini-2.5-flash")
 JDOODLE_CLIENT_ID = os.getenv("JDOODLE_CLIENT_ID", "")
 JDOODLE_CLIENT_SECRET = os.getenv("JDOODLE_CLIENT_SECRET", "")
 
+OLLAMA_TIMEOUT_SECONDS = float(os.getenv("OLLAMA_TIMEOUT_SECONDS", "60"))
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60"))
+JDOODLE_TIMEOUT_SECONDS = float(os.getenv("JDOODLE_TIMEOUT_SECONDS", "20"))
+OLLAMA_MAX_CONCURRENCY = int(os.getenv("OLLAMA_MAX_CONCURRENCY", "4"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "20"))
+JDOODLE_MAX_CONCURRENCY = int(os.getenv("JDOODLE_MAX_CONCURRENCY", "10"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+
 RATE_LIMIT_PER_MINUTE = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
 RATE_LIMIT_AUTH_PER_MINUTE = int(os.getenv("RATE_LIMIT_AUTH_PER_MINUTE", "10"))
 
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+DASHBOARD_CACHE_TTL_SECONDS = int(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "120"))
+CERTIFICATE_CACHE_TTL_SECONDS = int(os.getenv("CERTIFICATE_CACHE_TTL_SECONDS", "86400"))
+
 AI_TUTOR_REQUESTS_PER_MINUTE = int(os.getenv("AI_TUTOR_REQUESTS_PER_MINUTE", "5")) 
 AI_TUTOR_REQUESTS_PER_HOUR = int(os.getenv("AI_TUTOR_REQUESTS_PER_HOUR", "30"))     
-AI_TUTOR_REQUESTS_PER_DAY = int(os.getenv("AI_TUTOR_REQUESTS_PER_DAY", "100"))      
\ No newline at end of file
+AI_TUTOR_REQUESTS_PER_DAY = int(os.getenv("AI_TUTOR_REQUESTS_PER_DAY", "100"))
+
+AI_TUTOR_CACHE_TTL_SECONDS = int(os.getenv("AI_TUTOR_CACHE_TTL_SECONDS", "3600"))
+AI_TUTOR_SEMANTIC_CACHE_THRESHOLD = float(os.getenv("AI_TUTOR_SEMANTIC_CACHE_THRESHOLD", "0"))
+AI_TUTOR_SEMANTIC_CACHE_SIZE = int(os.getenv("AI_TUTOR_SEMANTIC_CACHE_SIZE", "1000"))
+
+REPLICATE_PROMPT_TOKEN_BUDGET = int(os.getenv("REPLICATE_PROMPT_TOKEN_BUDGET", "3000"))
+OLLAMA_PROMPT_TOKEN_BUDGET = int(os.getenv("OLLAMA_PROMPT_TOKEN_BUDGET", "3000"))
+GEMINI_PROMPT_TOKEN_BUDGET = int(os.getenv("GEMINI_PROMPT_TOKEN_BUDGET", "12000"))
+AI_TUTOR_SUMMARY_TTL_SECONDS = int(os.getenv("AI_TUTOR_SUMMARY_TTL_SECONDS", "3600"))
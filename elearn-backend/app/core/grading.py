@@ -0,0 +1,62 @@
+"""
+Quiz grading engine.
+Answer keys are loaded once per quiz into the query cache (invalidated through the
+quiz_answers:<quiz_id> tag whenever its questions change) and submissions are scored
+against them server-side, so correct answers never have to leave the server.
+"""
+import re
+from app.db import cached_query, cache_invalidate, fetch_all
+
+ANSWER_KEY_TTL_SECONDS = 3600
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_answer(answer) -> str:
+    """
+    Compare answers case- and whitespace-insensitively
+    """
+    return _SPACES.sub(" ", str(answer)).strip().casefold()
+
+
+async def _load_answer_key(quiz_id: int) -> dict:
+    rows = await fetch_all("SELECT id, correct_answer FROM quiz_questions WHERE quiz_id=%s", (quiz_id,))
+    return {row["id"]: normalize_answer(row["correct_answer"]) for row in rows}
+
+
+async def get_answer_key(quiz_id: int) -> dict:
+    """
+    question id -> normalized correct answer for a quiz
+    """
+    return await cached_query(
+        f"answer_key:{quiz_id}",
+        lambda: _load_answer_key(quiz_id),
+        ttl_seconds=ANSWER_KEY_TTL_SECONDS,
+        tags=[f"quiz_answers:{quiz_id}"]
+    )
+
+
+def invalidate_answer_key(quiz_id: int):
+    """
+    Call after adding, importing or deleting a quiz's questions
+    """
+    cache_invalidate(f"quiz_answers:{quiz_id}")
+
+
+def grade(answer_key: dict, answers: dict) -> dict:
+    """
+    Score answers ({question id: answer}) against an answer key.
+    Unanswered questions count as wrong; answers to unknown questions are ignored.
+    """
+    results = {}
+    for question_id, correct in answer_key.items():
+        given = answers.get(str(question_id), answers.get(question_id))
+        results[question_id] = given is not None and normalize_answer(given) == correct
+    correct_count = sum(results.values())
+    total = len(answer_key)
+    return {
+        "score": round(100.0 * correct_count / total, 2) if total else 0.0,
+        "correct": correct_count,
+        "total": total,
+        "results": results,
+    }
@@ -0,0 +1,78 @@
+"""
+Shared async HTTP client for outbound calls (LLM providers, JDoodle).
+One pooled keep-alive client per worker, HTTP/2 when the h2 package is installed,
+and a per-provider timeout and concurrency limit.
+"""
+import asyncio
+import importlib.util
+from contextlib import asynccontextmanager
+import httpx
+from app.core.config import (
+    OLLAMA_TIMEOUT_SECONDS,
+    GEMINI_TIMEOUT_SECONDS,
+    JDOODLE_TIMEOUT_SECONDS,
+    OLLAMA_MAX_CONCURRENCY,
+    GEMINI_MAX_CONCURRENCY,
+    JDOODLE_MAX_CONCURRENCY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+)
+
+PROVIDER_TIMEOUTS = {
+    "ollama": OLLAMA_TIMEOUT_SECONDS,
+    "gemini": GEMINI_TIMEOUT_SECONDS,
+    "jdoodle": JDOODLE_TIMEOUT_SECONDS,
+}
+
+PROVIDER_SEMAPHORES = {
+    "ollama": asyncio.Semaphore(OLLAMA_MAX_CONCURRENCY),
+    "gemini": asyncio.Semaphore(GEMINI_MAX_CONCURRENCY),
+    "jdoodle": asyncio.Semaphore(JDOODLE_MAX_CONCURRENCY),
+}
+
+_client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared client, creating it on first use
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=30,
+            ),
+        )
+    return _client
+
+
+async def close_http_client():
+    """
+    Close the shared client (call on app shutdown)
+    """
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def provider_post(provider: str, url: str, **kwargs) -> httpx.Response:
+    """
+    POST to a provider within its concurrency limit and timeout
+    """
+    async with PROVIDER_SEMAPHORES[provider]:
+        return await get_http_client().post(url, timeout=PROVIDER_TIMEOUTS[provider], **kwargs)
+
+
+@asynccontextmanager
+async def provider_stream(provider: str, url: str, **kwargs):
+    """
+    Open a streaming POST to a provider; the slot is held until the body is consumed or closed
+    """
+    async with PROVIDER_SEMAPHORES[provider]:
+        async with get_http_client().stream("POST", url, timeout=PROVIDER_TIMEOUTS[provider], **kwargs) as response:
+            yield response
@@ -0,0 +1,234 @@
+"""
+Routing layer over the LLM providers.
+Tracks latency and errors per provider, trips a circuit breaker after repeated failures,
+fails over to the next configured provider, and can hedge a slow request with a second one.
+"""
+import asyncio
+import time
+from fastapi import HTTPException
+from app.core.config import (
+    LLM_PROVIDERS,
+    LLM_HEDGE_AFTER_MS,
+    LLM_REQUEST_TIMEOUT_SECONDS,
+    LLM_CIRCUIT_FAILURE_THRESHOLD,
+    LLM_CIRCUIT_RESET_SECONDS,
+)
+
+LATENCY_EWMA_ALPHA = 0.2
+
+
+class ProviderHealth:
+    """
+    Latency/error stats and circuit state for one provider.
+    closed: requests flow; open: skipped until the reset window passes;
+    half_open: a single probe request decides whether to close again.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probing = False
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.failures = 0
+        self.latency_ewma = None
+
+    def acquire(self) -> bool:
+        """Whether a request may be sent now (claims the probe slot when half-open)"""
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= LLM_CIRCUIT_RESET_SECONDS:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def release(self):
+        """Give back a probe slot without a verdict (request cancelled)"""
+        self.probing = False
+
+    def record_success(self, latency):
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.latency_ewma = latency if self.latency_ewma is None else (
+            LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * self.latency_ewma
+        )
+        if self.state != "closed":
+            print(f"LLM router: circuit for {self.name} closed")
+        self.state = "closed"
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.probing = False
+        if self.state == "half_open" or self.consecutive_failures >= LLM_CIRCUIT_FAILURE_THRESHOLD:
+            if self.state != "open":
+                print(f"LLM router: circuit for {self.name} opened after {self.consecutive_failures} failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def stats(self):
+        total = self.successes + self.failures
+        return {
+            "state": self.state,
+            "successes": self.successes,
+            "failures": self.failures,
+            "error_rate": round(self.failures / total, 4) if total else 0.0,
+            "latency_ms": round(self.latency_ewma * 1000) if self.latency_ewma is not None else None,
+        }
+
+
+_health = {name: ProviderHealth(name) for name in LLM_PROVIDERS}
+
+
+def _rank(name):
+    """
+    Routing order: closed circuits with no latency sample yet (so every provider gets measured),
+    then closed circuits by latency EWMA, then circuits waiting on a probe; ties keep config order
+    """
+    health = _health[name]
+    if health.state != "closed":
+        return (2, 0.0)
+    if health.latency_ewma is None:
+        return (0, 0.0)
+    return (1, health.latency_ewma)
+
+
+def _next_provider(tried: set):
+    """Fastest healthy provider not yet tried whose circuit admits a request"""
+    for name in sorted((n for n in LLM_PROVIDERS if n not in tried), key=_rank):
+        if _health[name].acquire():
+            return name
+    return None
+
+
+async def _attempt(provider: str, call):
+    health = _health[provider]
+    start = time.monotonic()
+    try:
+        result = await asyncio.wait_for(call(provider), timeout=LLM_REQUEST_TIMEOUT_SECONDS)
+    except asyncio.CancelledError:
+        health.release()
+        raise
+    except Exception as e:
+        health.record_failure()
+        print(f"LLM router: {provider} failed: {type(e).__name__}: {e}")
+        raise
+    health.record_success(time.monotonic() - start)
+    return result
+
+
+async def complete(call):
+    """
+    Run call(provider) -> answer against the fastest healthy provider.
+    On failure the next provider is tried; if LLM_HEDGE_AFTER_MS is set and the
+    request is still running after that long, the next fastest is raced against it.
+    Returns (provider, answer).
+    """
+    tried = set()
+    pending = {}
+    last_error = None
+
+    def launch():
+        provider = _next_provider(tried)
+        if provider is None:
+            return False
+        tried.add(provider)
+        pending[asyncio.ensure_future(_attempt(provider, call))] = provider
+        return True
+
+    if not launch():
+        raise HTTPException(status_code=503, detail="No LLM provider available")
+
+    try:
+        while pending:
+            hedge_after = LLM_HEDGE_AFTER_MS / 1000 if LLM_HEDGE_AFTER_MS > 0 and len(pending) == 1 else None
+            done, _ = await asyncio.wait(pending, timeout=hedge_after, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if launch():
+                    print(f"LLM router: hedging after {LLM_HEDGE_AFTER_MS}ms with {list(pending.values())[-1]}")
+                else:
+                    await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            for task in done:
+                provider = pending.pop(task)
+                if task.exception() is None:
+                    return provider, task.result()
+                last_error = task.exception()
+            if not pending:
+                launch()
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if isinstance(last_error, HTTPException):
+        raise last_error
+    raise HTTPException(status_code=502, detail=f"All LLM providers failed: {last_error}")
+
+
+async def stream(open_stream):
+    """
+    Yield tokens from open_stream(provider), an async generator.
+    Fails over until a provider produces its first token; after that the stream is committed.
+    """
+    tried = set()
+    last_error = None
+    while True:
+        provider = _next_provider(tried)
+        if provider is None:
+            break
+        tried.add(provider)
+        health = _health[provider]
+        tokens = None
+        start = time.monotonic()
+        try:
+            tokens = open_stream(provider)
+            first = await asyncio.wait_for(tokens.__anext__(), timeout=LLM_REQUEST_TIMEOUT_SECONDS)
+        except StopAsyncIteration:
+            health.record_success(time.monotonic() - start)
+            return
+        except asyncio.CancelledError:
+            health.release()
+            if tokens is not None:
+                await tokens.aclose()
+            raise
+        except Exception as e:
+            health.record_failure()
+            print(f"LLM router: {provider} stream failed: {type(e).__name__}: {e}")
+            if tokens is not None:
+                await tokens.aclose()
+            last_error = e
+            continue
+        health.record_success(time.monotonic() - start)
+
+        try:
+            yield first
+            async for token in tokens:
+                yield token
+        except (asyncio.CancelledError, GeneratorExit):
+            raise
+        except Exception:
+            health.record_failure()
+            raise
+        finally:
+            await tokens.aclose()
+        return
+
+    if last_error is None:
+        raise HTTPException(status_code=503, detail="No LLM provider available")
+    if isinstance(last_error, HTTPException):
+        raise last_error
+    raise HTTPException(status_code=502, detail=f"All LLM providers failed: {last_error}")
+
+
+def router_stats() -> dict:
+    """
+    Per-provider health for this worker, in routing order
+    """
+    return {
+        "providers": {name: _health[name].stats() for name in sorted(LLM_PROVIDERS, key=_rank)},
+        "hedge_after_ms": LLM_HEDGE_AFTER_MS,
+    }
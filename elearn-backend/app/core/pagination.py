@@ -0,0 +1,72 @@
+"""
+Keyset (cursor) pagination helpers.
+A cursor is an opaque token holding the sort-key values of the last row on a page,
+so the next page is an indexed range scan instead of an OFFSET walk.
+"""
+import base64
+import json
+from datetime import date, datetime
+from fastapi import HTTPException
+
+# Postgres BIGINT range; larger ids cannot come from a real row
+_MAX_KEY = 2 ** 63
+
+
+def encode_cursor(values: list) -> str:
+    """
+    Pack sort-key values into an opaque URL-safe token
+    """
+    plain = [v.isoformat() if isinstance(v, (datetime, date)) else v for v in values]
+    raw = json.dumps(plain, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> list:
+    """
+    Unpack a token produced by encode_cursor
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _key_value(column: str, value):
+    """
+    Check a decoded cursor value against its sort column: *_at columns take ISO
+    timestamps, every other key column is an integer (id, order_index)
+    """
+    if column.rsplit(".", 1)[-1].endswith("_at"):
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value)
+            except ValueError:
+                pass
+    elif isinstance(value, int) and not isinstance(value, bool) and -_MAX_KEY <= value < _MAX_KEY:
+        return value
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_condition(columns: list, after: str, descending: bool = True):
+    """
+    Build the WHERE fragment and params that select rows after the cursor
+    for ORDER BY <columns> (all DESC or all ASC)
+    """
+    values = [_key_value(column, value) for column, value in zip(columns, decode_cursor(after, len(columns)))]
+    op = "<" if descending else ">"
+    placeholders = ", ".join(["%s"] * len(columns))
+    return f"({', '.join(columns)}) {op} ({placeholders})", values
+
+
+def next_cursor(rows: list, keys: list, limit: int):
+    """
+    Cursor for the page after rows, or None when this is the last page
+    """
+    if len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor([last[k] for k in keys])
@@ -0,0 +1,115 @@
+"""
+Password hashing off the event loop.
+bcrypt runs in a small dedicated process pool so a burst of logins cannot stall
+unrelated requests on the worker; callers beyond PASSWORD_HASH_MAX_QUEUE are
+turned away with a 503 instead of piling up.
+"""
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from app.core.config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE
+
+# bcrypt only uses the first 72 bytes of a password
+BCRYPT_MAX_PASSWORD_LENGTH = 72
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = None
+_stats = {"running": 0, "queued": 0, "max_queued": 0, "completed": 0, "rejected": 0, "wait_seconds": 0.0, "run_seconds": 0.0}
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password[:BCRYPT_MAX_PASSWORD_LENGTH])
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return pwd_context.verify(password, hashed)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: workers must not inherit the parent's DB pools and sockets
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+async def _run(fn, *args):
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
+    if _slots.locked() and _stats["queued"] >= PASSWORD_HASH_MAX_QUEUE:
+        _stats["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+
+    queued_at = time.monotonic()
+    _stats["queued"] += 1
+    _stats["max_queued"] = max(_stats["max_queued"], _stats["queued"])
+    try:
+        await _slots.acquire()
+    finally:
+        _stats["queued"] -= 1
+    started_at = time.monotonic()
+    _stats["wait_seconds"] += started_at - queued_at
+    _stats["running"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), fn, *args)
+    finally:
+        _stats["running"] -= 1
+        _stats["completed"] += 1
+        _stats["run_seconds"] += time.monotonic() - started_at
+        _slots.release()
+
+
+async def hash_password(password: str) -> str:
+    """
+    bcrypt hash of password (truncated to 72 bytes), computed in the hashing pool
+    """
+    return await _run(_hash, password)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    """
+    Check password against a stored bcrypt hash in the hashing pool
+    """
+    if not hashed:
+        return False
+    return await _run(_verify, password, hashed)
+
+
+def shutdown_password_pool():
+    """Stop the hashing workers (call on app shutdown)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def password_pool_stats() -> dict:
+    """
+    Queue depth and timing for this worker's hashing pool
+    """
+    stats = dict(_stats)
+    completed = stats.pop("completed")
+    wait_seconds = stats.pop("wait_seconds")
+    run_seconds = stats.pop("run_seconds")
+    stats.update({
+        "workers": PASSWORD_HASH_WORKERS,
+        "max_queue": PASSWORD_HASH_MAX_QUEUE,
+        "bcrypt_rounds": BCRYPT_ROUNDS,
+        "completed": completed,
+        "avg_wait_ms": round(wait_seconds / completed * 1000, 1) if completed else 0.0,
+        "avg_run_ms": round(run_seconds / completed * 1000, 1) if completed else 0.0,
+    })
+    return stats
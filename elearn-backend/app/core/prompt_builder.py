@@ -0,0 +1,128 @@
+"""
+Token-budgeted prompt assembly for the AI tutor.
+Recent turns are kept verbatim; older turns are rolled into a short cached summary
+so prompt size (and generation latency) stays flat as a chat grows.
+"""
+import hashlib
+import json
+import re
+from app.cache import cache_get, cache_set
+from app.core.config import (
+    REPLICATE_PROMPT_TOKEN_BUDGET,
+    OLLAMA_PROMPT_TOKEN_BUDGET,
+    GEMINI_PROMPT_TOKEN_BUDGET,
+    AI_TUTOR_SUMMARY_TTL_SECONDS,
+)
+
+CHARS_PER_TOKEN = 4
+
+PROMPT_TOKEN_BUDGETS = {
+    "replicate": REPLICATE_PROMPT_TOKEN_BUDGET,
+    "ollama": OLLAMA_PROMPT_TOKEN_BUDGET,
+    "gemini": GEMINI_PROMPT_TOKEN_BUDGET,
+}
+DEFAULT_PROMPT_TOKEN_BUDGET = 3000
+SUMMARY_BUDGET_SHARE = 0.2
+
+_SENTENCE_END = re.compile(r"(?<=[.?!])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (~4 characters per token for English text)
+    """
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def format_turn(msg: dict) -> str:
+    speaker = "Student" if msg.get("role") == "user" else "Lumina"
+    return f"{speaker}: {msg.get('content', '')}"
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max(0, max_chars - 3)].rstrip() + "..."
+
+
+def summarize_turns(turns: list, max_tokens: int) -> str:
+    """
+    Extractive summary of older turns: the first sentence of each student message,
+    most recent kept when over budget. Cached by the turns' content.
+    """
+    digest = hashlib.sha256(json.dumps(turns, sort_keys=True, default=str).encode()).hexdigest()
+    cache_key = f"ai_tutor_summary:{max_tokens}:{digest}"
+    cached = cache_get(cache_key)
+    if cached is not None:
+        return cached
+
+    topics = []
+    for msg in turns:
+        if msg.get("role") != "user":
+            continue
+        first_sentence = _SENTENCE_END.split(str(msg.get("content", "")).strip(), maxsplit=1)[0]
+        if first_sentence:
+            topics.append(_truncate(first_sentence, 40))
+
+    header = "Summary of earlier conversation - the student previously asked about: "
+    kept = []
+    used = estimate_tokens(header)
+    for topic in reversed(topics):
+        cost = estimate_tokens(topic) + 1
+        if used + cost > max_tokens:
+            break
+        kept.append(topic)
+        used += cost
+    summary = header + "; ".join(reversed(kept)) if kept else ""
+
+    cache_set(cache_key, summary, ttl_seconds=AI_TUTOR_SUMMARY_TTL_SECONDS)
+    return summary
+
+
+def build_prompt(system_prompt: str, history: list, message: str, provider: str):
+    """
+    Assemble the prompt within the provider's token budget.
+    Returns (prompt, stats) where stats reports the prompt size and how history was fitted.
+    """
+    budget = PROMPT_TOKEN_BUDGETS.get(provider, DEFAULT_PROMPT_TOKEN_BUDGET)
+    summary_budget = int(budget * SUMMARY_BUDGET_SHARE)
+
+    tail = [f"Student: {message}", "Lumina:"]
+    fixed_tokens = estimate_tokens(system_prompt) + sum(estimate_tokens(line) + 1 for line in tail)
+    if fixed_tokens > budget:
+        tail[0] = _truncate(tail[0], max(1, budget - estimate_tokens(system_prompt) - 2))
+        fixed_tokens = budget
+
+    history_budget = max(0, budget - fixed_tokens)
+    recent = []
+    used = 0
+    for msg in reversed(history):
+        line = format_turn(msg)
+        cost = estimate_tokens(line) + 1
+        reserve = summary_budget if len(recent) < len(history) - 1 else 0
+        if used + cost > history_budget - reserve:
+            break
+        recent.append(line)
+        used += cost
+    recent.reverse()
+
+    older = history[:len(history) - len(recent)]
+    summary = ""
+    if older:
+        summary = summarize_turns(older, min(summary_budget, max(0, history_budget - used)))
+
+    lines = [system_prompt, ""]
+    if summary:
+        lines.append(summary)
+    lines.extend(recent)
+    lines.extend(tail)
+    prompt = "\n".join(lines)
+
+    stats = {
+        "prompt_tokens": estimate_tokens(prompt),
+        "token_budget": budget,
+        "turns_verbatim": len(recent),
+        "turns_summarized": len(older),
+    }
+    return prompt, stats
@@ -0,0 +1,120 @@
+"""
+Response cache for the AI tutor.
+Exact answers live in the shared query cache keyed by mode + normalized message + context;
+an optional in-process similarity index maps near-identical questions onto those keys.
+"""
+import hashlib
+import json
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+from app.cache import cache_get, cache_set
+from app.core.config import (
+    AI_TUTOR_CACHE_TTL_SECONDS,
+    AI_TUTOR_SEMANTIC_CACHE_THRESHOLD,
+    AI_TUTOR_SEMANTIC_CACHE_SIZE,
+)
+
+_TRAILING_PUNCT_RE = re.compile(r"[\s?!.]+$")
+
+_stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0}
+_similar = OrderedDict()
+_lock = threading.Lock()
+
+
+def normalize_message(message: str) -> str:
+    """
+    Lowercase, collapse whitespace and drop trailing sentence punctuation so trivial
+    variations share a key; symbols and operators are kept ("5+3" and "5-3", "C++" and "C#" differ)
+    """
+    return _TRAILING_PUNCT_RE.sub("", " ".join(message.lower().split()))
+
+
+def _cache_key(mode: str, normalized: str, context) -> str:
+    context_part = json.dumps(context, sort_keys=True, default=str) if context else ""
+    digest = hashlib.sha256(f"{mode}\x00{normalized}\x00{context_part}".encode()).hexdigest()
+    return f"ai_tutor:{digest}"
+
+
+def _vector(normalized: str) -> dict:
+    """
+    Sparse word + character-trigram vector, L2-normalized
+    """
+    words = normalized.split()
+    features = Counter(words)
+    padded = f" {normalized} "
+    features.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+    return {k: v / norm for k, v in features.items()}
+
+
+def _similarity(a: dict, b: dict) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+def get_cached_answer(mode: str, message: str, context=None):
+    """
+    Return a cached answer for this question, or None
+    """
+    normalized = normalize_message(message)
+    key = _cache_key(mode, normalized, context)
+    answer = cache_get(key)
+    if answer is not None:
+        with _lock:
+            _stats["hits"] += 1
+        return answer
+
+    if AI_TUTOR_SEMANTIC_CACHE_THRESHOLD > 0 and normalized:
+        vector = _vector(normalized)
+        scope = _cache_key(mode, "", context)
+        with _lock:
+            candidates = [(k, v) for k, (s, v) in _similar.items() if s == scope]
+        best_key, best_score = None, 0.0
+        for candidate_key, candidate_vector in candidates:
+            score = _similarity(vector, candidate_vector)
+            if score > best_score:
+                best_key, best_score = candidate_key, score
+        if best_key and best_score >= AI_TUTOR_SEMANTIC_CACHE_THRESHOLD:
+            answer = cache_get(best_key)
+            if answer is not None:
+                with _lock:
+                    _stats["semantic_hits"] += 1
+                    _similar.move_to_end(best_key)
+                return answer
+
+    with _lock:
+        _stats["misses"] += 1
+    return None
+
+
+def store_answer(mode: str, message: str, answer: str, context=None):
+    """
+    Cache a provider answer for later identical (or similar) questions
+    """
+    normalized = normalize_message(message)
+    if not normalized or not answer:
+        return
+    key = _cache_key(mode, normalized, context)
+    cache_set(key, answer, ttl_seconds=AI_TUTOR_CACHE_TTL_SECONDS, tags=["ai_tutor_answers"])
+    with _lock:
+        _stats["stores"] += 1
+        if AI_TUTOR_SEMANTIC_CACHE_THRESHOLD > 0:
+            _similar[key] = (_cache_key(mode, "", context), _vector(normalized))
+            _similar.move_to_end(key)
+            while len(_similar) > AI_TUTOR_SEMANTIC_CACHE_SIZE:
+                _similar.popitem(last=False)
+
+
+def cache_metrics() -> dict:
+    """
+    Hit/miss counters for this worker
+    """
+    with _lock:
+        stats = dict(_stats)
+        stats["similarity_index_size"] = len(_similar)
+    lookups = stats["hits"] + stats["semantic_hits"] + stats["misses"]
+    stats["hit_rate"] = round((stats["hits"] + stats["semantic_hits"]) / lookups, 4) if lookups else 0.0
+    return stats
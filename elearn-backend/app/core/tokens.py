@@ -0,0 +1,106 @@
+"""
+JWT signing and verification.
+Keys are parsed once at startup. A verified token is kept in the local cache tier until it
+expires, so repeat requests skip the signature check. Revoked tokens go in the revoked_tokens
+table (keyed by jti), which is shared by every worker and never evicted; it is checked whenever a
+token is verified without a cached verification. Revoking also drops the cached verification in
+every worker through the normal tag invalidation.
+"""
+import hashlib
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from jose import jwt, jwk, JWTError
+from app.cache import local_cache, cache_invalidate
+from app.db import db_cursor, execute
+from app.core.config import SECRET_KEY, ALGORITHM, JWT_PRIVATE_KEY, JWT_PUBLIC_KEY
+
+ASYMMETRIC_ALGORITHM_PREFIXES = ("RS", "ES", "PS")
+
+
+def _read_key(value: str) -> str:
+    if value and "-----BEGIN" not in value and os.path.isfile(value):
+        with open(value) as f:
+            return f.read()
+    return value
+
+
+def _load_keys():
+    if not ALGORITHM.startswith(ASYMMETRIC_ALGORITHM_PREFIXES):
+        key = jwk.construct(SECRET_KEY, ALGORITHM)
+        return key, key
+    private_pem, public_pem = _read_key(JWT_PRIVATE_KEY), _read_key(JWT_PUBLIC_KEY)
+    if not private_pem and not public_pem:
+        raise RuntimeError(f"{ALGORITHM} needs JWT_PRIVATE_KEY and/or JWT_PUBLIC_KEY")
+    signing_key = jwk.construct(private_pem, ALGORITHM) if private_pem else None
+    verification_key = jwk.construct(public_pem, ALGORITHM) if public_pem else signing_key.public_key()
+    return signing_key, verification_key
+
+
+_signing_key, _verification_key = _load_keys()
+
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _deny_key(payload: dict, digest: str) -> str:
+    # Tokens issued before jti was added are revoked by their hash
+    return payload.get("jti") or digest
+
+
+def create_token(claims: dict, expires_delta: timedelta) -> str:
+    """
+    Sign claims with an expiry and a unique jti (used for revocation)
+    """
+    if _signing_key is None:
+        raise RuntimeError("JWT_PRIVATE_KEY is not configured; this instance can only verify tokens")
+    to_encode = claims.copy()
+    to_encode.update({"exp": datetime.utcnow() + expires_delta, "jti": uuid.uuid4().hex})
+    return jwt.encode(to_encode, _signing_key, algorithm=ALGORITHM)
+
+
+def verify_token(token: str) -> dict:
+    """
+    Claims of a valid, unrevoked token; raises JWTError otherwise
+    """
+    digest = _digest(token)
+    cache_key = f"jwt:{digest}"
+    payload = local_cache.get(cache_key)
+    if payload is not None:
+        return payload
+
+    payload = jwt.decode(token, _verification_key, algorithms=[ALGORITHM])
+    deny_key = _deny_key(payload, digest)
+    # A revocation that lands during the check must not leave this verification cached
+    since = local_cache.generation()
+    with db_cursor() as cursor:
+        cursor.execute("SELECT 1 FROM revoked_tokens WHERE jti=%s", (deny_key,))
+        if cursor.fetchone():
+            raise JWTError("Token has been revoked")
+
+    ttl = payload.get("exp", 0) - time.time()
+    if ttl > 0:
+        local_cache.set(cache_key, payload, ttl_seconds=ttl, tags=(f"jwt_token:{deny_key}",), since=since)
+    return payload
+
+
+async def revoke_token(token: str):
+    """
+    Deny-list a token until it expires and drop its cached verification everywhere.
+    Raises JWTError if the token is not validly signed or already expired.
+    """
+    payload = jwt.decode(token, _verification_key, algorithms=[ALGORITHM])
+    deny_key = _deny_key(payload, _digest(token))
+    await execute(
+        """
+        WITH purged AS (
+            DELETE FROM revoked_tokens WHERE expires_at < CURRENT_TIMESTAMP
+        )
+        INSERT INTO revoked_tokens (jti, expires_at) VALUES (%s, to_timestamp(%s))
+        ON CONFLICT (jti) DO NOTHING
+        """,
+        (deny_key, payload.get("exp", time.time()))
+    )
+    cache_invalidate(f"jwt_token:{deny_key}")
@@ -1,13 +1,22 @@
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from psycopg2 import pool
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from fastapi import HTTPException
+from contextlib import asynccontextmanager, contextmanager
+import contextlib
+import asyncio
 import os
+import sys
+import threading
+import time
 from dotenv import load_dotenv
-from functools import lru_cache
-from datetime import datetime, timedelta
 
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
 
+from app.cache import CACHE_REFRESH_AHEAD_SECONDS, cache_get, cache_get_with_ttl, cache_set, cache_clear, cache_invalidate, cache_generation, start_invalidation_bus
+
 DB_CONFIG = {
     'host': os.environ.get('DB_HOST', 'localhost'),
     'user': os.environ.get('DB_USER', 'postgres'),
@@ -17,10 +26,16 @@ DB_CONFIG = {
     'sslmode': 'require',
 }
 
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN', 10))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX', 50))
+# A connection held longer than this is reported as a suspected leak
+DB_POOL_LEAK_SECONDS = float(os.environ.get('DB_POOL_LEAK_SECONDS', 30))
+
 try:
-    db_pool = psycopg2.pool.SimpleConnectionPool(
-        10,  
-        50,  
+    # Threaded: plain def handlers and dependencies run on FastAPI's threadpool
+    db_pool = psycopg2.pool.ThreadedConnectionPool(
+        DB_POOL_MIN_SIZE,
+        DB_POOL_MAX_SIZE,
         **DB_CONFIG,
         cursor_factory=RealDictCursor
     )
@@ -28,27 +43,168 @@ except Exception as e:
     print(f"Error creating connection pool: {e}")
     db_pool = None
 
+ASYNC_POOL_MIN_SIZE = int(os.environ.get('ASYNC_DB_POOL_MIN', 5))
+ASYNC_POOL_MAX_SIZE = int(os.environ.get('ASYNC_DB_POOL_MAX', 40))
+ASYNC_POOL_TIMEOUT = float(os.environ.get('ASYNC_DB_POOL_TIMEOUT', 10))
+
+async_pool = None
+
+# key -> task loading that key, so concurrent misses share one query
+_inflight = {}
+
+# Checkout accounting per pool ("sync" psycopg2, "async" psycopg):
+# id(conn) -> [checked out at, caller, reported as leak]
+_checked_out = {"sync": {}, "async": {}}
+_pool_counters = {
+    name: {"checkouts": 0, "failures": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0, "leaks_reported": 0}
+    for name in _checked_out
+}
+_pool_lock = threading.Lock()
+_leak_monitor = None
+
+def _caller():
+    """First frame outside this module and contextlib, as "file:line function" """
+    frame = sys._getframe(2)
+    while frame and frame.f_code.co_filename in (__file__, contextlib.__file__):
+        frame = frame.f_back
+    if frame is None:
+        return "unknown"
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+def _track_checkout(pool_name, connection, waited, caller):
+    with _pool_lock:
+        counters = _pool_counters[pool_name]
+        counters["checkouts"] += 1
+        counters["wait_seconds"] += waited
+        counters["max_wait_seconds"] = max(counters["max_wait_seconds"], waited)
+        _checked_out[pool_name][id(connection)] = [time.monotonic(), caller, False]
+
+def _track_failure(pool_name):
+    with _pool_lock:
+        _pool_counters[pool_name]["failures"] += 1
+
+def _track_return(pool_name, connection):
+    with _pool_lock:
+        _checked_out[pool_name].pop(id(connection), None)
+
 def get_db_connection():
     """Get a connection from the pool"""
+    started = time.monotonic()
     try:
         if db_pool:
             connection = db_pool.getconn()
-            return connection
         else:
             connection = psycopg2.connect(**DB_CONFIG, cursor_factory=RealDictCursor)
-            return connection
     except Exception as e:
+        _track_failure("sync")
         print(f"Error getting DB connection: {e}")
         return None
+    _track_checkout("sync", connection, time.monotonic() - started, _caller())
+    return connection
 
 def return_db_connection(connection):
     """Return connection to the pool"""
+    if connection is None:
+        return
+    _track_return("sync", connection)
     try:
-        if db_pool and connection:
+        if db_pool:
             db_pool.putconn(connection)
+        else:
+            connection.close()
     except Exception as e:
         print(f"Error returning connection: {e}")
 
+@contextmanager
+def db_cursor():
+    """
+    Check out a pooled connection and yield a dict-row cursor.
+    The transaction is committed when the block exits cleanly and rolled
+    back if it raises; the connection always goes back to the pool.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise HTTPException(status_code=500, detail="DB connection error")
+    try:
+        with conn.cursor() as cursor:
+            yield cursor
+        conn.commit()
+    except BaseException:
+        try:
+            conn.rollback()
+        except Exception as e:
+            print(f"Error rolling back DB connection: {e}")
+        raise
+    finally:
+        return_db_connection(conn)
+
+def get_db_cursor():
+    """FastAPI dependency for read-only sync handlers that need a cursor"""
+    with db_cursor() as cursor:
+        yield cursor
+
+def _suspected_leaks(pool_name):
+    now = time.monotonic()
+    with _pool_lock:
+        return [
+            entry for entry in _checked_out[pool_name].values()
+            if now - entry[0] >= DB_POOL_LEAK_SECONDS
+        ]
+
+def _leak_check_loop():
+    while True:
+        time.sleep(DB_POOL_LEAK_SECONDS)
+        for pool_name in _checked_out:
+            for entry in _suspected_leaks(pool_name):
+                with _pool_lock:
+                    if entry[2]:
+                        continue
+                    entry[2] = True
+                    _pool_counters[pool_name]["leaks_reported"] += 1
+                print(f"DB {pool_name} pool: connection checked out by {entry[1]} held for {time.monotonic() - entry[0]:.0f}s (possible leak)")
+
+def start_pool_monitor():
+    """Start the background thread that logs long-held sync and async pool connections (call on app startup)"""
+    global _leak_monitor
+    if _leak_monitor is not None:
+        return
+    _leak_monitor = threading.Thread(target=_leak_check_loop, daemon=True)
+    _leak_monitor.start()
+
+def _checkout_stats(pool_name, min_size, max_size):
+    now = time.monotonic()
+    with _pool_lock:
+        counters = dict(_pool_counters[pool_name])
+        in_use = len(_checked_out[pool_name])
+    checkouts = counters["checkouts"]
+    return {
+        "min_size": min_size,
+        "max_size": max_size,
+        "in_use": in_use,
+        "utilization": round(in_use / max_size, 4) if max_size else 0.0,
+        "checkouts": checkouts,
+        "checkout_failures": counters["failures"],
+        "avg_wait_ms": round(counters["wait_seconds"] / checkouts * 1000, 2) if checkouts else 0.0,
+        "max_wait_ms": round(counters["max_wait_seconds"] * 1000, 2),
+        "leaks_reported": counters["leaks_reported"],
+        # Callers are only logged; held times are enough to spot a leak from outside
+        "suspected_leaks": [
+            {"held_seconds": round(now - entry[0], 1)}
+            for entry in _suspected_leaks(pool_name)
+        ],
+    }
+
+def pool_stats():
+    """
+    Utilization, checkout wait time and suspected leaks for the sync pool, and the same
+    for async_cursor checkouts under "async" (with psycopg's own pool stats under "async.pool")
+    """
+    stats = _checkout_stats("sync", DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE)
+    stats["async"] = _checkout_stats("async", ASYNC_POOL_MIN_SIZE, ASYNC_POOL_MAX_SIZE)
+    if async_pool is not None:
+        stats["async"]["pool"] = async_pool.get_stats()
+    return stats
+
 def close_pool():
     """Close all pool connections (call on app shutdown)"""
     try:
@@ -57,35 +213,137 @@ def close_pool():
     except Exception as e:
         print(f"Error closing pool: {e}")
 
-class CacheItem:
-    def __init__(self, data, ttl_seconds=300):
-        self.data = data
-        self.expires_at = datetime.now() + timedelta(seconds=ttl_seconds)
-    
-    def is_expired(self):
-        return datetime.now() > self.expires_at
-
-query_cache = {}
-
-def cache_get(key):
-    """Get from cache if not expired"""
-    if key in query_cache:
-        item = query_cache[key]
-        if not item.is_expired():
-            return item.data
-        else:
-            del query_cache[key]
-    return None
-
-def cache_set(key, data, ttl_seconds=300):
-    """Set cache with TTL"""
-    query_cache[key] = CacheItem(data, ttl_seconds)
-
-def cache_clear(pattern=None):
-    """Clear cache by pattern or all"""
-    if pattern is None:
-        query_cache.clear()
-    else:
-        keys_to_delete = [k for k in query_cache.keys() if pattern in k]
-        for k in keys_to_delete:
-            del query_cache[k]
\ No newline at end of file
+def open_cache_bus():
+    """Broadcast cache invalidations to the other workers through Postgres when no Redis tier is configured (call on app startup)"""
+    start_invalidation_bus(lambda: psycopg2.connect(**DB_CONFIG))
+
+async def open_async_pool():
+    """Open the async connection pool (call on app startup)"""
+    global async_pool
+    if async_pool is not None:
+        return
+    try:
+        async_pool = AsyncConnectionPool(
+            kwargs={
+                'host': DB_CONFIG['host'],
+                'user': DB_CONFIG['user'],
+                'password': DB_CONFIG['password'],
+                'dbname': DB_CONFIG['database'],
+                'port': DB_CONFIG['port'],
+                'sslmode': DB_CONFIG['sslmode'],
+                'row_factory': dict_row,
+                # No server-side prepared statements: the DSN may point at a transaction-mode pgbouncer
+                'prepare_threshold': None,
+            },
+            min_size=ASYNC_POOL_MIN_SIZE,
+            max_size=ASYNC_POOL_MAX_SIZE,
+            timeout=ASYNC_POOL_TIMEOUT,
+            open=False,
+        )
+        await async_pool.open()
+    except Exception as e:
+        print(f"Error creating async connection pool: {e}")
+        async_pool = None
+
+async def close_async_pool():
+    """Close the async connection pool (call on app shutdown)"""
+    global async_pool
+    try:
+        if async_pool:
+            await async_pool.close()
+    except Exception as e:
+        print(f"Error closing async pool: {e}")
+    finally:
+        async_pool = None
+
+@asynccontextmanager
+async def async_cursor():
+    """
+    Check out a pooled connection and yield a dict-row cursor.
+    The transaction is committed when the block exits cleanly and rolled
+    back if it raises; the connection always goes back to the pool.
+    Checkout wait and hold time are tracked like the sync pool's, for pool_stats and the leak monitor.
+    """
+    if async_pool is None:
+        raise HTTPException(status_code=500, detail="DB connection error")
+    caller = _caller()
+    started = time.monotonic()
+    conn = None
+    try:
+        async with async_pool.connection() as conn:
+            _track_checkout("async", conn, time.monotonic() - started, caller)
+            async with conn.cursor() as cursor:
+                yield cursor
+    except Exception:
+        if conn is None:
+            _track_failure("async")
+        raise
+    finally:
+        if conn is not None:
+            _track_return("async", conn)
+
+async def get_async_cursor():
+    """FastAPI dependency for read-only handlers that need a cursor"""
+    async with async_cursor() as cursor:
+        yield cursor
+
+async def fetch_one(query, params=None):
+    """Run a query on its own pooled connection and return the first row"""
+    async with async_cursor() as cursor:
+        await cursor.execute(query, params)
+        return await cursor.fetchone()
+
+async def fetch_all(query, params=None):
+    """Run a query on its own pooled connection and return all rows"""
+    async with async_cursor() as cursor:
+        await cursor.execute(query, params)
+        return await cursor.fetchall()
+
+async def execute(query, params=None):
+    """Run a write in its own transaction and return the RETURNING row, if any"""
+    async with async_cursor() as cursor:
+        await cursor.execute(query, params)
+        if cursor.description is None:
+            return None
+        return await cursor.fetchone()
+
+def _log_load_error(task):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Cache load error: {task.exception()}")
+
+def _start_load(key, loader, ttl_seconds, tags):
+    """Start (or join) the single in-flight load for key"""
+    task = _inflight.get(key)
+    if task is not None:
+        return task
+    # An invalidation that lands while the loader runs means its result may predate the write
+    since = cache_generation()
+
+    async def load():
+        try:
+            data = await loader()
+            if data is not None:
+                cache_set(key, data, ttl_seconds=ttl_seconds, tags=tags(data) if callable(tags) else tags, since=since)
+            return data
+        finally:
+            _inflight.pop(key, None)
+
+    task = asyncio.ensure_future(load())
+    task.add_done_callback(_log_load_error)
+    _inflight[key] = task
+    return task
+
+async def cached_query(key, loader, ttl_seconds=300, tags=(), refresh_ahead=0):
+    """
+    Return the cached value for key, or await loader() and cache its result.
+    Concurrent misses for the same key share one loader call (single-flight).
+    refresh_ahead: when the entry has fewer than this many seconds left, it is still
+    served but reloaded in the background (stale-while-revalidate). None results are not cached.
+    tags may be a callable that derives the tags from the loaded value.
+    """
+    data, ttl_left = cache_get_with_ttl(key)
+    if data is not None:
+        if refresh_ahead and ttl_left < refresh_ahead:
+            _start_load(key, loader, ttl_seconds, tags)
+        return data
+    return await asyncio.shield(_start_load(key, loader, ttl_seconds, tags))
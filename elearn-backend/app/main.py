@@ -1,14 +1,18 @@
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from starlette.middleware.base import BaseHTTPMiddleware
 
-from app.api import auth, courses, enrollments, assignments, lessons, attendance, quizzes, resources, certificates, ai_tutor_chats, ai_tutor, class_schedules, contact_messages, nonformal, user, forgot_password, informal_posts, topics, code_execution
+from app.api import auth, courses, enrollments, assignments, lessons, attendance, quizzes, resources, certificates, ai_tutor_chats, ai_tutor, class_schedules, contact_messages, nonformal, user, forgot_password, informal_posts, topics, code_execution, search, gradebook, dashboard
+from app.api.auth import get_current_user
 from app.core.config import RATE_LIMIT_PER_MINUTE
-from app.db import get_db_connection, close_pool, return_db_connection
+from app.core.security import check_teacher_role
+from app.core.http_client import close_http_client
+from app.core.passwords import shutdown_password_pool
+from app.db import get_db_connection, close_pool, return_db_connection, open_async_pool, close_async_pool, open_cache_bus, start_pool_monitor, pool_stats
 
 limiter = Limiter(key_func=get_remote_address)
 
@@ -67,6 +71,9 @@ app.include_router(contact_messages.router)
 app.include_router(nonformal.router)
 app.include_router(informal_posts.router)
 app.include_router(code_execution.router)
+app.include_router(search.router)
+app.include_router(gradebook.router)
+app.include_router(dashboard.router)
 
 app.include_router(topics.router)
 
@@ -99,15 +106,27 @@ def reset_sequences():
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize sequences on app startup"""
+    """Initialize sequences, the async pool, the pool leak monitor and cache invalidation broadcast on app startup"""
     reset_sequences()
+    await open_async_pool()
+    start_pool_monitor()
+    open_cache_bus()
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Close database pool on shutdown"""
+    """Close database pools on shutdown"""
     close_pool()
+    await close_async_pool()
+    await close_http_client()
+    shutdown_password_pool()
 
 @app.get("/")
 @limiter.limit(f"{RATE_LIMIT_PER_MINUTE}/minute")
 async def read_root(request: Request):
-    return {"message": "EduSphere Backend API is running!"}
\ No newline at end of file
+    return {"message": "EduSphere Backend API is running!"}
+
+@app.get("/db/pool-stats")
+async def db_pool_stats(user=Depends(get_current_user)):
+    """Teacher-only endpoint - connection pool utilization, checkout wait time and suspected leaks for this worker."""
+    check_teacher_role(user)
+    return pool_stats()
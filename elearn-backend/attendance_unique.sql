@@ -0,0 +1,9 @@
+-- One attendance row per student per class session, so bulk marking can upsert
+-- with ON CONFLICT. Older duplicates are collapsed to the most recent mark first.
+DELETE FROM attendance a
+USING attendance b
+WHERE a.schedule_id = b.schedule_id
+  AND a.student_id = b.student_id
+  AND a.id < b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_attendance_schedule_student ON attendance(schedule_id, student_id);
@@ -0,0 +1,9 @@
+-- One certificate per student per course, so issuance can use ON CONFLICT instead of a
+-- check-then-insert round trip. Older duplicates keep the first certificate issued.
+DELETE FROM certificates a
+USING certificates b
+WHERE a.student_id = b.student_id
+  AND a.course_id = b.course_id
+  AND a.id > b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_certificates_student_course ON certificates(student_id, course_id);
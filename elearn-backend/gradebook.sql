@@ -0,0 +1,98 @@
+-- Per-student, per-course grade rollup read by the /gradebook endpoints.
+-- Rows are recomputed by refresh_gradebook() from the API whenever a quiz is submitted,
+-- an assignment is submitted or reviewed, or attendance is marked.
+CREATE TABLE IF NOT EXISTS gradebook (
+    course_id INT NOT NULL REFERENCES courses(id) ON DELETE CASCADE,
+    student_id INT NOT NULL REFERENCES students(id) ON DELETE CASCADE,
+    quizzes_taken INT NOT NULL DEFAULT 0,
+    quiz_score_avg FLOAT,
+    quiz_score_best FLOAT,
+    assignments_submitted INT NOT NULL DEFAULT 0,
+    assignments_graded INT NOT NULL DEFAULT 0,
+    grade_distribution JSONB NOT NULL DEFAULT '{}',
+    sessions_attended INT NOT NULL DEFAULT 0,
+    sessions_marked INT NOT NULL DEFAULT 0,
+    attendance_rate FLOAT,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (course_id, student_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_gradebook_student ON gradebook(student_id);
+CREATE INDEX IF NOT EXISTS idx_assignment_submissions_student ON assignment_submissions(student_id, assignment_id);
+CREATE INDEX IF NOT EXISTS idx_quiz_submissions_student ON quiz_submissions(student_id, quiz_id);
+
+-- Each student's rollup is recomputed under a transaction-scoped advisory lock (taken in id order,
+-- so concurrent refreshes can't deadlock). The INSERT below is a separate statement and so, the
+-- function being volatile, reads with a fresh snapshot taken after the lock: a concurrent write for
+-- the same student is either committed and counted, or still waiting to run its own refresh.
+CREATE OR REPLACE FUNCTION refresh_gradebook(p_course_id INT, p_student_ids INT[]) RETURNS VOID AS $$
+    SELECT pg_advisory_xact_lock(hashtext('gradebook'), x.student_id)
+    FROM (SELECT DISTINCT unnest(p_student_ids) AS student_id ORDER BY 1) x
+    WHERE x.student_id IS NOT NULL;
+
+    INSERT INTO gradebook (
+        course_id, student_id, quizzes_taken, quiz_score_avg, quiz_score_best,
+        assignments_submitted, assignments_graded, grade_distribution,
+        sessions_attended, sessions_marked, attendance_rate, updated_at
+    )
+    SELECT
+        p_course_id, s.student_id, q.taken, q.avg_score, q.best_score,
+        a.submitted, a.graded, COALESCE(d.distribution, '{}'::jsonb),
+        att.present, att.marked,
+        CASE WHEN att.marked > 0 THEN round(att.present::numeric / att.marked, 4) END,
+        CURRENT_TIMESTAMP
+    FROM (SELECT DISTINCT unnest(p_student_ids) AS student_id) s
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*) AS taken, AVG(qs.score) AS avg_score, MAX(qs.score) AS best_score
+        FROM quiz_submissions qs
+        JOIN quizzes qz ON qz.id = qs.quiz_id
+        WHERE qz.course_id = p_course_id AND qs.student_id = s.student_id
+    ) q
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*) AS submitted, COUNT(*) FILTER (WHERE sub.status = 'graded') AS graded
+        FROM assignment_submissions sub
+        JOIN assignments asg ON asg.id = sub.assignment_id
+        WHERE asg.course_id = p_course_id AND sub.student_id = s.student_id
+    ) a
+    CROSS JOIN LATERAL (
+        SELECT jsonb_object_agg(g.grade, g.n) AS distribution
+        FROM (
+            SELECT sub.grade, COUNT(*) AS n
+            FROM assignment_submissions sub
+            JOIN assignments asg ON asg.id = sub.assignment_id
+            WHERE asg.course_id = p_course_id AND sub.student_id = s.student_id AND sub.grade IS NOT NULL
+            GROUP BY sub.grade
+        ) g
+    ) d
+    CROSS JOIN LATERAL (
+        SELECT COUNT(*) FILTER (WHERE at.status = 'present') AS present, COUNT(*) AS marked
+        FROM attendance at
+        JOIN class_schedules cs ON cs.id = at.schedule_id
+        WHERE cs.course_id = p_course_id AND at.student_id = s.student_id
+    ) att
+    WHERE s.student_id IS NOT NULL
+    ON CONFLICT (course_id, student_id) DO UPDATE SET
+        quizzes_taken = EXCLUDED.quizzes_taken,
+        quiz_score_avg = EXCLUDED.quiz_score_avg,
+        quiz_score_best = EXCLUDED.quiz_score_best,
+        assignments_submitted = EXCLUDED.assignments_submitted,
+        assignments_graded = EXCLUDED.assignments_graded,
+        grade_distribution = EXCLUDED.grade_distribution,
+        sessions_attended = EXCLUDED.sessions_attended,
+        sessions_marked = EXCLUDED.sessions_marked,
+        attendance_rate = EXCLUDED.attendance_rate,
+        updated_at = EXCLUDED.updated_at;
+$$ LANGUAGE sql;
+
+-- Backfill every enrolled student
+SELECT refresh_gradebook(
+    c.id,
+    ARRAY(
+        SELECT u.student_id FROM enrollments e
+        JOIN users u ON u.id = e.user_id
+        WHERE e.course_id = c.id AND u.student_id IS NOT NULL
+    )
+)
+FROM courses c;
+
+ANALYZE gradebook;
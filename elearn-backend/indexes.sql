@@ -70,6 +70,12 @@ CREATE INDEX IF NOT EXISTS idx_courses_type_category ON courses(type, category);
 CREATE INDEX IF NOT EXISTS idx_informal_posts_topic_time ON informal_posts(topic, created_at DESC);
 -- Assignment submissions by assignment and student
 CREATE INDEX IF NOT EXISTS idx_assignment_submissions_assignment_student ON assignment_submissions(assignment_id, student_id);
+-- Keyset pagination (ORDER BY sort key, id)
+CREATE INDEX IF NOT EXISTS idx_courses_created_id ON courses(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_enrollments_enrolled_id ON enrollments(enrolled_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_informal_posts_created_id ON informal_posts(created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_informal_posts_topic_created_id ON informal_posts(topic, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_lessons_course_order_id ON lessons(course_id, order_index, id);
 -- =====================================================
 -- TEXT SEARCH INDEXES (For search functionality)
 -- =====================================================
@@ -0,0 +1,25 @@
+-- Per-user home feed for informal posts: one row per (follower, post) written when a post
+-- is created in a followed topic, so the feed is a single indexed range scan.
+CREATE TABLE IF NOT EXISTS informal_feed_items (
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    post_id INT NOT NULL REFERENCES informal_posts(id) ON DELETE CASCADE,
+    created_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (user_id, post_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_informal_feed_items_user_created
+ON informal_feed_items(user_id, created_at DESC, post_id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_informal_feed_items_post ON informal_feed_items(post_id);
+
+CREATE INDEX IF NOT EXISTS idx_topics_name ON topics(name);
+
+-- Backfill from existing follows
+INSERT INTO informal_feed_items (user_id, post_id, created_at)
+SELECT f.user_id, p.id, p.created_at
+FROM followed_topics f
+JOIN topics t ON t.id = f.topic_id
+JOIN informal_posts p ON p.topic = t.name
+ON CONFLICT DO NOTHING;
+
+ANALYZE informal_feed_items;
@@ -0,0 +1,72 @@
+-- Move informal post likes, saves and comments out of the TEXT columns on informal_posts
+-- into their own tables, with per-post counters kept on informal_posts.
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS informal_post_likes (
+    post_id INT NOT NULL REFERENCES informal_posts(id) ON DELETE CASCADE,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (post_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS informal_post_saves (
+    post_id INT NOT NULL REFERENCES informal_posts(id) ON DELETE CASCADE,
+    user_id INT NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (post_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS informal_post_comments (
+    id SERIAL PRIMARY KEY,
+    post_id INT NOT NULL REFERENCES informal_posts(id) ON DELETE CASCADE,
+    user_id INT REFERENCES users(id) ON DELETE SET NULL,
+    legacy_id VARCHAR(100),
+    author VARCHAR(255),
+    text TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_informal_post_saves_user ON informal_post_saves(user_id);
+CREATE INDEX IF NOT EXISTS idx_informal_post_comments_post_id ON informal_post_comments(post_id, id);
+CREATE INDEX IF NOT EXISTS idx_informal_post_comments_legacy ON informal_post_comments(post_id, legacy_id);
+
+ALTER TABLE informal_posts
+ADD COLUMN IF NOT EXISTS saves_count INTEGER DEFAULT 0,
+ADD COLUMN IF NOT EXISTS comments_count INTEGER DEFAULT 0;
+
+-- likers/savers were stored either as "1,2,3" or as a JSON array "[1, 2, 3]"
+INSERT INTO informal_post_likes (post_id, user_id)
+SELECT p.id, x::int
+FROM informal_posts p, regexp_split_to_table(COALESCE(p.likers, ''), '[^0-9]+') AS x
+WHERE x <> '' AND EXISTS (SELECT 1 FROM users u WHERE u.id = x::int)
+ON CONFLICT DO NOTHING;
+
+INSERT INTO informal_post_saves (post_id, user_id)
+SELECT p.id, x::int
+FROM informal_posts p, regexp_split_to_table(COALESCE(p.savers, ''), '[^0-9]+') AS x
+WHERE x <> '' AND EXISTS (SELECT 1 FROM users u WHERE u.id = x::int)
+ON CONFLICT DO NOTHING;
+
+-- comments were a JSON array of {"id": "c-<user_id>-<unix ts>", "author": ..., "text": ...}
+INSERT INTO informal_post_comments (post_id, user_id, legacy_id, author, text, created_at)
+SELECT
+    p.id,
+    (SELECT u.id FROM users u WHERE u.id = substring(c->>'id' from '^c-([0-9]+)-')::int),
+    c->>'id',
+    c->>'author',
+    COALESCE(c->>'text', ''),
+    COALESCE(to_timestamp(substring(c->>'id' from '-([0-9]+)$')::bigint)::timestamp, p.created_at)
+FROM informal_posts p, json_array_elements(p.comments::json) AS c
+WHERE p.comments LIKE '[%';
+
+UPDATE informal_posts p SET
+    likes = (SELECT COUNT(*) FROM informal_post_likes l WHERE l.post_id = p.id),
+    saves_count = (SELECT COUNT(*) FROM informal_post_saves s WHERE s.post_id = p.id),
+    comments_count = (SELECT COUNT(*) FROM informal_post_comments c WHERE c.post_id = p.id);
+
+ALTER TABLE informal_posts
+DROP COLUMN IF EXISTS likers,
+DROP COLUMN IF EXISTS savers,
+DROP COLUMN IF EXISTS comments;
+
+COMMIT;
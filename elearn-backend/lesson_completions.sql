@@ -0,0 +1,25 @@
+-- Per-lesson completion rows for enrollments plus a maintained lesson count on courses,
+-- so progress updates are idempotent and certificate eligibility is a single lookup.
+-- lesson_index is the 0-based position the client reports (non-formal lessons may live only in the frontend).
+CREATE TABLE IF NOT EXISTS lesson_completions (
+    enrollment_id INT NOT NULL REFERENCES enrollments(id) ON DELETE CASCADE,
+    lesson_index INT NOT NULL CHECK (lesson_index >= 0),
+    completed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (enrollment_id, lesson_index)
+);
+
+ALTER TABLE courses ADD COLUMN IF NOT EXISTS lesson_count INTEGER NOT NULL DEFAULT 0;
+
+CREATE INDEX IF NOT EXISTS idx_enrollments_user_course ON enrollments(user_id, course_id);
+
+-- Backfill: progress N meant lessons 0..N-1 were completed
+INSERT INTO lesson_completions (enrollment_id, lesson_index)
+SELECT e.id, i
+FROM enrollments e, generate_series(0, GREATEST(COALESCE(e.progress, 0)::int, 0) - 1) AS i
+ON CONFLICT DO NOTHING;
+
+UPDATE enrollments e SET progress = (SELECT COUNT(*) FROM lesson_completions lc WHERE lc.enrollment_id = e.id);
+
+UPDATE courses c SET lesson_count = (SELECT COUNT(*) FROM lessons l WHERE l.course_id = c.id);
+
+ANALYZE lesson_completions;
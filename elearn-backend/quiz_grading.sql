@@ -0,0 +1,10 @@
+-- Server-side quiz grading: keep the submitted answers so submissions can be regraded
+-- when a quiz's questions change, plus the breakdown behind each score.
+ALTER TABLE quiz_submissions
+ADD COLUMN IF NOT EXISTS answers JSONB,
+ADD COLUMN IF NOT EXISTS correct_count INT,
+ADD COLUMN IF NOT EXISTS total_questions INT,
+ADD COLUMN IF NOT EXISTS graded_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_quiz_submissions_quiz_student ON quiz_submissions(quiz_id, student_id);
+CREATE INDEX IF NOT EXISTS idx_quiz_questions_quiz_id ON quiz_questions(quiz_id);
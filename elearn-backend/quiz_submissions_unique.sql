@@ -0,0 +1,12 @@
+-- One submission per student per quiz, so submitting can use ON CONFLICT instead of a
+-- check-then-insert round trip. Older duplicates keep the first submission made.
+DELETE FROM quiz_submissions a
+USING quiz_submissions b
+WHERE a.quiz_id = b.quiz_id
+  AND a.student_id = b.student_id
+  AND a.id > b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_quiz_submissions_quiz_student ON quiz_submissions(quiz_id, student_id);
+
+-- Covered by the unique index
+DROP INDEX IF EXISTS idx_quiz_submissions_quiz_student;
@@ -0,0 +1,10 @@
+-- Deny-list for revoked access tokens (POST /auth/logout), checked whenever a token is verified
+-- without a cached verification. Keyed by jti (or the token's sha256 for tokens issued without one);
+-- rows only matter until the token would have expired and are purged by later revocations.
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti VARCHAR(64) PRIMARY KEY,
+    expires_at TIMESTAMPTZ NOT NULL,
+    revoked_at TIMESTAMPTZ DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_revoked_tokens_expires_at ON revoked_tokens(expires_at);
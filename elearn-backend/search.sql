@@ -0,0 +1,29 @@
+-- Full-text search: weighted tsvector columns kept up to date by Postgres, with GIN indexes
+-- (title outranks body text). Used by the /search endpoint.
+ALTER TABLE courses
+ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(category, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'C')
+) STORED;
+
+ALTER TABLE lessons
+ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(content, '')), 'C')
+) STORED;
+
+ALTER TABLE informal_posts
+ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(tags, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(content, '')), 'C')
+) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_courses_search ON courses USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_lessons_search ON lessons USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_informal_posts_search ON informal_posts USING GIN (search_vector);
+
+ANALYZE courses;
+ANALYZE lessons;
+ANALYZE informal_posts;
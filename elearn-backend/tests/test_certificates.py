@@ -0,0 +1,60 @@
+import unittest
+from contextlib import asynccontextmanager
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api import certificates
+from app.api.auth import get_current_user
+
+TEACHER = {"id": 1, "role": "teacher", "teacher_id": 7, "student_id": None}
+
+
+class FakeCursor:
+    def __init__(self, course):
+        self.course = course
+        self.queries = []
+
+    async def execute(self, query, params=None):
+        self.queries.append(query)
+
+    async def fetchone(self):
+        return self.course
+
+    async def fetchall(self):
+        return []
+
+
+class BulkIssueTest(unittest.TestCase):
+    def setUp(self):
+        app.dependency_overrides[get_current_user] = lambda: TEACHER
+        self.addCleanup(app.dependency_overrides.clear)
+        self.client = TestClient(app)
+
+    def issue(self, course):
+        cursor = FakeCursor(course)
+
+        @asynccontextmanager
+        async def fake_async_cursor():
+            yield cursor
+
+        with mock.patch.object(certificates, "async_cursor", fake_async_cursor):
+            response = self.client.post("/certificates/course/5/issue", json={})
+        return response, cursor
+
+    def test_course_without_lesson_count_issues_nothing(self):
+        for lesson_count in (0, None):
+            response, cursor = self.issue({"instructor_id": 7, "lesson_count": lesson_count})
+            self.assertEqual(response.status_code, 409)
+            self.assertFalse(any("INSERT INTO certificates" in q for q in cursor.queries))
+
+    def test_eligibility_requires_a_lesson_count(self):
+        response, cursor = self.issue({"instructor_id": 7, "lesson_count": 3})
+        self.assertEqual(response.status_code, 200)
+        insert = next(q for q in cursor.queries if "INSERT INTO certificates" in q)
+        self.assertIn("c.lesson_count > 0", insert)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import base64
+import json
+import unittest
+from datetime import datetime
+
+from fastapi import HTTPException
+
+from app.core.pagination import encode_cursor, keyset_condition
+
+
+def token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+class KeysetConditionTest(unittest.TestCase):
+    def test_round_trip(self):
+        created = datetime(2024, 5, 1, 12, 30)
+        condition, values = keyset_condition(["p.created_at", "p.id"], encode_cursor([created, 42]))
+        self.assertEqual(condition, "(p.created_at, p.id) < (%s, %s)")
+        self.assertEqual(values, [created, 42])
+
+    def test_malformed_cursors_are_400(self):
+        bad = [
+            "not-base64-json!",
+            token({"id": 1}),
+            token([1]),
+            token([[1], 2]),
+            token([{"a": 1}, 2]),
+            token(["2024-05-01T12:30:00", "2"]),
+            token(["yesterday", 2]),
+            token([5, 2]),
+            token(["2024-05-01T12:30:00", True]),
+            token(["2024-05-01T12:30:00", 2 ** 70]),
+        ]
+        for after in bad:
+            with self.assertRaises(HTTPException) as caught:
+                keyset_condition(["p.created_at", "p.id"], after)
+            self.assertEqual(caught.exception.status_code, 400, after)
+            self.assertEqual(caught.exception.detail, "Invalid cursor")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,24 @@
+import unittest
+
+from app.core.response_cache import _cache_key, normalize_message
+
+
+def key(message):
+    return _cache_key("general", normalize_message(message), None)
+
+
+class NormalizeMessageTest(unittest.TestCase):
+    def test_operators_and_symbols_change_the_key(self):
+        self.assertNotEqual(key("What is 5+3?"), key("What is 5-3?"))
+        self.assertNotEqual(key("what is 5*3"), key("what is 5-3"))
+        self.assertNotEqual(key("Explain C++"), key("Explain C#"))
+        self.assertNotEqual(key("Explain C#"), key("Explain C"))
+
+    def test_case_whitespace_and_trailing_punctuation_share_a_key(self):
+        self.assertEqual(key("What is 5+3?"), key("  what   is 5+3 "))
+        self.assertEqual(key("Explain C++!"), key("explain c++"))
+        self.assertEqual(normalize_message("What IS\ta list?!"), "what is a list")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -83,6 +83,14 @@ export const AuthProvider = ({ children }) => {
   }, []);
 
   const logout = useCallback(() => {
+    const token = JSON.parse(localStorage.getItem("user") || "null")?.access_token;
+    if (token) {
+      // Revoke the token server-side; local logout proceeds regardless
+      fetch(`${API_URL}/auth/logout`, {
+        method: "POST",
+        headers: { Authorization: `Bearer ${token}` },
+      }).catch(() => {});
+    }
     setUser(null);
     localStorage.removeItem("user");
     localStorage.removeItem("enrolledCourses");
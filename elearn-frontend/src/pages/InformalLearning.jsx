@@ -151,17 +151,6 @@ export default function InformalLearning() {
       : typeof post.tags === "string"
         ? post.tags.split(",").map((t) => t.trim()).filter(Boolean)
         : [];
-    const parsedLikers = Array.isArray(post.likers)
-      ? post.likers
-      : typeof post.likers === "string"
-        ? post.likers.split(",").map((x) => x.trim()).filter(Boolean).map(Number)
-        : (post.likers || []);
-    const parsedSavers = Array.isArray(post.savers)
-      ? post.savers
-      : typeof post.savers === "string"
-        ? post.savers.split(",").map((x) => x.trim()).filter(Boolean).map(Number)
-        : (post.savers || []);
-
     const createdAt = post.created_at || post.createdAt || new Date().toISOString();
     const authorId = post.author_id ?? post.authorId ?? post.userId;
 
@@ -180,11 +169,13 @@ export default function InformalLearning() {
       creator_role: post.creator_role || post.role,
       created_at: createdAt,
       createdAt,
-      likes: post.likes_count ?? post.likes ?? 0,
-      likers: parsedLikers,
+      likes: post.like_count ?? post.likes_count ?? post.likes ?? 0,
+      liked: Boolean(post.liked),
       comments: parsedComments,
+      comments_count: post.comments_count ?? parsedComments.length,
       tags: parsedTags,
-      savers: parsedSavers,
+      saves: post.save_count ?? post.saves_count ?? 0,
+      saved: Boolean(post.saved),
       media_url: post.media_url || post.mediaUrl,
     };
   };
@@ -196,7 +187,9 @@ export default function InformalLearning() {
   // Fetch posts from backend on mount and whenever user changes (login/logout)
   useEffect(() => {
     setInitialLoading(true);
-    axios.get(`${API_URL}/informal-posts/`)
+    // Send the token when logged in so each post carries this user's liked/saved flags
+    const authConfig = user?.access_token ? { headers: { Authorization: `Bearer ${user.access_token}` } } : {};
+    axios.get(`${API_URL}/informal-posts/`, authConfig)
       .then(res => {
         // Backend returns paginated format: {data: [...], total, skip, limit}
         const postsArray = res.data.data || res.data || [];
@@ -251,7 +244,7 @@ export default function InformalLearning() {
     }
     data.sort((a, b) => {
       if (sortBy === "upvotes") return (b.likes || 0) - (a.likes || 0);
-      if (sortBy === "comments") return (b.comments?.length || 0) - (a.comments?.length || 0);
+      if (sortBy === "comments") return (b.comments_count || 0) - (a.comments_count || 0);
       return new Date(b.createdAt) - new Date(a.createdAt);
     });
     return data;
@@ -270,7 +263,7 @@ export default function InformalLearning() {
   const badges = useMemo(() => {
     const contributions = posts.filter((p) => p.authorId === user?.id).length;
     const comments = Object.values(commentDraft).length;
-    const likesGiven = posts.reduce((acc, p) => acc + (p.likers?.includes(user?.id) ? 1 : 0), 0);
+    const likesGiven = posts.filter((p) => p.liked).length;
     return [
       contributions > 0 && { label: "Contributor", icon: <FlashOnIcon fontSize="small" /> },
       likesGiven > 5 && { label: "Helper", icon: <FavoriteIcon fontSize="small" /> },
@@ -292,7 +285,11 @@ export default function InformalLearning() {
         setPosts((prev) =>
           prev.map((p) =>
             p.id === id
-              ? { ...p, likes: res.data.likes, likers: res.data.likers }
+              ? {
+                  ...p,
+                  likes: res.data.likes,
+                  liked: res.data.liked,
+                }
               : p
           )
         );
@@ -314,7 +311,11 @@ export default function InformalLearning() {
         setPosts((prev) =>
           prev.map((p) =>
             p.id === id
-              ? { ...p, savers: res.data.savers, /* optionally update other fields if returned */ }
+              ? {
+                  ...p,
+                  saves: res.data.saves,
+                  saved: res.data.saved,
+                }
               : p
           )
         );
@@ -343,7 +344,7 @@ export default function InformalLearning() {
         setPosts((prev) =>
           prev.map((p) =>
             p.id === id
-              ? { ...p, comments: res.data.comments }
+              ? { ...p, comments: [...(p.comments || []), res.data.comment], comments_count: res.data.comments_count }
               : p
           )
         );
@@ -364,7 +365,11 @@ export default function InformalLearning() {
       if (res.data && res.data.success) {
         setPosts((prev) => prev.map((p) =>
           p.id === postId
-            ? { ...p, comments: res.data.comments }
+            ? {
+                ...p,
+                comments: (p.comments || []).filter((c) => String(c.id) !== String(commentId)),
+                comments_count: res.data.comments_count,
+              }
             : p
         ));
       }
@@ -373,6 +378,29 @@ export default function InformalLearning() {
     }
   };
 
+  // Page through a post's full comment thread (the feed only carries the latest few)
+  const handleLoadComments = async (postId) => {
+    const post = posts.find((p) => p.id === postId);
+    if (!post) return;
+    try {
+      const params = { limit: 50 };
+      if (post.comments_cursor) params.after = post.comments_cursor;
+      const res = await axios.get(`${BACKEND_URL}/informal-posts/${postId}/comments`, { params });
+      setPosts((prev) => prev.map((p) =>
+        p.id === postId
+          ? {
+              ...p,
+              comments: post.comments_cursor ? [...(p.comments || []), ...res.data.data] : res.data.data,
+              comments_cursor: res.data.next_cursor,
+              comments_loaded: true,
+            }
+          : p
+      ));
+    } catch (err) {
+      // Optionally show error
+    }
+  };
+
   // Load persisted informal state on first render
   useEffect(() => {
     try {
@@ -462,7 +490,7 @@ export default function InformalLearning() {
     )
       .then((res) => {
         // After creating, re-fetch all posts for instant sync
-        axios.get(`${API_URL}/informal-posts/`)
+        axios.get(`${API_URL}/informal-posts/`, { headers: { Authorization: `Bearer ${accessToken}` } })
           .then(res2 => {
             const postsArray = res2.data.data || res2.data || [];
             const posts = (Array.isArray(postsArray) ? postsArray : []).map(normalizePost);
@@ -980,8 +1008,8 @@ export default function InformalLearning() {
                   )}
 
                   {filtered.map((post) => {
-                    const isLiked = Array.isArray(post.likers) && post.likers.includes(user?.id);
-                    const isSaved = Array.isArray(post.savers) && post.savers.includes(user?.id);
+                    const isLiked = Boolean(user && post.liked);
+                    const isSaved = Boolean(user && post.saved);
                     const isAuthor = user && post.author_id === user.id;
                     return (
                       <Card key={post.id} sx={{ borderRadius: 2, border: "1px solid #e2e8f0" }}>
@@ -1059,7 +1087,7 @@ export default function InformalLearning() {
                               startIcon={<ChatBubbleOutlineIcon />}
                               sx={{ textTransform: "none", color: "#64748b" }}
                             >
-                              {post.comments?.length || 0}
+                              {post.comments_count || 0}
                             </Button>
                             <Button
                               size="small"
@@ -1095,6 +1123,16 @@ export default function InformalLearning() {
                               </Box>
                             ))}
 
+                            {(post.comments_loaded ? Boolean(post.comments_cursor) : (post.comments_count || 0) > (post.comments?.length || 0)) && (
+                              <Button
+                                size="small"
+                                onClick={() => handleLoadComments(post.id)}
+                                sx={{ alignSelf: "flex-start", textTransform: "none", color: "#2563eb" }}
+                              >
+                                {post.comments_loaded ? "Load more comments" : `View all ${post.comments_count} comments`}
+                              </Button>
+                            )}
+
                             <Stack direction="row" spacing={1} alignItems="flex-start">
                               <TextField
                                 size="small"
@@ -1215,7 +1253,7 @@ export default function InformalLearning() {
                       </Stack>
                       {(() => {
                         if (!user) return <Typography variant="caption" sx={{ color: "#94a3b8" }}>Login to save posts</Typography>;
-                        const savedPosts = posts.filter((p) => Array.isArray(p.savers) && p.savers.includes(user.id));
+                        const savedPosts = posts.filter((p) => p.saved);
                         if (savedPosts.length === 0) {
                           return <Typography variant="caption" sx={{ color: "#94a3b8" }}>Save posts to revisit later</Typography>;
                         }